@@ -3,5 +3,6 @@ API Blueprint initialization
 """
 from .document import document_bp
 from .user import user_bp
+from .chat import chat_bp
 
-blueprints = [document_bp, user_bp]
+blueprints = [document_bp, user_bp, chat_bp]
@@ -0,0 +1,108 @@
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from backend.utils.error_handler import handle_error
+import json
+import threading
+
+chat_bp = Blueprint('chat', __name__)
+
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """
+    LLM engine for chat endpoints, loaded on first use.
+
+    Tests and deployments can provide one via app.config['LLM_ENGINE'];
+    otherwise the local model from model_config.yaml is loaded.
+    """
+    engine = current_app.config.get('LLM_ENGINE') or current_app.extensions.get('llm_engine')
+    if engine is not None:
+        return engine
+
+    with _engine_lock:
+        engine = current_app.extensions.get('llm_engine')
+        if engine is None:
+            from llm_engine.engine import LLMEngine
+            from llm_engine.embeddings.model_registry import get_embedding_model
+            from llm_engine.models.loader import load_local_model
+
+            # Honors models.local.quantization from model_config.yaml
+            model, tokenizer = load_local_model(device='cpu')
+            engine = LLMEngine(model, tokenizer, get_embedding_model(), device='cpu')
+            current_app.extensions['llm_engine'] = engine
+    return engine
+
+def _sse(data, event=None):
+    """Format one Server-Sent Events message."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def _adapter_error(engine, adapter):
+    """(message, status) if a requested LoRA adapter cannot be used, else None."""
+    if not isinstance(adapter, str):
+        return 'adapter must be a string', 400
+    registry = engine.inference.adapters
+    if registry is None:
+        return 'No adapter registry configured', 400
+    try:
+        exists = registry.exists(adapter)
+    except ValueError as e:
+        return str(e), 400
+    if not exists:
+        return f'No adapter named {adapter}', 404
+    return None
+
+@chat_bp.route('/chat/stream', methods=['POST'])
+@handle_error
+def chat_stream():
+    """
+    Stream a response to a chat query as Server-Sent Events.
+
+    Emits one 'data: {"delta": ...}' message per text increment, then a
+    'done' event carrying token counts, time-to-first-token and tokens/sec.
+    An optional 'adapter' field selects a user's LoRA style adapter.
+    """
+    data = request.get_json() or {}
+    query = data.get('query')
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    try:
+        max_length = int(data.get('max_length', 1000))
+        temperature = float(data.get('temperature', 0.7))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'max_length must be an integer and temperature a number'}), 400
+    if max_length < 1:
+        return jsonify({'error': 'max_length must be positive'}), 400
+
+    engine = get_engine()
+    adapter = data.get('adapter')
+    if adapter is not None:
+        # Resolve the adapter now; the stream starts lazily, after the 200 is sent
+        error = _adapter_error(engine, adapter)
+        if error is not None:
+            return jsonify({'error': error[0]}), error[1]
+
+    result = engine.process_query(
+        query,
+        max_length=max_length,
+        temperature=temperature,
+        use_rag=bool(data.get('use_rag', True)),
+        stream=True,
+        adapter=adapter
+    )
+
+    def events():
+        try:
+            for delta in result['response']:
+                yield _sse({'delta': delta})
+            yield _sse(result['metadata'], event='done')
+        except Exception as e:
+            yield _sse({'error': str(e)}, event='error')
+        finally:
+            # Closing stops generation when the client disconnects early
+            result['response'].close()
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, current_app
 from gridfs import GridFS
 from bson.objectid import ObjectId
 from io import BytesIO
@@ -166,6 +166,11 @@ def delete_document(document_id):
         if result.deleted_count == 0:
             return jsonify({'error': 'Failed to delete document metadata'}), 500
         
+        # Drop cached chat responses that used this document as context
+        engine = current_app.config.get('LLM_ENGINE') or current_app.extensions.get('llm_engine')
+        if engine is not None:
+            engine.invalidate_documents([document_id])
+        
         return jsonify({'message': 'Document deleted successfully'}), 200
     except Exception as e:
         print(f"Error deleting document: {str(e)}")
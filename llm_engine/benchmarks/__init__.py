@@ -0,0 +1,2 @@
+# Benchmarks Package
+# Standalone scripts that measure startup, throughput and memory of engine components
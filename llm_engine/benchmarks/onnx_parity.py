@@ -0,0 +1,66 @@
+"""
+Parity and speed check of the ONNX Runtime embedding backend
+
+Encodes a sample corpus with the PyTorch sentence transformer and with the
+ONNX export (fp32 and, with --quantize, dynamic int8), then reports cosine
+agreement, top-k neighbour overlap and the encode speedup.
+
+Usage:
+    python -m llm_engine.benchmarks.onnx_parity [--model all-MiniLM-L6-v2] [--quantize]
+        [--corpus texts.txt] [--repeat 8]
+"""
+import argparse
+
+SAMPLE_CORPUS = [
+    "Senior software engineer with eight years of Python and distributed systems experience.",
+    "I am writing to apply for the machine learning engineer position at your company.",
+    "Led a team of five to migrate a monolith to microservices, cutting latency by 40%.",
+    "Skills: Python, PyTorch, SQL, Docker, Kubernetes, AWS, Terraform.",
+    "Dear hiring manager, I was excited to see the opening for a data analyst.",
+    "Built a retrieval-augmented chatbot answering questions over internal documents.",
+    "Education: B.S. in Computer Science, minor in Statistics.",
+    "Thank you for considering my application; I look forward to speaking with you.",
+    "Designed ETL pipelines processing 2TB of event data per day.",
+    "Volunteer tutor teaching introductory programming to high school students.",
+    "Responsible for on-call rotation and incident postmortems for payment services.",
+    "My experience in product analytics makes me a strong fit for this role.",
+]
+
+
+def main():
+    from llm_engine.embeddings.onnx_backend import OnnxEmbeddingModel, check_parity
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', default='all-MiniLM-L6-v2', help='Sentence transformer model name')
+    parser.add_argument('--quantize', action='store_true', help='Also check the int8-quantized export')
+    parser.add_argument('--corpus', help='File with one text per line (defaults to a built-in sample)')
+    parser.add_argument('--repeat', type=int, default=8, help='Times the corpus is repeated for timing')
+    parser.add_argument('--cache-dir', help='ONNX artifact cache directory')
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, 'r') as corpus_file:
+            texts = [line.strip() for line in corpus_file if line.strip()]
+    else:
+        texts = SAMPLE_CORPUS
+    texts = texts * args.repeat
+
+    from sentence_transformers import SentenceTransformer
+    reference = SentenceTransformer(args.model, device='cpu')
+
+    variants = [False, True] if args.quantize else [False]
+    for quantize in variants:
+        onnx_model = OnnxEmbeddingModel(args.model, cache_dir=args.cache_dir, quantize=quantize)
+        # Warm both runtimes so the timing excludes one-off initialisation
+        check_parity(texts[:8], onnx_model, reference_model=reference)
+        report = check_parity(texts, onnx_model, reference_model=reference)
+
+        label = 'onnx int8' if quantize else 'onnx fp32'
+        print(f"{label}: " + ", ".join(
+            f"{key}={value:.4f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in report.items()
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Time-to-first-token benchmark for the prefix KV-cache
+
+Builds prompts that share the default system prompt and a block of retrieved
+context but end in different questions, then measures the time to generate one
+token with and without the prefix cache.
+
+Usage:
+    python -m llm_engine.benchmarks.prefix_cache [--model gpt2] [--context-words 600] [--questions 8]
+"""
+import time
+import argparse
+from statistics import median
+
+QUESTIONS = [
+    "What does the report conclude?",
+    "Who is the intended audience?",
+    "Summarize the second paragraph.",
+    "Which risks are mentioned?",
+    "What should happen next?",
+    "List the key numbers.",
+    "Is the tone formal or casual?",
+    "What is missing from this document?"
+]
+
+
+def main():
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    from llm_engine.models.inference import LLMInference
+    from llm_engine.models.kv_cache import PrefixKVCache
+    from llm_engine.utils.config_manager import config_manager
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', default='gpt2', help='Causal language model name or path')
+    parser.add_argument('--context-words', type=int, default=600, help='Words of shared retrieved context')
+    parser.add_argument('--questions', type=int, default=8, help='Prompts per run')
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model = AutoModelForCausalLM.from_pretrained(args.model).eval()
+
+    context = [{'text': ' '.join(f"fact{i % 97}" for i in range(args.context_words))}]
+    system_prompt = config_manager.get_system_prompt()
+    prompts = [f"{system_prompt}\n\n{q}" for q in (QUESTIONS * args.questions)[:args.questions]]
+
+    def first_token_times(inference):
+        times = []
+        for prompt in prompts:
+            context_text = inference.pack_context(prompt, context)['text']
+            prompt_tokens = len(tokenizer(context_text + "\n\n" + prompt)['input_ids'])
+            start = time.perf_counter()
+            inference.generate(prompt, max_length=prompt_tokens + 1, context=context)
+            times.append(time.perf_counter() - start)
+        return times
+
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    uncached = first_token_times(LLMInference(model, tokenizer, device, prefix_cache=False))
+    cached_inference = LLMInference(model, tokenizer, device, prefix_cache=PrefixKVCache())
+    cached = first_token_times(cached_inference)
+
+    print(f"uncached TTFT: median {median(uncached) * 1000:.1f} ms")
+    print(f"cached TTFT:   first {cached[0] * 1000:.1f} ms, median of rest {median(cached[1:] or cached) * 1000:.1f} ms")
+    print(f"speedup:       {median(uncached) / median(cached[1:] or cached):.2f}x")
+    print(cached_inference.prefix_cache.stats())
+
+
+if __name__ == '__main__':
+    main()
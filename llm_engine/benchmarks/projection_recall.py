@@ -0,0 +1,58 @@
+"""
+Recall-versus-dimension report for stored-vector projections
+
+Encodes a corpus, then measures recall@k of cosine search after PCA and
+Matryoshka truncation at several output dimensions, relative to search on the
+full model embeddings. With --save, fits a PCA projection at --dim on the
+corpus and writes it for use via EMBEDDING_PROJECTION_PATH.
+
+Usage:
+    python -m llm_engine.benchmarks.projection_recall [--model all-MiniLM-L6-v2]
+        [--corpus texts.txt] [--dims 64 96 128 192 256] [--k 10]
+        [--save projection.npz --dim 192]
+"""
+import argparse
+
+from .padding import mixed_corpus
+
+
+def main():
+    from llm_engine.embeddings.model_registry import get_embedding_model
+    from llm_engine.embeddings.length_bucketing import LengthBucketedEncoder
+    from llm_engine.embeddings.projection import PCAProjection, recall_report
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', default='all-MiniLM-L6-v2', help='Embedding model name')
+    parser.add_argument('--corpus', help='File with one text per line (defaults to a synthetic mix)')
+    parser.add_argument('--dims', type=int, nargs='+', default=[64, 96, 128, 192, 256], help='Output dimensions')
+    parser.add_argument('--k', type=int, default=10, help='Neighbourhood size for recall')
+    parser.add_argument('--fit-sample', type=int, help='Corpus rows used to fit PCA (default: all)')
+    parser.add_argument('--save', help='Write a PCA projection fitted at --dim to this path')
+    parser.add_argument('--dim', type=int, default=192, help='Output dimension of the saved projection')
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, 'r') as corpus_file:
+            texts = [line.strip() for line in corpus_file if line.strip()]
+    else:
+        texts = sorted(set(mixed_corpus(2048)))
+
+    model = get_embedding_model(args.model)
+    embeddings = LengthBucketedEncoder(model).encode(texts)
+    print(f"{len(texts)} texts, {embeddings.shape[1]} dimensions")
+
+    for method in ('pca', 'truncate'):
+        for row in recall_report(embeddings, dims=args.dims, k=args.k, method=method, fit_sample=args.fit_sample):
+            print(
+                f"{row['method']:<9} dim={row['dim']:<4} recall@{args.k}={row[f'recall@{args.k}']:.3f}  "
+                f"memory={row['memory_ratio']:.0%}"
+            )
+
+    if args.save:
+        projection = PCAProjection.fit(embeddings, args.dim, model_name=args.model)
+        projection.save(args.save)
+        print(f"Saved PCA projection ({embeddings.shape[1]} -> {args.dim}) to {args.save}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Memory and throughput of the local model with and without CPU quantization
+
+Loads the model in fp32 and compares weight memory and greedy decoding
+tokens/sec against dynamic int8 and bf16 variants.
+
+Usage:
+    python -m llm_engine.benchmarks.quantization [--model ./models/local_model] [--modes int8 bf16] [--new-tokens 32]
+"""
+import argparse
+
+
+def main():
+    from llm_engine.models.loader import load_local_model, quantization_report
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', help='Model name or path (defaults to models.local.model_path)')
+    parser.add_argument('--modes', nargs='+', default=['int8', 'bf16'], help='Quantization modes to compare')
+    parser.add_argument('--new-tokens', type=int, default=32, help='Tokens generated per throughput run')
+    args = parser.parse_args()
+
+    model, tokenizer = load_local_model(args.model, quantization='none')
+    report = quantization_report(model, tokenizer, modes=tuple(args.modes), new_tokens=args.new_tokens)
+
+    for mode, row in report.items():
+        print(
+            f"{mode:<5} weights {row['memory_bytes'] / 2 ** 20:8.1f} MiB ({row['memory_ratio']:.0%})   "
+            f"{row['tokens_per_second']:7.1f} tok/s ({row['speedup']:.2f}x)"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Latency of greedy generation with and without a draft model
+
+Generates the same prompts with plain greedy decoding and with speculative
+decoding, checks the outputs match, and reports per-request latency and the
+draft acceptance rate.
+
+Usage:
+    python -m llm_engine.benchmarks.speculative --model gpt2-medium --draft gpt2 [--new-tokens 64]
+"""
+import time
+import argparse
+from statistics import median
+
+PROMPTS = [
+    "The history of the printing press begins",
+    "To make a simple tomato sauce, first",
+    "The main difference between a list and a tuple in Python is",
+    "Once upon a time in a small village,"
+]
+
+
+def main():
+    from llm_engine.models.inference import LLMInference
+    from llm_engine.models.loader import load_local_model
+    from llm_engine.models.speculative import SpeculativeDecoder
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', required=True, help='Main model name or path')
+    parser.add_argument('--draft', required=True, help='Draft model name or path (same tokenizer)')
+    parser.add_argument('--new-tokens', type=int, default=64, help='Tokens generated per prompt')
+    parser.add_argument('--draft-tokens', type=int, default=4, help='Initial proposals per round')
+    args = parser.parse_args()
+
+    model, tokenizer = load_local_model(args.model, quantization='none')
+    draft_model, _ = load_local_model(args.draft, quantization='none')
+    # Fixed-length runs make latencies comparable
+    model.generation_config.eos_token_id = None
+
+    plain = LLMInference(model, tokenizer, 'cpu', prefix_cache=False, scheduler=False, speculative=False)
+    decoder = SpeculativeDecoder(model, draft_model, num_draft_tokens=args.draft_tokens)
+    assisted = LLMInference(model, tokenizer, 'cpu', prefix_cache=False, scheduler=False, speculative=decoder)
+
+    def run(inference):
+        latencies, outputs = [], []
+        for prompt in PROMPTS:
+            max_length = len(tokenizer(prompt)['input_ids']) + args.new_tokens
+            start = time.perf_counter()
+            outputs.append(inference.generate(prompt, max_length=max_length))
+            latencies.append(time.perf_counter() - start)
+        return latencies, outputs
+
+    plain_latencies, plain_outputs = run(plain)
+    assisted_latencies, assisted_outputs = run(assisted)
+    stats = decoder.stats()
+
+    print(f"plain:       median {median(plain_latencies) * 1000:.0f} ms per request")
+    print(f"speculative: median {median(assisted_latencies) * 1000:.0f} ms per request "
+          f"({median(plain_latencies) / median(assisted_latencies):.2f}x)")
+    print(f"acceptance rate {stats['acceptance_rate']:.0%}, "
+          f"{stats['tokens_per_main_pass']:.2f} tokens per main-model pass, "
+          f"outputs identical: {plain_outputs == assisted_outputs}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Startup benchmark for the embeddings package
+
+Measures, each in a fresh interpreter, the cost of importing the embeddings
+package lazily versus eagerly importing its heavy dependencies, and (when
+PINECONE_API_KEY is set) the time and control-plane calls of constructing
+PineconeEmbeddingManager with a cold and a warm index description cache.
+
+Usage:
+    python -m llm_engine.benchmarks.startup [--repeat 3]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from statistics import median
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+LAZY_IMPORT = """
+import sys, time, json
+start = time.perf_counter()
+from llm_engine.embeddings import PineconeEmbeddingManager, VectorStore, RAGRetriever
+elapsed = time.perf_counter() - start
+heavy = [m for m in ('torch', 'faiss', 'pinecone', 'sentence_transformers') if m in sys.modules]
+print(json.dumps({'seconds': elapsed, 'heavy_modules_loaded': heavy}))
+"""
+
+EAGER_IMPORT = """
+import sys, time, json
+start = time.perf_counter()
+import faiss, pinecone, torch
+import sentence_transformers
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'heavy_modules_loaded': ['torch', 'faiss', 'pinecone', 'sentence_transformers']}))
+"""
+
+CONSTRUCTION = """
+import os, time, json
+from llm_engine.embeddings import PineconeEmbeddingManager
+
+calls = {'list_indexes': 0, 'describe_index': 0}
+import pinecone
+for name in calls:
+    original = getattr(pinecone.Pinecone, name)
+    def counted(self, *args, _name=name, _original=original, **kwargs):
+        calls[_name] += 1
+        return _original(self, *args, **kwargs)
+    setattr(pinecone.Pinecone, name, counted)
+
+index_name = os.getenv('PINECONE_INDEX_NAME', 'test-index')
+results = []
+for label in ('cold', 'warm'):
+    before = dict(calls)
+    start = time.perf_counter()
+    PineconeEmbeddingManager(index_name=index_name)
+    results.append({
+        'cache': label,
+        'seconds': time.perf_counter() - start,
+        'control_plane_calls': sum(calls.values()) - sum(before.values())
+    })
+print(json.dumps(results))
+"""
+
+
+def _run(code: str) -> object:
+    """
+    Run a snippet in a fresh interpreter and parse its JSON output
+    
+    :param code: Python source to execute
+    :return: Parsed JSON result
+    """
+    output = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=REPO_ROOT,
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement')
+    args = parser.parse_args()
+
+    for label, code in (('lazy package import', LAZY_IMPORT), ('eager heavy imports', EAGER_IMPORT)):
+        try:
+            runs = [_run(code) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            print(f"{label:<22} failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        seconds = median(run['seconds'] for run in runs)
+        print(f"{label:<22} {seconds * 1000:8.1f} ms  heavy modules: {runs[0]['heavy_modules_loaded']}")
+
+    if not os.getenv('PINECONE_API_KEY'):
+        print("PINECONE_API_KEY not set; skipping construction benchmark")
+        return
+
+    for result in _run(CONSTRUCTION):
+        print(
+            f"construct ({result['cache']} cache) {result['seconds'] * 1000:8.1f} ms  "
+            f"control-plane calls: {result['control_plane_calls']}"
+        )
+
+
+if __name__ == '__main__':
+    main()
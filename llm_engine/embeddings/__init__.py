@@ -1,8 +1,43 @@
 # Embeddings Package
 # Provides functionality for generating and managing embeddings
+#
+# Submodules are imported lazily on attribute access so that light tools do not
+# pay for faiss, pinecone, sentence_transformers or torch at import time.
 
-from .pinecone_client import PineconeEmbeddingManager
-from .vector_store import VectorStore
-from .retriever import RAGRetriever
+import importlib
 
-__all__ = ['PineconeEmbeddingManager', 'VectorStore', 'RAGRetriever']
+_EXPORTS = {
+    'PineconeEmbeddingManager': '.pinecone_client',
+    'VectorStore': '.vector_store',
+    'RAGRetriever': '.retriever',
+    'EmbeddingService': '.embedding_service',
+    'get_embedding_service': '.embedding_service',
+    'MultiProcessEncodingPool': '.encoding_pool',
+    'PCAProjection': '.projection',
+    'MatryoshkaTruncation': '.projection',
+    'load_projection': '.projection',
+    'pack_embedding': '.stored_embeddings',
+    'unpack_embedding': '.stored_embeddings',
+    'load_embedding_matrix': '.stored_embeddings',
+    'VectorBackend': '.backends',
+    'LocalVectorBackend': '.backends',
+    'EmbeddingModelRegistry': '.model_registry',
+    'model_registry': '.model_registry',
+    'get_embedding_model': '.model_registry'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
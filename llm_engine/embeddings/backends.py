@@ -0,0 +1,577 @@
+import os
+import json
+import atexit
+import time
+import random
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Set, Union
+import numpy as np
+
+
+class VectorBackend(ABC):
+    """
+    Index operations used by PineconeEmbeddingManager
+
+    The method names and result shapes mirror the Pinecone ``Index`` client, so a
+    Pinecone index and any implementation of this class are interchangeable.
+    """
+
+    @abstractmethod
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = '') -> Dict[str, Any]:
+        """
+        Insert or overwrite vectors
+
+        :param vectors: Dictionaries with 'id', 'values' and optional 'metadata'
+        :param namespace: Namespace to write into
+        :return: Dictionary with 'upserted_count'
+        """
+
+    @abstractmethod
+    def query(
+        self,
+        vector: Union[List[float], np.ndarray],
+        top_k: int = 10,
+        namespace: str = '',
+        filter: Optional[Dict[str, Any]] = None,
+        include_values: bool = False,
+        include_metadata: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Nearest-neighbour search
+
+        :param vector: Query vector
+        :param top_k: Number of matches to return
+        :param namespace: Namespace to search
+        :param filter: Optional metadata filter (Pinecone filter syntax)
+        :param include_values: Include vector values in matches
+        :param include_metadata: Include metadata in matches
+        :return: Dictionary with 'matches' and 'namespace'
+        """
+
+    @abstractmethod
+    def fetch(self, ids: List[str], namespace: str = '') -> Dict[str, Any]:
+        """
+        Fetch vectors by ID
+
+        :param ids: Vector IDs
+        :param namespace: Namespace to fetch from
+        :return: Dictionary with 'vectors' keyed by ID and 'namespace'
+        """
+
+    @abstractmethod
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        namespace: str = '',
+        delete_all: bool = False,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Delete vectors by ID, by metadata filter, or the whole namespace
+
+        :param ids: Vector IDs to delete
+        :param namespace: Namespace to delete from
+        :param delete_all: Delete every vector in the namespace
+        :param filter: Delete vectors whose metadata matches this filter
+        :return: Empty dictionary
+        """
+
+    @abstractmethod
+    def describe_index_stats(self) -> Dict[str, Any]:
+        """
+        Index statistics
+
+        :return: Dictionary with 'dimension', 'total_vector_count' and 'namespaces'
+        """
+
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    """
+    Evaluate a single Pinecone filter operator against a metadata value
+
+    :param value: Metadata value (None when the field is missing)
+    :param operator: Filter operator such as '$eq' or '$in'
+    :param operand: Operator argument
+    :return: True if the value satisfies the operator
+    """
+    if operator == '$exists':
+        return (value is not None) == bool(operand)
+    if operator == '$eq':
+        return value in operand if isinstance(value, list) else value == operand
+    if operator == '$ne':
+        return operand not in value if isinstance(value, list) else value != operand
+    if operator == '$in':
+        if isinstance(value, list):
+            return any(item in operand for item in value)
+        return value in operand
+    if operator == '$nin':
+        if isinstance(value, list):
+            return not any(item in operand for item in value)
+        return value not in operand
+    if value is None:
+        return False
+    if operator == '$gt':
+        return value > operand
+    if operator == '$gte':
+        return value >= operand
+    if operator == '$lt':
+        return value < operand
+    if operator == '$lte':
+        return value <= operand
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Check metadata against a Pinecone-style filter
+
+    Supports $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $exists, $and, $or and
+    the implicit-equality shorthand ``{"field": value}``.
+
+    :param metadata: Vector metadata
+    :param filter: Filter dictionary (None or empty matches everything)
+    :return: True if the metadata matches
+    """
+    if not filter:
+        return True
+
+    for key, condition in filter.items():
+        if key == '$and':
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif not _compare(metadata.get(key), '$eq', condition):
+            return False
+
+    return True
+
+
+class _Namespace:
+    def __init__(self, dimension: int, capacity: int = 64):
+        """
+        Vectors, IDs and metadata of one namespace held in a growable matrix
+
+        :param dimension: Vector dimension
+        :param capacity: Initial row capacity
+        """
+        self.vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self.norms = np.zeros(capacity, dtype=np.float32)
+        self.ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, vector_id: str, values: np.ndarray, metadata: Dict[str, Any]):
+        row = self.rows.get(vector_id)
+        if row is None:
+            row = len(self.ids)
+            if row == self.vectors.shape[0]:
+                # Amortised growth keeps upserts O(1)
+                self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+                self.norms = np.concatenate([self.norms, np.zeros_like(self.norms)])
+            self.ids.append(vector_id)
+            self.metadata.append(metadata)
+            self.rows[vector_id] = row
+        else:
+            self.metadata[row] = metadata
+
+        self.vectors[row] = values
+        self.norms[row] = np.linalg.norm(values)
+
+    def delete(self, vector_id: str):
+        row = self.rows.pop(vector_id, None)
+        if row is None:
+            return
+
+        # Swap the last row into the hole so storage stays contiguous
+        last = len(self.ids) - 1
+        if row != last:
+            moved_id = self.ids[last]
+            self.vectors[row] = self.vectors[last]
+            self.norms[row] = self.norms[last]
+            self.ids[row] = moved_id
+            self.metadata[row] = self.metadata[last]
+            self.rows[moved_id] = row
+
+        self.ids.pop()
+        self.metadata.pop()
+
+
+class LocalVectorBackend(VectorBackend):
+    # Largest number of IDs accepted per fetch call, mirroring Pinecone's request limits
+    max_fetch_batch = 1000
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        metric: str = 'cosine',
+        persist_dir: Optional[str] = None,
+        latency_ms: float = 0.0,
+        latency_jitter_ms: float = 0.0,
+        seed: int = 0,
+        autosave: bool = False,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        In-process, disk-persisted stand-in for a Pinecone index
+
+        :param dimension: Vector dimension (inferred from the first upsert if omitted)
+        :param metric: Similarity metric ('cosine', 'dotproduct' or 'euclidean')
+        :param persist_dir: Directory to persist namespaces to (in-memory only if None)
+        :param latency_ms: Fixed latency injected into every call
+        :param latency_jitter_ms: Uniform random jitter added on top of latency_ms
+        :param seed: Seed for the jitter generator, so runs are reproducible
+        :param autosave: Save the changed namespace after every mutating call. Each save
+                         rewrites the whole namespace, so leave this off for bulk loads and
+                         call save() once they finish (unsaved changes are saved at exit)
+        :param logger: Optional logger for tracking operations
+        """
+        if metric not in ('cosine', 'dotproduct', 'euclidean'):
+            raise ValueError(f"Unsupported metric: {metric}")
+
+        self.dimension = dimension
+        self.metric = metric
+        self.persist_dir = persist_dir
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.autosave = autosave
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._namespaces: Dict[str, _Namespace] = {}
+        # Namespaces changed since they were last saved
+        self._dirty: Set[str] = set()
+
+        if self.persist_dir:
+            os.makedirs(self.persist_dir, exist_ok=True)
+            self.load()
+            if not self.autosave:
+                atexit.register(self.save)
+
+    def _inject_latency(self):
+        """
+        Sleep for the configured latency to emulate a network round trip
+        """
+        if self.latency_ms <= 0 and self.latency_jitter_ms <= 0:
+            return
+        with self._lock:
+            jitter = self._random.uniform(0, self.latency_jitter_ms) if self.latency_jitter_ms > 0 else 0.0
+        time.sleep((self.latency_ms + jitter) / 1000.0)
+
+    def _as_vector(self, values: Union[List[float], np.ndarray]) -> np.ndarray:
+        """
+        Convert values to a float32 vector, fixing the dimension on first use
+
+        :param values: Vector values
+        :return: 1-D float32 array
+        """
+        vector = np.asarray(values, dtype=np.float32).reshape(-1)
+        if self.dimension is None:
+            self.dimension = vector.shape[0]
+        elif vector.shape[0] != self.dimension:
+            raise ValueError(
+                f"Vector dimension {vector.shape[0]} does not match index dimension {self.dimension}"
+            )
+        return vector
+
+    def _namespace(self, namespace: str, create: bool = False) -> Optional[_Namespace]:
+        if namespace not in self._namespaces and create:
+            self._namespaces[namespace] = _Namespace(self.dimension)
+        return self._namespaces.get(namespace)
+
+    def _scores(self, store: _Namespace, queries: np.ndarray) -> np.ndarray:
+        """
+        Similarity scores of queries against every row of a namespace
+
+        :param store: Namespace storage
+        :param queries: Query matrix of shape (q, dimension)
+        :return: Score matrix of shape (q, rows); higher is better except for euclidean
+        """
+        count = len(store)
+        vectors = store.vectors[:count]
+        dots = queries @ vectors.T
+
+        if self.metric == 'dotproduct':
+            return dots
+        if self.metric == 'cosine':
+            query_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            denominator = query_norms * store.norms[:count][None, :]
+            return np.divide(dots, denominator, out=np.zeros_like(dots), where=denominator > 0)
+
+        # Squared euclidean distance, as reported by Pinecone
+        query_sq = np.sum(queries * queries, axis=1, keepdims=True)
+        return np.maximum(query_sq + (store.norms[:count] ** 2)[None, :] - 2 * dots, 0.0)
+
+    def _top_k(
+        self,
+        store: _Namespace,
+        scores: np.ndarray,
+        candidates: np.ndarray,
+        top_k: int,
+        include_values: bool,
+        include_metadata: bool
+    ) -> List[Dict[str, Any]]:
+        """
+        Select the best top_k candidate rows for one query
+
+        :param store: Namespace storage
+        :param scores: Scores for every row in the namespace
+        :param candidates: Row indices allowed by the filter
+        :param top_k: Number of matches to return
+        :param include_values: Include vector values
+        :param include_metadata: Include metadata
+        :return: List of match dictionaries
+        """
+        if candidates.size == 0 or top_k <= 0:
+            return []
+
+        candidate_scores = scores[candidates]
+        ranking = candidate_scores if self.metric == 'euclidean' else -candidate_scores
+        k = min(top_k, candidates.size)
+        best = np.argpartition(ranking, k - 1)[:k]
+        best = best[np.argsort(ranking[best], kind='stable')]
+
+        matches = []
+        for position in best:
+            row = int(candidates[position])
+            match = {'id': store.ids[row], 'score': float(candidate_scores[position])}
+            if include_values:
+                match['values'] = store.vectors[row].tolist()
+            if include_metadata:
+                match['metadata'] = dict(store.metadata[row])
+            matches.append(match)
+        return matches
+
+    def _candidates(self, store: _Namespace, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        Row indices whose metadata matches the filter
+
+        :param store: Namespace storage
+        :param filter: Metadata filter
+        :return: Integer array of row indices
+        """
+        if not filter:
+            return np.arange(len(store))
+        return np.array(
+            [row for row, metadata in enumerate(store.metadata) if matches_filter(metadata, filter)],
+            dtype=np.int64
+        )
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = '') -> Dict[str, Any]:
+        self._inject_latency()
+        if not vectors:
+            return {'upserted_count': 0}
+
+        with self._lock:
+            prepared = [
+                (str(vector['id']), self._as_vector(vector['values']), dict(vector.get('metadata') or {}))
+                for vector in vectors
+            ]
+            store = self._namespace(namespace, create=True)
+            for vector_id, values, metadata in prepared:
+                store.upsert(vector_id, values, metadata)
+
+            self._dirty.add(namespace)
+            if self.autosave:
+                self.save(namespace)
+
+        return {'upserted_count': len(prepared)}
+
+    def query(
+        self,
+        vector: Union[List[float], np.ndarray],
+        top_k: int = 10,
+        namespace: str = '',
+        filter: Optional[Dict[str, Any]] = None,
+        include_values: bool = False,
+        include_metadata: bool = True
+    ) -> Dict[str, Any]:
+        return self.query_batch(
+            [vector],
+            top_k=top_k,
+            namespace=namespace,
+            filter=filter,
+            include_values=include_values,
+            include_metadata=include_metadata
+        )[0]
+
+    def query_batch(
+        self,
+        vectors: Union[List[List[float]], np.ndarray],
+        top_k: int = 10,
+        namespace: str = '',
+        filter: Optional[Dict[str, Any]] = None,
+        include_values: bool = False,
+        include_metadata: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Search several query vectors in one call (one injected round trip)
+
+        :param vectors: Query vectors
+        :param top_k: Number of matches per query
+        :param namespace: Namespace to search
+        :param filter: Optional metadata filter applied to every query
+        :param include_values: Include vector values in matches
+        :param include_metadata: Include metadata in matches
+        :return: One result dictionary per query, in input order
+        """
+        self._inject_latency()
+        with self._lock:
+            queries = np.asarray(vectors, dtype=np.float32)
+            if queries.ndim == 1:
+                queries = queries.reshape(1, -1)
+
+            store = self._namespace(namespace)
+            if store is None or len(store) == 0:
+                return [{'matches': [], 'namespace': namespace} for _ in range(queries.shape[0])]
+
+            if queries.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Vector dimension {queries.shape[1]} does not match index dimension {self.dimension}"
+                )
+
+            candidates = self._candidates(store, filter)
+            scores = self._scores(store, queries)
+
+            return [
+                {
+                    'matches': self._top_k(store, row_scores, candidates, top_k, include_values, include_metadata),
+                    'namespace': namespace
+                }
+                for row_scores in scores
+            ]
+
+    def fetch(self, ids: List[str], namespace: str = '') -> Dict[str, Any]:
+        self._inject_latency()
+        with self._lock:
+            store = self._namespace(namespace)
+            vectors = {}
+            if store is not None:
+                for vector_id in ids:
+                    row = store.rows.get(str(vector_id))
+                    if row is not None:
+                        vectors[vector_id] = {
+                            'id': vector_id,
+                            'values': store.vectors[row].tolist(),
+                            'metadata': dict(store.metadata[row])
+                        }
+        return {'vectors': vectors, 'namespace': namespace}
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        namespace: str = '',
+        delete_all: bool = False,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        self._inject_latency()
+        with self._lock:
+            store = self._namespace(namespace)
+            if store is None:
+                return {}
+
+            if delete_all:
+                del self._namespaces[namespace]
+            else:
+                doomed = [str(vector_id) for vector_id in ids or []]
+                if filter:
+                    doomed.extend(
+                        store.ids[row] for row in self._candidates(store, filter)
+                    )
+                for vector_id in doomed:
+                    store.delete(vector_id)
+
+            self._dirty.add(namespace)
+            if self.autosave:
+                self.save(namespace)
+
+        return {}
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        self._inject_latency()
+        with self._lock:
+            namespaces = {
+                name: {'vector_count': len(store)}
+                for name, store in self._namespaces.items()
+            }
+        return {
+            'dimension': self.dimension,
+            'index_fullness': 0.0,
+            'total_vector_count': sum(ns['vector_count'] for ns in namespaces.values()),
+            'namespaces': namespaces
+        }
+
+    def _namespace_path(self, namespace: str) -> str:
+        # Hex-encode so any namespace string is a safe file name
+        return os.path.join(self.persist_dir, f"ns_{namespace.encode('utf-8').hex()}.npz")
+
+    def save(self, namespace: Optional[str] = None):
+        """
+        Persist one namespace, or every namespace changed since the last save, to persist_dir
+
+        Each namespace is a single file (vectors plus JSON metadata) written under a
+        temporary name and renamed into place, so a crash leaves either the old or
+        the new namespace on disk, never a mix of both.
+
+        :param namespace: Namespace to save (None saves every changed namespace)
+        """
+        if not self.persist_dir:
+            return
+
+        with self._lock:
+            names = list(self._dirty) if namespace is None else [namespace]
+            for name in names:
+                store = self._namespaces.get(name)
+                path = self._namespace_path(name)
+
+                if store is None:
+                    if os.path.exists(path):
+                        os.remove(path)
+                else:
+                    meta = {
+                        'namespace': name,
+                        'dimension': self.dimension,
+                        'metric': self.metric,
+                        'ids': store.ids,
+                        'metadata': store.metadata
+                    }
+                    with open(path + '.tmp', 'wb') as namespace_file:
+                        np.savez(namespace_file, vectors=store.vectors[:len(store)], meta=np.array(json.dumps(meta)))
+                    os.replace(path + '.tmp', path)
+                self._dirty.discard(name)
+
+    def load(self):
+        """
+        Load every namespace persisted in persist_dir
+        """
+        if not self.persist_dir:
+            return
+
+        with self._lock:
+            for file_name in sorted(os.listdir(self.persist_dir)):
+                if not (file_name.startswith('ns_') and file_name.endswith('.npz')):
+                    continue
+
+                with np.load(os.path.join(self.persist_dir, file_name), allow_pickle=False) as saved:
+                    vectors = saved['vectors']
+                    meta = json.loads(str(saved['meta']))
+
+                if self.dimension is None:
+                    self.dimension = meta['dimension']
+                store = _Namespace(self.dimension, capacity=max(len(meta['ids']), 64))
+                for vector_id, values, metadata in zip(meta['ids'], vectors, meta['metadata']):
+                    store.upsert(vector_id, values, metadata)
+                self._namespaces[meta['namespace']] = store
+
+            self.logger.info(f"Loaded {len(self._namespaces)} namespaces from {self.persist_dir}")
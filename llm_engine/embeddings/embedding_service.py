@@ -0,0 +1,318 @@
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Tuple, Union
+import numpy as np
+from .model_registry import EmbeddingModelRegistry, model_registry
+
+
+def convert_embeddings(
+    embeddings: np.ndarray,
+    normalize_embeddings: bool = False,
+    convert_to_numpy: bool = True,
+    convert_to_tensor: bool = False
+) -> Any:
+    """
+    Shape float32 embeddings the way SentenceTransformer.encode returns them
+
+    :param embeddings: Float32 embeddings (1-D for a single text, 2-D otherwise)
+    :param normalize_embeddings: L2-normalize the embeddings
+    :param convert_to_numpy: Return a numpy array (a list of tensors when False)
+    :param convert_to_tensor: Return a torch tensor; overrides convert_to_numpy
+    :return: Embeddings in the requested form
+    """
+    if normalize_embeddings:
+        norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+
+    if convert_to_tensor:
+        import torch
+        return torch.from_numpy(np.ascontiguousarray(embeddings))
+    if not convert_to_numpy:
+        import torch
+        if embeddings.ndim == 1:
+            return torch.from_numpy(embeddings.copy())
+        return [torch.from_numpy(row.copy()) for row in embeddings]
+    return embeddings
+
+
+class _EmbeddingRequest:
+    __slots__ = ('texts', 'single', 'future', 'enqueued_at')
+
+    def __init__(self, texts: List[str], single: bool):
+        self.texts = texts
+        self.single = single
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingService:
+    def __init__(
+        self,
+        model: Optional[Any] = None,
+        model_name: str = 'all-MiniLM-L6-v2',
+        registry: Optional[EmbeddingModelRegistry] = None,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        latency_window: int = 1024,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        In-process embedding service that batches texts across concurrent callers
+
+        Callers enqueue texts and wait on a future. A worker thread gathers pending
+        texts for up to max_wait_ms, sorts them by length, encodes them in batches
+        of at most max_batch_size and hands each caller its own rows. The service
+        exposes the SentenceTransformer ``encode`` interface, so it can be used
+        wherever a model is expected.
+
+        :param model: Optional loaded model (otherwise resolved through the registry)
+        :param model_name: Name of the embedding model
+        :param registry: Model registry to load from (defaults to the process-wide one)
+        :param max_batch_size: Largest number of texts encoded in one forward pass
+        :param max_wait_ms: Longest time the first request of a batch waits for company
+        :param latency_window: Number of recent requests kept for latency percentiles
+        :param logger: Optional logger for tracking operations
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.model_name = model_name
+        self.registry = registry or model_registry
+        self._model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._queue: 'queue.Queue[Optional[_EmbeddingRequest]]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+        # Metrics
+        self._queue_latencies = deque(maxlen=latency_window)
+        self._requests = 0
+        self._texts = 0
+        self._batches = 0
+        self._encode_time_s = 0.0
+
+    @property
+    def model(self) -> Any:
+        """
+        Underlying embedding model, loaded on first access
+        """
+        if self._model is None:
+            self._model = self.registry.get(self.model_name)
+        return self._model
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """
+        Embedding dimension of the underlying model
+
+        :return: Embedding dimension
+        """
+        return self.model.get_sentence_embedding_dimension()
+
+    def submit(self, texts: Union[str, List[str]]) -> Future:
+        """
+        Queue texts for encoding
+
+        :param texts: A text or list of texts
+        :return: Future resolving to a float32 array (1-D for a single text)
+        """
+        single = isinstance(texts, str)
+        request = _EmbeddingRequest([texts] if single else list(texts), single)
+
+        # Enqueue under the lock so nothing can land behind close()'s sentinel
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("EmbeddingService is closed")
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='embedding-service', daemon=True)
+                self._worker.start()
+            self._queue.put(request)
+
+        return request.future
+
+    def encode(
+        self,
+        texts: Union[str, List[str]],
+        batch_size: Optional[int] = None,
+        show_progress_bar: Optional[bool] = None,
+        normalize_embeddings: bool = False,
+        convert_to_numpy: bool = True,
+        convert_to_tensor: bool = False,
+        **kwargs
+    ) -> Any:
+        """
+        Encode texts through the batching queue and wait for the result
+
+        Mirrors SentenceTransformer.encode for the arguments that shape the
+        result. batch_size and show_progress_bar are accepted but have no
+        effect, since batches are formed across callers by the service. Any
+        other argument raises TypeError rather than being silently dropped.
+
+        :param texts: A text or list of texts
+        :param batch_size: Ignored; batching is controlled by the service
+        :param show_progress_bar: Ignored
+        :param normalize_embeddings: L2-normalize the returned embeddings
+        :param convert_to_numpy: Return a numpy array (a list of tensors when False)
+        :param convert_to_tensor: Return a torch tensor; overrides convert_to_numpy
+        :return: Float32 embeddings (1-D for a single text, 2-D otherwise)
+        """
+        if kwargs:
+            raise TypeError(f"EmbeddingService.encode() got unsupported arguments: {', '.join(sorted(kwargs))}")
+
+        return convert_embeddings(
+            self.submit(texts).result(), normalize_embeddings, convert_to_numpy, convert_to_tensor
+        )
+
+    def _collect(self, first: _EmbeddingRequest) -> Tuple[List[_EmbeddingRequest], bool]:
+        """
+        Gather requests until max_batch_size texts are pending or max_wait_ms passes
+
+        :param first: Request that opened the batch
+        :return: Collected requests and whether a shutdown sentinel was seen
+        """
+        requests = [first]
+        pending_texts = len(first.texts)
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+
+        while pending_texts < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                return requests, True
+            requests.append(request)
+            pending_texts += len(request.texts)
+
+        return requests, False
+
+    def _run(self):
+        """
+        Worker loop: collect requests, encode them in length-sorted batches
+        """
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            requests, stop = self._collect(first)
+            self._process(requests)
+
+            if stop:
+                return
+
+    def _process(self, requests: List[_EmbeddingRequest]):
+        """
+        Encode all texts of the collected requests and resolve their futures
+
+        :param requests: Requests to serve
+        """
+        started_at = time.perf_counter()
+
+        # Flatten to (request index, row) pairs and sort by length so batches pad little
+        owners = [(r, row) for r, request in enumerate(requests) for row in range(len(request.texts))]
+        texts = [requests[r].texts[row] for r, row in owners]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+        try:
+            model = self.model
+            dimension = model.get_sentence_embedding_dimension()
+            outputs = [np.empty((len(request.texts), dimension), dtype=np.float32) for request in requests]
+
+            batches = 0
+            for start in range(0, len(order), self.max_batch_size):
+                positions = order[start:start + self.max_batch_size]
+                embeddings = np.asarray(
+                    model.encode([texts[i] for i in positions], batch_size=len(positions)),
+                    dtype=np.float32
+                )
+                for i, embedding in zip(positions, embeddings):
+                    r, row = owners[i]
+                    outputs[r][row] = embedding
+                batches += 1
+        except Exception as e:
+            self.logger.error(f"Embedding batch failed: {e}")
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        encode_time = time.perf_counter() - started_at
+        with self._lock:
+            self._requests += len(requests)
+            self._texts += len(texts)
+            self._batches += batches
+            self._encode_time_s += encode_time
+            self._queue_latencies.extend(started_at - request.enqueued_at for request in requests)
+
+        for request, output in zip(requests, outputs):
+            request.future.set_result(output[0] if request.single else output)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queue latency and batch-fill metrics
+
+        :return: Statistics dictionary
+        """
+        with self._lock:
+            latencies = np.array(self._queue_latencies, dtype=np.float64) * 1000.0
+            batches = self._batches
+            texts = self._texts
+            return {
+                'requests': self._requests,
+                'texts': texts,
+                'batches': batches,
+                'mean_batch_size': texts / batches if batches else 0.0,
+                'batch_fill_ratio': texts / (batches * self.max_batch_size) if batches else 0.0,
+                'queue_latency_ms': {
+                    'mean': float(latencies.mean()) if latencies.size else 0.0,
+                    'p50': float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+                    'p95': float(np.percentile(latencies, 95)) if latencies.size else 0.0
+                },
+                'encode_time_s': self._encode_time_s,
+                'pending': self._queue.qsize()
+            }
+
+    def close(self):
+        """
+        Stop the worker after it drains already-queued requests
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+            if worker is not None and worker.is_alive():
+                self._queue.put(None)
+
+        if worker is not None:
+            worker.join()
+
+
+# Services shared across components, keyed by normalized model name
+_shared_services: Dict[str, EmbeddingService] = {}
+_shared_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: str = 'all-MiniLM-L6-v2', **kwargs) -> EmbeddingService:
+    """
+    Get the process-wide embedding service for a model, creating it on first use
+
+    :param model_name: Name of the embedding model
+    :param kwargs: Extra EmbeddingService arguments used when creating the service
+    :return: Shared EmbeddingService
+    """
+    key = EmbeddingModelRegistry.normalize_name(model_name)
+    with _shared_services_lock:
+        if key not in _shared_services:
+            _shared_services[key] = EmbeddingService(model_name=model_name, **kwargs)
+        return _shared_services[key]
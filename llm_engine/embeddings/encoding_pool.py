@@ -0,0 +1,367 @@
+import os
+import time
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Optional, Callable
+import numpy as np
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to a parent-owned shared memory block without taking ownership
+
+    :param name: Shared memory block name
+    :return: Attached SharedMemory
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block again, but workers share
+        # the parent's resource tracker, so the parent's unlink still owns cleanup
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_main(
+    worker_id: int,
+    model_name: str,
+    model_loader: Optional[Callable[[str], Any]],
+    batch_size: int,
+    num_threads: Optional[int],
+    task_queue: 'multiprocessing.Queue',
+    result_queue: 'multiprocessing.Queue'
+):
+    """
+    Encoding worker: load the model once, then encode shards into shared memory
+
+    Tasks are (job_id, shm_name, dimension, rows, row_indices, texts) tuples;
+    None stops the worker.
+    """
+    try:
+        if num_threads:
+            try:
+                import torch
+                torch.set_num_threads(num_threads)
+            except ImportError:
+                pass
+
+        if model_loader is None:
+            from llm_engine.embeddings.model_registry import get_embedding_model
+            model = get_embedding_model(model_name)
+        else:
+            model = model_loader(model_name)
+        result_queue.put(('ready', worker_id, model.get_sentence_embedding_dimension()))
+    except Exception as e:
+        result_queue.put(('failed', worker_id, f"{type(e).__name__}: {e}"))
+        return
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            return
+
+        job_id, shm_name, dimension, rows, row_indices, texts = task
+        start = time.perf_counter()
+        try:
+            block = _attach_shared_memory(shm_name)
+            try:
+                output = np.ndarray((rows, dimension), dtype=np.float32, buffer=block.buf)
+                output[row_indices] = np.asarray(
+                    model.encode(texts, batch_size=batch_size),
+                    dtype=np.float32
+                )
+                del output
+            finally:
+                block.close()
+            result_queue.put(('done', worker_id, job_id, len(texts), time.perf_counter() - start))
+        except Exception as e:
+            result_queue.put(('error', worker_id, job_id, f"{type(e).__name__}: {e}"))
+
+
+class MultiProcessEncodingPool:
+    def __init__(
+        self,
+        model_name: str = 'all-MiniLM-L6-v2',
+        num_workers: Optional[int] = None,
+        shard_size: int = 256,
+        batch_size: int = 32,
+        threads_per_worker: Optional[int] = None,
+        model_loader: Optional[Callable[[str], Any]] = None,
+        start_method: str = 'spawn',
+        task_timeout: float = 600.0,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Pool of encoding processes for bulk ingestion and full re-syncs
+
+        Each worker loads the model once. Texts are sorted by length and split
+        into shards, so each shard pads to a similar length. Workers write their
+        rows straight into a shared memory block; only the input texts cross
+        the process boundary. encode may be called from several threads at
+        once: a dispatcher thread routes each worker message to the job it
+        belongs to, so concurrent jobs share the workers.
+
+        :param model_name: Name of the embedding model
+        :param num_workers: Number of worker processes (defaults to half the CPU count)
+        :param shard_size: Texts per task sent to a worker
+        :param batch_size: Batch size used by each worker's model.encode
+        :param threads_per_worker: Torch intra-op threads per worker (defaults to cpus / workers)
+        :param model_loader: Optional picklable callable loading a model by name
+                             (defaults to the worker's shared model registry)
+        :param start_method: Multiprocessing start method ('spawn' is safe with torch)
+        :param task_timeout: Seconds to wait for any worker progress before failing
+        :param logger: Optional logger for tracking operations
+        """
+        cpu_count = os.cpu_count() or 2
+        self.model_name = model_name
+        self.num_workers = num_workers or max(1, cpu_count // 2)
+        self.shard_size = shard_size
+        self.batch_size = batch_size
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        self.model_loader = model_loader
+        self.task_timeout = task_timeout
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._context = multiprocessing.get_context(start_method)
+        self._task_queue = None
+        self._result_queue = None
+        self._processes: List[multiprocessing.Process] = []
+        self._job_ids = itertools.count()
+        self.dimension: Optional[int] = None
+
+        # Results are routed from the shared result queue to per-job mailboxes
+        self._lifecycle_lock = threading.RLock()
+        self._lock = threading.Lock()
+        self._mailboxes: Dict[int, 'queue.Queue[tuple]'] = {}
+        self._dispatcher: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._failure: Optional[str] = None
+
+        # Per-worker throughput counters
+        self._worker_stats: Dict[int, Dict[str, float]] = {}
+
+    def __enter__(self) -> 'MultiProcessEncodingPool':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._processes)
+
+    def start(self):
+        """
+        Spawn the workers and wait until each has loaded the model
+        """
+        with self._lifecycle_lock:
+            if self.running:
+                return
+
+            self._task_queue = self._context.Queue()
+            self._result_queue = self._context.Queue()
+            self._failure = None
+            self._stopping.clear()
+            for worker_id in range(self.num_workers):
+                process = self._context.Process(
+                    target=_worker_main,
+                    args=(
+                        worker_id,
+                        self.model_name,
+                        self.model_loader,
+                        self.batch_size,
+                        self.threads_per_worker,
+                        self._task_queue,
+                        self._result_queue
+                    ),
+                    name=f'encoding-worker-{worker_id}',
+                    daemon=True
+                )
+                process.start()
+                self._processes.append(process)
+                self._worker_stats[worker_id] = {'texts': 0, 'shards': 0, 'busy_seconds': 0.0}
+
+            start = time.perf_counter()
+            for _ in range(self.num_workers):
+                message = self._next_result()
+                if message[0] == 'failed':
+                    self.close()
+                    raise RuntimeError(f"Encoding worker {message[1]} failed to load model: {message[2]}")
+                self.dimension = message[2]
+
+            self._dispatcher = threading.Thread(target=self._dispatch, name='encoding-dispatcher', daemon=True)
+            self._dispatcher.start()
+
+        self.logger.info(
+            f"Started {self.num_workers} encoding workers for '{self.model_name}' "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+    def _next_result(self) -> tuple:
+        """
+        Wait for the next worker message during startup, failing if workers die or stall
+
+        :return: Worker message tuple
+        """
+        deadline = time.monotonic() + self.task_timeout
+        while True:
+            try:
+                return self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                dead = [p.name for p in self._processes if not p.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Encoding workers exited unexpectedly: {dead}")
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Timed out waiting for encoding workers")
+
+    def _dispatch(self):
+        """
+        Dispatcher loop: hand each worker message to the mailbox of its job
+        """
+        while not self._stopping.is_set():
+            try:
+                message = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                dead = [p.name for p in self._processes if not p.is_alive()]
+                if dead:
+                    self._failure = f"Encoding workers exited unexpectedly: {dead}"
+                continue
+            except (EOFError, OSError, ValueError):
+                # Queue closed by close()
+                return
+
+            with self._lock:
+                mailbox = self._mailboxes.get(message[2])
+            # Messages of abandoned (failed or timed-out) jobs have no mailbox
+            if mailbox is not None:
+                mailbox.put(message)
+
+    def _next_job_result(self, mailbox: 'queue.Queue[tuple]') -> tuple:
+        """
+        Wait for the next message of one job, failing if workers die or stall
+
+        :param mailbox: The job's mailbox
+        :return: Worker message tuple
+        """
+        deadline = time.monotonic() + self.task_timeout
+        while True:
+            try:
+                return mailbox.get(timeout=1.0)
+            except queue.Empty:
+                if self._failure is not None:
+                    raise RuntimeError(self._failure)
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Timed out waiting for encoding workers")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts across the worker processes
+
+        Safe to call from several threads; their shards are interleaved on the workers.
+
+        :param texts: Texts to encode
+        :return: Float32 embeddings of shape (len(texts), dimension), in input order
+        """
+        if not self.running:
+            self.start()
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        rows = len(texts)
+        mailbox: 'queue.Queue[tuple]' = queue.Queue()
+        with self._lock:
+            job_id = next(self._job_ids)
+            self._mailboxes[job_id] = mailbox
+
+        block = shared_memory.SharedMemory(create=True, size=rows * self.dimension * 4)
+        try:
+            order = sorted(range(rows), key=lambda i: len(texts[i]))
+            shards = [order[i:i + self.shard_size] for i in range(0, rows, self.shard_size)]
+
+            # Longest shards first so the slowest work starts earliest
+            for shard in reversed(shards):
+                self._task_queue.put((
+                    job_id,
+                    block.name,
+                    self.dimension,
+                    rows,
+                    np.asarray(shard, dtype=np.int64),
+                    [texts[i] for i in shard]
+                ))
+
+            remaining = len(shards)
+            while remaining:
+                kind, worker_id, _, *details = self._next_job_result(mailbox)
+                if kind == 'error':
+                    raise RuntimeError(f"Encoding worker {worker_id} failed: {details[0]}")
+
+                with self._lock:
+                    stats = self._worker_stats[worker_id]
+                    stats['texts'] += details[0]
+                    stats['shards'] += 1
+                    stats['busy_seconds'] += details[1]
+                remaining -= 1
+
+            return np.array(
+                np.ndarray((rows, self.dimension), dtype=np.float32, buffer=block.buf)
+            )
+        finally:
+            with self._lock:
+                del self._mailboxes[job_id]
+            block.close()
+            block.unlink()
+
+    def throughput_report(self) -> List[Dict[str, Any]]:
+        """
+        Per-worker throughput since the pool started
+
+        :return: One dictionary per worker with texts, shards, busy seconds and texts/s
+        """
+        return [
+            {
+                'worker': worker_id,
+                'texts': int(stats['texts']),
+                'shards': int(stats['shards']),
+                'busy_seconds': stats['busy_seconds'],
+                'texts_per_second': stats['texts'] / stats['busy_seconds'] if stats['busy_seconds'] else 0.0
+            }
+            for worker_id, stats in sorted(self._worker_stats.items())
+        ]
+
+    def close(self, timeout: float = 30.0):
+        """
+        Stop the workers, waiting for in-flight shards before terminating stragglers
+
+        :param timeout: Seconds to wait for workers to exit gracefully
+        """
+        with self._lifecycle_lock:
+            self._close(timeout)
+
+    def _close(self, timeout: float):
+        if not self._processes:
+            return
+
+        for _ in self._processes:
+            self._task_queue.put(None)
+
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                self.logger.warning(f"Terminating unresponsive encoding worker {process.name}")
+                process.terminate()
+                process.join()
+
+        self._stopping.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+            self._dispatcher = None
+
+        self._task_queue.close()
+        self._result_queue.close()
+        self._processes = []
+        self.logger.info("Encoding pool stopped")
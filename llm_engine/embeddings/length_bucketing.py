@@ -0,0 +1,234 @@
+import threading
+import logging
+from typing import List, Dict, Any, Optional, Sequence, Union
+import numpy as np
+from .embedding_service import convert_embeddings
+
+# Token-length bucket upper bounds; a batch never mixes texts from different buckets
+DEFAULT_BUCKET_BOUNDARIES = (16, 32, 64, 128, 256, 512)
+
+
+def padded_tokens(lengths: Sequence[int], batch_size: int) -> int:
+    """
+    Tokens processed when lengths are batched in the given order
+
+    Each batch pads every sequence to the longest one in that batch.
+
+    :param lengths: Token length of each text, in batching order
+    :param batch_size: Texts per batch
+    :return: Total tokens including padding
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    return int(sum(
+        lengths[start:start + batch_size].max() * len(lengths[start:start + batch_size])
+        for start in range(0, len(lengths), batch_size)
+    ))
+
+
+def encode_order_padded_tokens(texts: Sequence[str], lengths: Sequence[int], batch_size: int) -> int:
+    """
+    Tokens processed by SentenceTransformer.encode's own batching
+
+    encode already sorts a call's texts by descending character length before
+    batching, so this is the baseline bucketing has to beat.
+
+    :param texts: Texts of one encode call
+    :param lengths: Token length of each text
+    :param batch_size: Texts per batch
+    :return: Total tokens including padding
+    """
+    order = np.argsort([-len(text) for text in texts], kind='stable')
+    return padded_tokens(np.asarray(lengths, dtype=np.int64)[order], batch_size)
+
+
+class LengthBucketedEncoder:
+    def __init__(
+        self,
+        model: Any,
+        batch_size: int = 32,
+        bucket_boundaries: Sequence[int] = DEFAULT_BUCKET_BOUNDARIES,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Encoding front-end that batches texts of similar token length together
+
+        Texts are tokenized once to measure their length, grouped into length
+        buckets, encoded bucket by bucket in batches padded only to their own
+        longest member, and returned in the original order. Wraps any model with
+        the SentenceTransformer ``encode`` interface.
+
+        Calls with at most batch_size texts form a single batch either way, so
+        they go straight to the model without the extra tokenization pass.
+
+        :param model: Embedding model (SentenceTransformer, OnnxEmbeddingModel, ...)
+        :param batch_size: Largest number of texts per encode call
+        :param bucket_boundaries: Ascending token-length upper bounds of the buckets
+        :param logger: Optional logger for tracking operations
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.bucket_boundaries = tuple(sorted(bucket_boundaries))
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._real_tokens = 0
+        self._padded_tokens = 0
+        self._baseline_padded_tokens = 0
+        self._texts = 0
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        return getattr(self.model, 'max_seq_length', None)
+
+    def token_lengths(self, texts: List[str]) -> np.ndarray:
+        """
+        Token length of each text as the model will see it (after truncation)
+
+        Falls back to whitespace word counts when the model has no tokenizer.
+
+        :param texts: Texts to measure
+        :return: Integer array of lengths
+        """
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        max_length = self.max_seq_length
+
+        if tokenizer is None:
+            lengths = np.array([len(text.split()) + 2 for text in texts], dtype=np.int64)
+        else:
+            encoded = tokenizer(
+                texts,
+                add_special_tokens=True,
+                truncation=max_length is not None,
+                max_length=max_length,
+                return_attention_mask=False,
+                return_token_type_ids=False
+            )
+            lengths = np.array([len(ids) for ids in encoded['input_ids']], dtype=np.int64)
+
+        if max_length is not None:
+            lengths = np.minimum(lengths, max_length)
+        return lengths
+
+    def plan_batches(self, lengths: np.ndarray) -> List[np.ndarray]:
+        """
+        Split text positions into length-homogeneous batches
+
+        :param lengths: Token length of each text
+        :return: List of position arrays, one per batch
+        """
+        order = np.argsort(lengths, kind='stable')
+        bucket_ids = np.searchsorted(self.bucket_boundaries, lengths[order], side='left')
+
+        batches = []
+        for bucket in np.unique(bucket_ids):
+            members = order[bucket_ids == bucket]
+            batches.extend(
+                members[start:start + self.batch_size]
+                for start in range(0, len(members), self.batch_size)
+            )
+        return batches
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: Optional[int] = None,
+        show_progress_bar: Optional[bool] = None,
+        normalize_embeddings: bool = False,
+        convert_to_numpy: bool = True,
+        convert_to_tensor: bool = False,
+        **kwargs
+    ) -> Any:
+        """
+        Encode texts bucket by bucket and restore the input order
+
+        Returns the same forms as SentenceTransformer.encode (and EmbeddingService).
+
+        :param sentences: A text or list of texts
+        :param batch_size: Ignored; batches follow the encoder's buckets and batch_size
+        :param show_progress_bar: Ignored
+        :param normalize_embeddings: L2-normalize the returned embeddings
+        :param convert_to_numpy: Return a numpy array (a list of tensors when False)
+        :param convert_to_tensor: Return a torch tensor; overrides convert_to_numpy
+        :param kwargs: Extra arguments passed to the model's encode
+        :return: Float32 embeddings (1-D for a single text, 2-D otherwise)
+        """
+        embeddings = self._encode(sentences, **kwargs)
+        return convert_embeddings(embeddings, normalize_embeddings, convert_to_numpy, convert_to_tensor)
+
+    def _encode(self, sentences: Union[str, List[str]], **kwargs) -> np.ndarray:
+        """
+        Float32 embeddings in input order
+
+        :param sentences: A text or list of texts
+        :param kwargs: Extra arguments passed to the model's encode
+        :return: Embeddings (1-D for a single text, 2-D otherwise)
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        if len(texts) <= self.batch_size:
+            # One batch regardless of order: measuring lengths would only add a tokenization pass
+            embeddings = np.asarray(self.model.encode(texts, batch_size=len(texts), **kwargs), dtype=np.float32)
+            return embeddings[0] if single else embeddings
+
+        lengths = self.token_lengths(texts)
+        batches = self.plan_batches(lengths)
+
+        output = None
+        for positions in batches:
+            embeddings = np.asarray(
+                self.model.encode([texts[i] for i in positions], batch_size=len(positions), **kwargs),
+                dtype=np.float32
+            )
+            if output is None:
+                output = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+            output[positions] = embeddings
+
+        with self._lock:
+            self._texts += len(texts)
+            self._real_tokens += int(lengths.sum())
+            self._padded_tokens += sum(int(lengths[b].max()) * len(b) for b in batches)
+            self._baseline_padded_tokens += encode_order_padded_tokens(texts, lengths, self.batch_size)
+
+        return output[0] if single else output
+
+    def padding_report(self, texts: List[str]) -> Dict[str, Any]:
+        """
+        Token efficiency of bucketed batching versus SentenceTransformer.encode's own, without encoding
+
+        :param texts: Corpus to analyse
+        :return: Real, padded and baseline-padded token counts and efficiencies
+        """
+        lengths = self.token_lengths(texts)
+        bucketed = sum(int(lengths[b].max()) * len(b) for b in self.plan_batches(lengths))
+        baseline = encode_order_padded_tokens(texts, lengths, self.batch_size)
+        return self._summary(len(texts), int(lengths.sum()), bucketed, baseline)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Token efficiency of everything encoded through buckets so far
+
+        Calls small enough to skip bucketing are not counted.
+
+        :return: Real, padded and baseline-padded token counts and efficiencies
+        """
+        with self._lock:
+            return self._summary(self._texts, self._real_tokens, self._padded_tokens, self._baseline_padded_tokens)
+
+    @staticmethod
+    def _summary(texts: int, real: int, bucketed: int, baseline: int) -> Dict[str, Any]:
+        # The baseline is SentenceTransformer.encode's character-length-sorted batching
+        return {
+            'texts': texts,
+            'real_tokens': real,
+            'padded_tokens': bucketed,
+            'baseline_padded_tokens': baseline,
+            'token_efficiency': real / bucketed if bucketed else 1.0,
+            'baseline_token_efficiency': real / baseline if baseline else 1.0,
+            'padding_saved_tokens': baseline - bucketed
+        }
@@ -0,0 +1,262 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """
+    Resident set size of the current process in bytes
+
+    :return: RSS in bytes, or None when it cannot be determined
+    """
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+        # ru_maxrss is a high-water mark (KiB on Linux, bytes on macOS)
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if os.uname().sysname == 'Darwin' else max_rss * 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+def _parameter_bytes(model: Any) -> Optional[int]:
+    """
+    Size of a torch model's parameters and buffers in bytes
+
+    :param model: Loaded model
+    :return: Size in bytes, or None for non-torch models
+    """
+    if not hasattr(model, 'parameters'):
+        return None
+
+    total = sum(p.numel() * p.element_size() for p in model.parameters())
+    if hasattr(model, 'buffers'):
+        total += sum(b.numel() * b.element_size() for b in model.buffers())
+    return total
+
+
+def _load_sentence_transformer(model_name: str) -> Any:
+    """
+    Load a SentenceTransformer for the given model name
+
+    :param model_name: Sentence transformer model name
+    :return: Loaded SentenceTransformer
+    """
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def _embedding_backend_config() -> Dict[str, Any]:
+    """
+    Embedding backend settings from model_config.yaml (EMBEDDING_BACKEND overrides the type)
+
+    :return: Backend configuration dictionary
+    """
+    try:
+        from ..utils.config_manager import config_manager
+        backend_config = config_manager.get_embedding_backend_config()
+    except Exception:
+        backend_config = {'type': 'torch'}
+
+    if os.getenv('EMBEDDING_BACKEND'):
+        backend_config['type'] = os.getenv('EMBEDDING_BACKEND')
+    return backend_config
+
+
+def _load_configured_model(model_name: str) -> Any:
+    """
+    Default loader: the embedding backend selected in model_config.yaml
+
+    :param model_name: Sentence transformer model name
+    :return: Loaded SentenceTransformer or OnnxEmbeddingModel
+    """
+    backend_config = _embedding_backend_config()
+    backend_type = backend_config.get('type', 'torch')
+
+    if backend_type == 'onnx':
+        from .onnx_backend import OnnxEmbeddingModel
+        onnx_config = backend_config.get('onnx') or {}
+        return OnnxEmbeddingModel(
+            model_name,
+            cache_dir=onnx_config.get('cache_dir'),
+            quantize=bool(onnx_config.get('quantize', False)),
+            num_threads=onnx_config.get('num_threads')
+        )
+    if backend_type != 'torch':
+        raise ValueError(f"Unsupported embedding backend: {backend_type}")
+
+    return _load_sentence_transformer(model_name)
+
+
+class EmbeddingModelRegistry:
+    def __init__(self, loader: Optional[Callable[[str], Any]] = None):
+        """
+        Process-wide registry that loads each embedding model once, on first use
+
+        :param loader: Callable turning a model name into a loaded model
+                       (defaults to the backend configured in model_config.yaml)
+        """
+        self.loader = loader or _load_configured_model
+        self.logger = logging.getLogger(__name__)
+
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+        # One lock guards the dictionaries, one lock per model serialises loading
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    @staticmethod
+    def normalize_name(model_name: str) -> str:
+        """
+        Canonical registry key for a model name
+
+        'sentence-transformers/all-MiniLM-L6-v2' and 'all-MiniLM-L6-v2' resolve
+        to the same model, so they share one registry entry.
+
+        :param model_name: Model name as given by the caller
+        :return: Normalized model name
+        """
+        prefix = 'sentence-transformers/'
+        if model_name.startswith(prefix):
+            return model_name[len(prefix):]
+        return model_name
+
+    def get(self, model_name: str) -> Any:
+        """
+        Get a model, loading it if this process has not loaded it yet
+
+        :param model_name: Name of the embedding model
+        :return: Loaded model instance
+        """
+        key = self.normalize_name(model_name)
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._stats[key]['hits'] += 1
+                return model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                model = self._models.get(key)
+                if model is not None:
+                    self._stats[key]['hits'] += 1
+                    return model
+
+            rss_before = _current_rss_bytes()
+            start = time.perf_counter()
+            model = self.loader(model_name)
+            load_time = time.perf_counter() - start
+            rss_after = _current_rss_bytes()
+
+            stats = {
+                'load_time_s': load_time,
+                'loaded_at': time.time(),
+                'rss_delta_bytes': (
+                    rss_after - rss_before
+                    if rss_before is not None and rss_after is not None else None
+                ),
+                'parameter_bytes': _parameter_bytes(model),
+                'hits': 0
+            }
+
+            with self._lock:
+                self._models[key] = model
+                self._stats[key] = stats
+
+            self.logger.info(f"Loaded embedding model '{key}' in {load_time:.2f}s")
+            return model
+
+    def register(self, model_name: str, model: Any):
+        """
+        Register an already-loaded model so later lookups reuse it
+
+        :param model_name: Name of the embedding model
+        :param model: Loaded model instance
+        """
+        key = self.normalize_name(model_name)
+        with self._lock:
+            if key in self._models:
+                return
+            self._models[key] = model
+            self._stats[key] = {
+                'load_time_s': 0.0,
+                'loaded_at': time.time(),
+                'rss_delta_bytes': None,
+                'parameter_bytes': _parameter_bytes(model),
+                'hits': 0
+            }
+
+    def get_dimension(self, model_name: str) -> int:
+        """
+        Embedding dimension of a model (loads the model if needed)
+
+        :param model_name: Name of the embedding model
+        :return: Embedding dimension
+        """
+        return self.get(model_name).get_sentence_embedding_dimension()
+
+    def is_loaded(self, model_name: str) -> bool:
+        """
+        Check whether a model is already loaded in this process
+
+        :param model_name: Name of the embedding model
+        :return: True if loaded
+        """
+        with self._lock:
+            return self.normalize_name(model_name) in self._models
+
+    def unload(self, model_name: str):
+        """
+        Drop a model from the registry so its memory can be reclaimed
+
+        :param model_name: Name of the embedding model
+        """
+        key = self.normalize_name(model_name)
+        with self._lock:
+            self._models.pop(key, None)
+            self._stats.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Load-time and memory statistics for every loaded model
+
+        :return: Statistics dictionary keyed by model name
+        """
+        with self._lock:
+            models = {key: dict(value) for key, value in self._stats.items()}
+
+        return {
+            'models': models,
+            'loaded_count': len(models),
+            'total_load_time_s': sum(s['load_time_s'] for s in models.values()),
+            'total_parameter_bytes': sum(
+                s['parameter_bytes'] or 0 for s in models.values()
+            ),
+            'process_rss_bytes': _current_rss_bytes()
+        }
+
+
+# Create a global registry instance shared by all embedding components
+model_registry = EmbeddingModelRegistry()
+
+
+def get_embedding_model(model_name: str = 'all-MiniLM-L6-v2') -> Any:
+    """
+    Get a shared embedding model from the process-wide registry
+
+    :param model_name: Name of the embedding model
+    :return: Loaded model instance
+    """
+    return model_registry.get(model_name)
@@ -0,0 +1,390 @@
+import os
+import re
+import json
+import time
+import logging
+import inspect
+import threading
+from typing import List, Dict, Any, Optional, Union
+import numpy as np
+
+# Bumped whenever the export format changes, so stale cached artifacts are rebuilt
+EXPORT_FORMAT_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'mybot', 'onnx')
+
+
+def _cache_path(model_name: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Directory holding the exported artifacts of one model
+
+    :param model_name: Sentence transformer model name or path
+    :param cache_dir: Root cache directory
+    :return: Model-specific cache directory
+    """
+    root = os.path.expanduser(cache_dir or os.getenv('ONNX_CACHE_DIR') or DEFAULT_CACHE_DIR)
+    return os.path.join(root, re.sub(r'[^A-Za-z0-9._-]+', '--', model_name.strip('/')))
+
+
+def _pooling_mode(module: Any) -> str:
+    """
+    Pooling strategy of a sentence-transformers Pooling module
+
+    :param module: Pooling module
+    :return: 'mean', 'cls' or 'max'
+    """
+    mode = getattr(module, 'pooling_mode', None)
+    if not isinstance(mode, str) and hasattr(module, 'get_pooling_mode_str'):
+        mode = module.get_pooling_mode_str()
+
+    if mode in ('mean', 'cls', 'max'):
+        return mode
+    raise ValueError(f"Unsupported pooling mode for ONNX export: {mode}")
+
+
+def _read_export_meta(meta_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Export metadata if it exists and matches the current format
+
+    :param meta_path: Path of export.json
+    :return: Metadata dictionary or None
+    """
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r') as meta_file:
+        meta = json.load(meta_file)
+    return meta if meta.get('format_version') == EXPORT_FORMAT_VERSION else None
+
+
+def _temporary_path(path: str) -> str:
+    # Keeps the extension, so tools that infer the format from it still work
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.getpid()}.tmp{extension}"
+
+
+def export_onnx_model(
+    model_name: str,
+    cache_dir: Optional[str] = None,
+    quantize: bool = False,
+    opset: int = 14
+) -> str:
+    """
+    Export a sentence transformer to ONNX (once) and return the artifact path
+
+    The transformer body is exported with dynamic batch and sequence axes;
+    pooling and normalization run in NumPy at inference time. With quantize=True
+    an additional dynamically int8-quantized copy is produced.
+
+    Exports hold a file lock in the cache directory and write every artifact
+    under a temporary name before renaming it into place, with export.json
+    last. Processes exporting the same model concurrently (e.g. encoding pool
+    workers) therefore wait for one export and never read a partial file.
+
+    :param model_name: Sentence transformer model name or path
+    :param cache_dir: Root cache directory (defaults to ONNX_CACHE_DIR or ~/.cache/mybot/onnx)
+    :param quantize: Also produce and return the int8-quantized model
+    :param opset: ONNX opset version
+    :return: Path of the ONNX model to load
+    """
+    target_dir = _cache_path(model_name, cache_dir)
+    fp32_path = os.path.join(target_dir, 'model.onnx')
+    int8_path = os.path.join(target_dir, 'model.int8.onnx')
+    meta_path = os.path.join(target_dir, 'export.json')
+    result_path = int8_path if quantize else fp32_path
+
+    # Artifacts are only ever renamed into place, so existing ones are complete
+    if _read_export_meta(meta_path) is not None and os.path.exists(result_path):
+        return result_path
+
+    from filelock import FileLock
+
+    os.makedirs(target_dir, exist_ok=True)
+    with FileLock(os.path.join(target_dir, 'export.lock')):
+        # Another process may have finished the export while we waited
+        if _read_export_meta(meta_path) is None or not os.path.exists(fp32_path):
+            _export(model_name, target_dir, fp32_path, int8_path, meta_path, opset)
+
+        if quantize and not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            temporary = _temporary_path(int8_path)
+            quantize_dynamic(fp32_path, temporary, weight_type=QuantType.QInt8)
+            os.replace(temporary, int8_path)
+            logging.getLogger(__name__).info(f"Wrote int8-quantized ONNX model to {int8_path}")
+
+    return result_path
+
+
+def _export(model_name: str, target_dir: str, fp32_path: str, int8_path: str, meta_path: str, opset: int):
+    """
+    Export the transformer body, tokenizer and metadata of a sentence transformer
+
+    Called with the export lock held.
+    """
+    import shutil
+    import tempfile
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    logger = logging.getLogger(__name__)
+    start = time.perf_counter()
+    st_model = SentenceTransformer(model_name, device='cpu')
+    modules = list(st_model)
+    names = [type(module).__name__ for module in modules]
+    if names[:2] != ['Transformer', 'Pooling'] or any(n != 'Normalize' for n in names[2:]):
+        raise ValueError(f"Unsupported module pipeline for ONNX export: {names}")
+
+    transformer = modules[0]
+    tokenizer = transformer.tokenizer
+    auto_model = transformer.auto_model.eval()
+    input_names = [
+        name for name in ('input_ids', 'attention_mask', 'token_type_ids')
+        if name in tokenizer.model_input_names
+    ]
+
+    class _Body(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    # A re-export invalidates the metadata and the quantized copy first
+    for stale in (meta_path, int8_path):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    sample = tokenizer(['export sample'], return_tensors='pt')
+    export_kwargs = {
+        'input_names': input_names,
+        'output_names': ['last_hidden_state'],
+        'dynamic_axes': {
+            **{name: {0: 'batch', 1: 'sequence'} for name in input_names},
+            'last_hidden_state': {0: 'batch', 1: 'sequence'}
+        },
+        'opset_version': opset
+    }
+    # Newer torch defaults to the dynamo exporter; the TorchScript one handles dynamic_axes
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs['dynamo'] = False
+
+    temporary = _temporary_path(fp32_path)
+    with torch.inference_mode():
+        torch.onnx.export(
+            _Body(auto_model),
+            tuple(sample[name] for name in input_names),
+            temporary,
+            **export_kwargs
+        )
+    os.replace(temporary, fp32_path)
+
+    tokenizer_dir = tempfile.mkdtemp(prefix='tokenizer.', dir=target_dir)
+    try:
+        tokenizer.save_pretrained(tokenizer_dir)
+        for file_name in os.listdir(tokenizer_dir):
+            os.replace(os.path.join(tokenizer_dir, file_name), os.path.join(target_dir, file_name))
+    finally:
+        shutil.rmtree(tokenizer_dir, ignore_errors=True)
+
+    meta = {
+        'format_version': EXPORT_FORMAT_VERSION,
+        'model_name': model_name,
+        'input_names': input_names,
+        'pooling': _pooling_mode(modules[1]),
+        'normalize': 'Normalize' in names,
+        'dimension': st_model.get_sentence_embedding_dimension(),
+        'max_seq_length': st_model.max_seq_length
+    }
+    temporary = _temporary_path(meta_path)
+    with open(temporary, 'w') as meta_file:
+        json.dump(meta, meta_file, indent=2)
+    os.replace(temporary, meta_path)
+
+    logger.info(f"Exported {model_name} to ONNX in {time.perf_counter() - start:.1f}s")
+
+
+class OnnxEmbeddingModel:
+    def __init__(
+        self,
+        model_name: str = 'all-MiniLM-L6-v2',
+        cache_dir: Optional[str] = None,
+        quantize: bool = False,
+        num_threads: Optional[int] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Sentence embedding model served by ONNX Runtime on CPU
+
+        Exposes the parts of the SentenceTransformer interface used in this
+        package (``encode``, ``get_sentence_embedding_dimension``, ``tokenizer``),
+        so it can be registered in the model registry in its place.
+
+        :param model_name: Sentence transformer model name or path
+        :param cache_dir: Root cache directory for exported artifacts
+        :param quantize: Use the dynamically int8-quantized export
+        :param num_threads: Intra-op threads for ONNX Runtime (default: runtime's choice)
+        :param logger: Optional logger for tracking operations
+        """
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.model_path = export_onnx_model(model_name, cache_dir=cache_dir, quantize=quantize)
+        artifact_dir = os.path.dirname(self.model_path)
+        with open(os.path.join(artifact_dir, 'export.json'), 'r') as meta_file:
+            self.export_meta = json.load(meta_file)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(artifact_dir)
+        self.max_seq_length = self.export_meta['max_seq_length']
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            self.model_path,
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+        # InferenceSession.run is thread-safe, the tokenizer is not guaranteed to be
+        self._tokenizer_lock = threading.Lock()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """
+        Embedding dimension of the exported model
+
+        :return: Embedding dimension
+        """
+        return self.export_meta['dimension']
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """
+        Pool token states into sentence embeddings
+
+        :param hidden: Token states of shape (batch, sequence, dimension)
+        :param attention_mask: Mask of shape (batch, sequence)
+        :return: Sentence embeddings of shape (batch, dimension)
+        """
+        mode = self.export_meta['pooling']
+        if mode == 'cls':
+            return hidden[:, 0]
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        if mode == 'max':
+            return np.where(mask > 0, hidden, -1e9).max(axis=1)
+
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        Encode sentences into float32 embeddings
+
+        :param sentences: A sentence or list of sentences
+        :param batch_size: Sentences per ONNX Runtime call
+        :param normalize_embeddings: L2-normalize even if the model has no Normalize step
+        :return: Embeddings (1-D for a single sentence, 2-D otherwise)
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        dimension = self.get_sentence_embedding_dimension()
+        output = np.empty((len(texts), dimension), dtype=np.float32)
+
+        # Length-sorted batches keep padding small, as SentenceTransformer.encode does
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            positions = order[start:start + batch_size]
+            with self._tokenizer_lock:
+                features = self.tokenizer(
+                    [texts[i] for i in positions],
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_seq_length,
+                    return_tensors='np'
+                )
+            inputs = {
+                name: features[name].astype(np.int64)
+                for name in self.export_meta['input_names']
+            }
+            hidden = self.session.run(['last_hidden_state'], inputs)[0]
+            output[positions] = self._pool(hidden, features['attention_mask'])
+
+        if self.export_meta['normalize'] or normalize_embeddings:
+            output /= np.clip(np.linalg.norm(output, axis=1, keepdims=True), 1e-12, None)
+
+        return output[0] if single else output
+
+
+def check_parity(
+    texts: List[str],
+    onnx_model: OnnxEmbeddingModel,
+    reference_model: Optional[Any] = None,
+    top_k: int = 5,
+    batch_size: int = 32
+) -> Dict[str, Any]:
+    """
+    Compare ONNX embeddings against the PyTorch sentence transformer
+
+    Reports element-wise agreement, per-text cosine similarity, top-k neighbour
+    overlap (texts searched against each other, as a proxy for retrieval
+    quality) and the encode-time speedup.
+
+    :param texts: Sample corpus
+    :param onnx_model: ONNX model under test
+    :param reference_model: PyTorch model (loaded from onnx_model.model_name if None)
+    :param top_k: Neighbourhood size for the retrieval-overlap metric
+    :param batch_size: Batch size used for both models
+    :return: Parity report dictionary
+    """
+    if reference_model is None:
+        from sentence_transformers import SentenceTransformer
+        reference_model = SentenceTransformer(onnx_model.model_name, device='cpu')
+
+    start = time.perf_counter()
+    reference = np.asarray(reference_model.encode(texts, batch_size=batch_size), dtype=np.float32)
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    candidate = onnx_model.encode(texts, batch_size=batch_size)
+    candidate_time = time.perf_counter() - start
+
+    def unit(matrix: np.ndarray) -> np.ndarray:
+        return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+    reference_unit = unit(reference)
+    candidate_unit = unit(candidate)
+    cosine = np.sum(reference_unit * candidate_unit, axis=1)
+
+    k = min(top_k, len(texts) - 1)
+    overlap = 1.0
+    if k > 0:
+        def neighbours(matrix: np.ndarray) -> np.ndarray:
+            scores = matrix @ matrix.T
+            np.fill_diagonal(scores, -np.inf)
+            return np.argsort(-scores, axis=1)[:, :k]
+
+        reference_nn = neighbours(reference_unit)
+        candidate_nn = neighbours(candidate_unit)
+        overlap = float(np.mean([
+            len(set(r) & set(c)) / k for r, c in zip(reference_nn, candidate_nn)
+        ]))
+
+    return {
+        'texts': len(texts),
+        'quantized': onnx_model.quantize,
+        'cosine_min': float(cosine.min()),
+        'cosine_mean': float(cosine.mean()),
+        'max_abs_diff': float(np.abs(reference - candidate).max()),
+        f'top{k}_overlap': overlap,
+        'torch_seconds': reference_time,
+        'onnx_seconds': candidate_time,
+        'speedup': reference_time / candidate_time if candidate_time > 0 else float('inf')
+    }
@@ -1,16 +1,114 @@
 import os
+import time
+import hashlib
 import logging
-import pinecone
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
 import numpy as np
+from .model_registry import EmbeddingModelRegistry, model_registry
+from .backends import VectorBackend, LocalVectorBackend
+from .query_coalescer import QueryCoalescer
+from .embedding_service import EmbeddingService, get_embedding_service
+from .length_bucketing import LengthBucketedEncoder
+from .projection import EmbeddingProjection, load_projection
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+
+class IndexDescriptionCache:
+    def __init__(self, ttl_seconds: float = 300.0):
+        """
+        In-process cache of index descriptions so constructors skip the control plane
+        
+        :param ttl_seconds: How long a cached description stays valid
+        """
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached description if it has not expired
+        
+        :param key: Cache key (API key fingerprint, index name)
+        :return: Index description or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            cached_at, description = entry
+            if time.monotonic() - cached_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            return description
+
+    def set(self, key: Tuple[str, str], description: Dict[str, Any]):
+        """
+        Store an index description
+        
+        :param key: Cache key (API key fingerprint, index name)
+        :param description: Index description dictionary
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), description)
+
+    def invalidate(self, key: Optional[Tuple[str, str]] = None):
+        """
+        Drop one cached description, or all of them
+        
+        :param key: Cache key to drop (None clears the cache)
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+# Shared by every manager in the process
+index_description_cache = IndexDescriptionCache(
+    ttl_seconds=float(os.getenv('PINECONE_INDEX_CACHE_TTL', '300'))
+)
+
+
+def _index_field(index_model: Any, field: str) -> Any:
+    """
+    Read a field from an index model returned by the Pinecone client
+    
+    :param index_model: Index model object or dictionary
+    :param field: Field name
+    :return: Field value or None
+    """
+    if isinstance(index_model, dict):
+        return index_model.get(field)
+    return getattr(index_model, field, None)
+
 
 class PineconeEmbeddingManager:
+    # Managers shared across components, keyed by (index name, model name)
+    _shared_instances: Dict[Tuple[str, str], 'PineconeEmbeddingManager'] = {}
+    _shared_lock = threading.Lock()
+    
+    # IDs per fetch request; Pinecone sends fetch IDs in the query string
+    fetch_batch_size = 200
+
     def __init__(
         self, 
         api_key: Optional[str] = None, 
         index_name: Optional[str] = 'test-index',
-        model_name: Optional[str] = 'all-MiniLM-L6-v2'
+        model_name: Optional[str] = 'all-MiniLM-L6-v2',
+        model: Optional['SentenceTransformer'] = None,
+        registry: Optional[EmbeddingModelRegistry] = None,
+        backend: Optional[VectorBackend] = None,
+        query_batching: bool = False,
+        batch_max_wait_ms: float = 5.0,
+        batch_max_size: int = 32,
+        embedding_service: Optional[EmbeddingService] = None,
+        length_bucketing: bool = True,
+        projection: Optional[EmbeddingProjection] = None
     ):
         """
         Initialize Pinecone Embedding Manager
@@ -18,64 +116,214 @@ class PineconeEmbeddingManager:
         :param api_key: Pinecone API key (optional, uses environment variable)
         :param index_name: Name of the Pinecone index
         :param model_name: Name of the sentence transformer model
+        :param model: Optional preloaded model (registered in the shared registry)
+        :param registry: Model registry to load from (defaults to the process-wide one)
+        :param backend: Optional vector backend used instead of a Pinecone index
+                        (VECTOR_BACKEND=local selects a LocalVectorBackend)
+        :param query_batching: Coalesce concurrent query() calls into batched requests
+        :param batch_max_wait_ms: Longest time a query waits for others to batch with
+        :param batch_max_size: Largest number of queries per batch
+        :param embedding_service: Optional batching service used to encode texts
+                                  (EMBEDDING_BATCHING=1 selects the shared service)
+        :param length_bucketing: Group texts of similar token length when encoding more than one batch
+        :param projection: Optional dimensionality reduction applied at ingest and query
+                           (EMBEDDING_PROJECTION_PATH loads a saved one)
         """
         # Configure logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         
+        # Embedding model is resolved lazily through the shared registry
+        self.model_name = model_name
+        self.registry = registry or model_registry
+        if model is not None:
+            self.registry.register(self.model_name, model)
+        
+        # Cross-request batching of embedding calls
+        if embedding_service is None and os.getenv('EMBEDDING_BATCHING', '0') == '1':
+            embedding_service = get_embedding_service(self.model_name, registry=self.registry)
+        self.embedding_service = embedding_service
+        self.length_bucketing = length_bucketing
+        self._bucketed_encoder: Optional[LengthBucketedEncoder] = None
+        
+        # Stored vectors may be a reduced projection of the model embeddings
+        projection_path = os.getenv('EMBEDDING_PROJECTION_PATH')
+        if projection is None and projection_path and os.path.exists(projection_path):
+            projection = load_projection(projection_path)
+        self.projection = projection
+        
+        self.index_name = index_name
+        
+        # Query coalescer is created on the first query once the index exists
+        self.query_batching = query_batching
+        self.batch_max_wait_ms = batch_max_wait_ms
+        self.batch_max_size = batch_max_size
+        self._query_coalescer: Optional[QueryCoalescer] = None
+        self._coalescer_lock = threading.Lock()
+        
+        # Local backends stand in for Pinecone and need no account
+        if backend is None and os.getenv('VECTOR_BACKEND', 'pinecone').lower() == 'local':
+            backend = LocalVectorBackend(
+                persist_dir=os.getenv('LOCAL_VECTOR_DIR'),
+                latency_ms=float(os.getenv('LOCAL_VECTOR_LATENCY_MS', '0'))
+            )
+        
+        if backend is not None:
+            self.api_key = api_key
+            self.pc = None
+            self.index = backend
+            self.index_description = {
+                'name': self.index_name,
+                'dimension': getattr(backend, 'dimension', None),
+                'metric': getattr(backend, 'metric', None),
+                'host': None
+            }
+            return
+        
         # Use API key from environment or parameter
         self.api_key = api_key or os.getenv('PINECONE_API_KEY')
         if not self.api_key:
             raise ValueError("Pinecone API key is required")
         
-        # Initialize embedding model
-        self.model_name = model_name
-        self.model = SentenceTransformer(self.model_name)
-        
-        # Get embedding dimension
-        self.embedding_dimension = self.model.get_sentence_embedding_dimension()
-        
         try:
+            # Pinecone pulls in a sizeable dependency tree, so import on first use
+            import pinecone
+            
             # Initialize Pinecone client
             self.pc = pinecone.Pinecone(api_key=self.api_key)
             
-            # Set index name
-            self.index_name = index_name
+            self._index_cache_key = (
+                hashlib.sha256(self.api_key.encode('utf-8')).hexdigest()[:16],
+                self.index_name
+            )
             
-            # Create or update index if needed
-            self._setup_index()
+            # Create or update index if needed (cached descriptions skip the control plane)
+            self.index_description = self._setup_index()
             
-            # Get index reference
-            self.index = self.pc.Index(self.index_name)
+            # Get index reference; passing the host avoids another describe call
+            host = self.index_description.get('host')
+            if host:
+                self.index = self.pc.Index(self.index_name, host=host)
+            else:
+                self.index = self.pc.Index(self.index_name)
             
         except Exception as e:
             self.logger.error(f"Pinecone initialization failed: {e}")
             raise
     
-    def _setup_index(self):
+    @classmethod
+    def shared(
+        cls,
+        index_name: Optional[str] = None,
+        model_name: str = 'all-MiniLM-L6-v2',
+        **kwargs
+    ) -> 'PineconeEmbeddingManager':
+        """
+        Get a process-wide manager for an index, creating it on first use
+        
+        :param index_name: Name of the Pinecone index (defaults to PINECONE_INDEX_NAME)
+        :param model_name: Name of the sentence transformer model
+        :param kwargs: Extra constructor arguments used when creating the manager
+        :return: Shared PineconeEmbeddingManager
+        """
+        index_name = index_name or os.getenv('PINECONE_INDEX_NAME', 'test-index')
+        key = (index_name, EmbeddingModelRegistry.normalize_name(model_name))
+        
+        with cls._shared_lock:
+            if key not in cls._shared_instances:
+                cls._shared_instances[key] = cls(
+                    index_name=index_name,
+                    model_name=model_name,
+                    **kwargs
+                )
+            return cls._shared_instances[key]
+
+    @property
+    def model(self) -> 'SentenceTransformer':
+        """
+        Shared embedding model, loaded on first access
+        """
+        return self.registry.get(self.model_name)
+
+    @property
+    def encoder(self) -> Any:
+        """
+        Object used to encode texts: the batching service if configured,
+        otherwise the model behind a length-bucketing front-end
+        """
+        if self.embedding_service is not None:
+            return self.embedding_service
+        if not self.length_bucketing:
+            return self.model
+        if self._bucketed_encoder is None:
+            self._bucketed_encoder = LengthBucketedEncoder(self.model)
+        return self._bucketed_encoder
+
+    @property
+    def embedding_dimension(self) -> int:
+        """
+        Dimension of the stored vectors (the projection output when one is set)
+        """
+        if self.projection is not None:
+            return self.projection.output_dim
+        return self.registry.get_dimension(self.model_name)
+
+    def project(self, embeddings: Any, projected: bool = False) -> np.ndarray:
+        """
+        Apply the configured projection
+        
+        :param embeddings: Embedding vector or matrix
+        :param projected: The embeddings were already projected (e.g. from generate_embeddings)
+        :return: Float32 array ready for the index
+        """
+        if self.projection is None:
+            return np.asarray(embeddings, dtype=np.float32)
+        return self.projection.transform(embeddings, projected=projected)
+
+    @property
+    def query_coalescer(self) -> Optional[QueryCoalescer]:
+        """
+        Coalescer batching concurrent queries, or None when batching is off
+        """
+        if not self.query_batching:
+            return None
+        
+        with self._coalescer_lock:
+            if self._query_coalescer is None:
+                self._query_coalescer = QueryCoalescer(
+                    self.index,
+                    max_wait_ms=self.batch_max_wait_ms,
+                    max_batch_size=self.batch_max_size,
+                    logger=self.logger
+                )
+            return self._query_coalescer
+
+    def _setup_index(self) -> Dict[str, Any]:
         """
         Create or update Pinecone index
+        
+        :return: Index description (name, dimension, metric, host)
         """
+        cached = index_description_cache.get(self._index_cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            # Check if index exists
-            existing_indexes = [idx.name for idx in self.pc.list_indexes()]
+            # Single control-plane listing; reused for the dimension check
+            index_details = next(
+                (idx for idx in self.pc.list_indexes()
+                 if _index_field(idx, 'name') == self.index_name),
+                None
+            )
             
-            # If index exists, check its configuration
-            if self.index_name in existing_indexes:
-                # Get index details
-                index_details = next(
-                    (idx for idx in self.pc.list_indexes() if idx.name == self.index_name), 
-                    None
-                )
-                
-                # If dimension is different, delete and recreate
-                if index_details and index_details.dimension != self.embedding_dimension:
-                    self.logger.warning(f"Deleting existing index with mismatched dimension: {self.index_name}")
-                    self.pc.delete_index(self.index_name)
-                    existing_indexes.remove(self.index_name)
+            # If dimension is different, delete and recreate
+            if index_details is not None and _index_field(index_details, 'dimension') != self.embedding_dimension:
+                self.logger.warning(f"Deleting existing index with mismatched dimension: {self.index_name}")
+                self.pc.delete_index(self.index_name)
+                index_details = None
             
             # Create index if not exists
-            if self.index_name not in existing_indexes:
+            if index_details is None:
                 self.logger.info(f"Creating index: {self.index_name}")
                 
                 # Create serverless index with dynamic dimension
@@ -91,6 +339,16 @@ class PineconeEmbeddingManager:
                     }
                 )
                 self.logger.info(f"Index {self.index_name} created successfully with dimension {self.embedding_dimension}")
+                index_details = self.pc.describe_index(self.index_name)
+            
+            description = {
+                'name': self.index_name,
+                'dimension': _index_field(index_details, 'dimension'),
+                'metric': _index_field(index_details, 'metric'),
+                'host': _index_field(index_details, 'host')
+            }
+            index_description_cache.set(self._index_cache_key, description)
+            return description
             
         except Exception as e:
             self.logger.error(f"Index setup failed: {e}")
@@ -104,7 +362,7 @@ class PineconeEmbeddingManager:
         :return: List of embeddings
         """
         try:
-            embeddings = self.model.encode(texts).tolist()
+            embeddings = self.project(self.encoder.encode(texts)).tolist()
             return embeddings
         except Exception as e:
             self.logger.error(f"Embedding generation failed: {e}")
@@ -116,7 +374,8 @@ class PineconeEmbeddingManager:
         embeddings: Optional[List[List[float]]] = None,
         ids: Optional[List[str]] = None,
         namespace: str = 'default', 
-        metadata: Optional[List[Dict[str, Any]]] = None
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        projected: bool = False
     ):
         """
         Upsert embeddings into Pinecone index with enhanced flexibility
@@ -126,11 +385,14 @@ class PineconeEmbeddingManager:
         :param ids: Optional custom vector IDs
         :param namespace: Namespace to upsert vectors into
         :param metadata: Optional list of metadata dictionaries
+        :param projected: The embeddings were already projected (e.g. from generate_embeddings)
         """
         try:
             # Generate embeddings if not provided
             if embeddings is None:
                 embeddings = self.generate_embeddings(texts)
+            elif self.projection is not None:
+                embeddings = self.project(embeddings, projected=projected).tolist()
             
             # Generate IDs if not provided
             if ids is None:
@@ -166,7 +428,8 @@ class PineconeEmbeddingManager:
         query_embedding: np.ndarray, 
         k: int = 5, 
         namespace: str = 'default',
-        filter: Optional[Dict[str, Any]] = None
+        filter: Optional[Dict[str, Any]] = None,
+        projected: bool = False
     ) -> Dict[str, Any]:
         """
         Enhanced query method with more flexible parameters
@@ -175,8 +438,16 @@ class PineconeEmbeddingManager:
         :param k: Number of top results to return
         :param namespace: Namespace to query
         :param filter: Optional metadata filter
+        :param projected: The query embedding was already projected (e.g. from generate_embeddings)
         :return: Query results dictionary
         """
+        query_embedding = self.project(query_embedding, projected=projected)
+        
+        coalescer = self.query_coalescer
+        if coalescer is not None:
+            # Errors are logged by the coalescer and re-raised here
+            return coalescer.query(query_embedding, top_k=k, namespace=namespace, filter=filter)
+        
         try:
             # Perform query with optional filtering
             query_results = self.index.query(
@@ -241,6 +512,67 @@ class PineconeEmbeddingManager:
             self.logger.error(f"Vector fetch failed: {e}")
             return None
 
+    def fetch_vectors(
+        self,
+        ids: List[str],
+        namespace: str = 'default',
+        batch_size: Optional[int] = None,
+        max_workers: int = 4
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fetch many vectors into a single float32 matrix
+        
+        IDs are split into backend-sized requests that run concurrently, and each
+        response is written straight into its rows of a preallocated matrix.
+        
+        :param ids: Vector IDs to fetch
+        :param namespace: Namespace to fetch from
+        :param batch_size: IDs per request (defaults to the backend's limit)
+        :param max_workers: Number of concurrent fetch requests
+        :return: Tuple of (matrix of shape (found, dimension), array of the matching IDs);
+                 IDs missing from the index are dropped, order is otherwise preserved
+        """
+        ids = [str(vector_id) for vector_id in ids]
+        dimension = (
+            self.index_description.get('dimension')
+            or getattr(self.index, 'dimension', None)
+            or self.embedding_dimension
+        )
+        if not ids:
+            return np.empty((0, dimension), dtype=np.float32), np.empty(0, dtype=object)
+        
+        batch_size = batch_size or getattr(self.index, 'max_fetch_batch', self.fetch_batch_size)
+        matrix = np.empty((len(ids), dimension), dtype=np.float32)
+        found = np.zeros(len(ids), dtype=bool)
+        
+        def fetch_chunk(offset: int):
+            chunk = ids[offset:offset + batch_size]
+            vectors = _index_field(self.index.fetch(ids=chunk, namespace=namespace), 'vectors') or {}
+            for position, vector_id in enumerate(chunk, start=offset):
+                vector = vectors.get(vector_id)
+                if vector is not None:
+                    matrix[position] = _index_field(vector, 'values')
+                    found[position] = True
+        
+        try:
+            offsets = range(0, len(ids), batch_size)
+            if len(offsets) == 1:
+                fetch_chunk(0)
+            else:
+                with ThreadPoolExecutor(max_workers=min(max_workers, len(offsets))) as executor:
+                    # list() surfaces the first exception raised by any chunk
+                    list(executor.map(fetch_chunk, offsets))
+        except Exception as e:
+            self.logger.error(f"Bulk vector fetch failed: {e}")
+            raise
+        
+        id_order = np.array(ids, dtype=object)
+        if found.all():
+            return matrix, id_order
+        
+        self.logger.info(f"{int((~found).sum())} of {len(ids)} vectors not found in namespace '{namespace}'")
+        return matrix[found], id_order[found]
+
     def get_index_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the Pinecone index
@@ -253,3 +585,12 @@ class PineconeEmbeddingManager:
         except Exception as e:
             self.logger.error(f"Failed to retrieve index stats: {e}")
             raise
+
+    def close(self):
+        """
+        Shut down the query coalescer after it finishes already-queued queries
+        """
+        with self._coalescer_lock:
+            coalescer, self._query_coalescer = self._query_coalescer, None
+        if coalescer is not None:
+            coalescer.close()
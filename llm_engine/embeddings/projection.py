@@ -0,0 +1,250 @@
+import os
+import json
+import logging
+from typing import List, Dict, Any, Optional, Sequence
+import numpy as np
+
+
+def _l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.clip(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12, None)
+
+
+class EmbeddingProjection:
+    kind = 'base'
+
+    def __init__(self, input_dim: int, output_dim: int, normalize: bool = True, model_name: Optional[str] = None):
+        """
+        Dimensionality reduction applied identically at ingest and query time
+
+        :param input_dim: Dimension of the model embeddings
+        :param output_dim: Dimension of the stored vectors
+        :param normalize: L2-normalize projected vectors (keeps cosine scores meaningful)
+        :param model_name: Embedding model the projection was built for
+        """
+        if output_dim > input_dim:
+            raise ValueError(f"output_dim {output_dim} exceeds input_dim {input_dim}")
+
+        self.input_dim = input_dim
+        self.output_dim = output_dim
+        self.normalize = normalize
+        self.model_name = model_name
+
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def transform(self, vectors: np.ndarray, projected: bool = False) -> np.ndarray:
+        """
+        Project model embeddings
+
+        :param vectors: Array of shape (..., input_dim), or (..., output_dim) when projected
+        :param projected: The vectors were already projected (e.g. read back from the index);
+                          they are only checked and converted, not projected again
+        :return: Float32 array of shape (..., output_dim)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        expected = self.output_dim if projected else self.input_dim
+        if vectors.shape[-1] != expected:
+            raise ValueError(
+                f"Expected {'projected ' if projected else ''}vectors of dimension {expected}, "
+                f"got {vectors.shape[-1]}"
+            )
+        if projected:
+            return vectors
+
+        projected_vectors = self._project(vectors).astype(np.float32, copy=False)
+        return _l2_normalize(projected_vectors) if self.normalize else projected_vectors
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def save(self, path: str):
+        """
+        Persist the projection (typically next to the index it serves)
+
+        :param path: Destination .npz file
+        """
+        meta = {
+            'kind': self.kind,
+            'input_dim': self.input_dim,
+            'output_dim': self.output_dim,
+            'normalize': self.normalize,
+            'model_name': self.model_name
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + '.tmp', 'wb') as projection_file:
+            np.savez(projection_file, meta=np.array(json.dumps(meta)), **self._arrays())
+        os.replace(path + '.tmp', path)
+
+
+class PCAProjection(EmbeddingProjection):
+    kind = 'pca'
+
+    def __init__(
+        self,
+        mean: np.ndarray,
+        components: np.ndarray,
+        explained_variance_ratio: Optional[np.ndarray] = None,
+        normalize: bool = True,
+        model_name: Optional[str] = None
+    ):
+        """
+        Learned linear projection onto the top principal components
+
+        :param mean: Offset subtracted before projecting, shape (input_dim,)
+        :param components: Principal axes, shape (output_dim, input_dim)
+        :param explained_variance_ratio: Variance share of each kept component
+        :param normalize: L2-normalize projected vectors
+        :param model_name: Embedding model the projection was fitted for
+        """
+        super().__init__(components.shape[1], components.shape[0], normalize, model_name)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.explained_variance_ratio = explained_variance_ratio
+
+    @classmethod
+    def fit(
+        cls,
+        sample: np.ndarray,
+        output_dim: int,
+        normalize: bool = True,
+        model_name: Optional[str] = None,
+        center: bool = False
+    ) -> 'PCAProjection':
+        """
+        Fit PCA on a sample of corpus embeddings
+
+        By default the axes are fitted without centering (a truncated SVD), which
+        best preserves the inner products cosine search ranks by; centered PCA
+        drops the shared mean direction and can reorder neighbours.
+
+        :param sample: Embeddings of shape (n, input_dim), n >= output_dim
+        :param output_dim: Number of components to keep
+        :param normalize: L2-normalize projected vectors
+        :param model_name: Embedding model the sample came from
+        :param center: Subtract the sample mean before fitting and projecting
+        :return: Fitted projection
+        """
+        sample = np.asarray(sample, dtype=np.float64)
+        if sample.shape[0] < output_dim:
+            raise ValueError(f"Need at least {output_dim} samples to fit {output_dim} components")
+
+        mean = sample.mean(axis=0) if center else np.zeros(sample.shape[1])
+        _, singular_values, vt = np.linalg.svd(sample - mean, full_matrices=False)
+        variance = singular_values ** 2
+        return cls(
+            mean=mean,
+            components=vt[:output_dim],
+            explained_variance_ratio=(variance / variance.sum())[:output_dim],
+            normalize=normalize,
+            model_name=model_name
+        )
+
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        return (vectors - self.mean) @ self.components.T
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {'mean': self.mean, 'components': self.components}
+        if self.explained_variance_ratio is not None:
+            arrays['explained_variance_ratio'] = np.asarray(self.explained_variance_ratio)
+        return arrays
+
+
+class MatryoshkaTruncation(EmbeddingProjection):
+    kind = 'truncate'
+
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Keep the leading dimensions (meaningful for Matryoshka-trained models)
+        """
+        return vectors[..., :self.output_dim]
+
+
+def load_projection(path: str) -> EmbeddingProjection:
+    """
+    Load a projection saved with EmbeddingProjection.save
+
+    :param path: .npz file
+    :return: PCAProjection or MatryoshkaTruncation
+    """
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        if meta['kind'] == 'pca':
+            return PCAProjection(
+                mean=data['mean'],
+                components=data['components'],
+                explained_variance_ratio=data['explained_variance_ratio'] if 'explained_variance_ratio' in data else None,
+                normalize=meta['normalize'],
+                model_name=meta['model_name']
+            )
+        if meta['kind'] == 'truncate':
+            return MatryoshkaTruncation(
+                meta['input_dim'], meta['output_dim'], meta['normalize'], meta['model_name']
+            )
+    raise ValueError(f"Unknown projection kind: {meta['kind']}")
+
+
+def recall_report(
+    corpus: np.ndarray,
+    queries: Optional[np.ndarray] = None,
+    dims: Sequence[int] = (32, 64, 128, 192, 256),
+    k: int = 10,
+    method: str = 'pca',
+    fit_sample: Optional[int] = None,
+    seed: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Recall@k of cosine search after projection, relative to full-dimension search
+
+    :param corpus: Corpus embeddings of shape (n, input_dim)
+    :param queries: Query embeddings (defaults to a sample of the corpus, self-matches excluded)
+    :param dims: Output dimensions to evaluate
+    :param k: Neighbourhood size
+    :param method: 'pca' or 'truncate'
+    :param fit_sample: Number of corpus rows used to fit PCA (all if None)
+    :param seed: Random seed for query and fit sampling
+    :return: One row per dimension with recall and memory ratio
+    """
+    rng = np.random.default_rng(seed)
+    corpus = np.asarray(corpus, dtype=np.float32)
+    input_dim = corpus.shape[1]
+
+    exclude_self = queries is None
+    # A neighbourhood cannot be larger than the candidates it is drawn from
+    k = max(1, min(k, corpus.shape[0] - (1 if exclude_self else 0)))
+    if queries is None:
+        query_rows = rng.choice(corpus.shape[0], size=min(200, corpus.shape[0]), replace=False)
+        queries = corpus[query_rows]
+
+    def top_k(base: np.ndarray, probe: np.ndarray) -> np.ndarray:
+        scores = _l2_normalize(probe) @ _l2_normalize(base).T
+        if exclude_self:
+            scores[np.arange(len(query_rows)), query_rows] = -np.inf
+        return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+    truth = top_k(corpus, queries)
+    sample = corpus
+    if fit_sample and fit_sample < corpus.shape[0]:
+        sample = corpus[rng.choice(corpus.shape[0], size=fit_sample, replace=False)]
+
+    rows = []
+    for dim in dims:
+        if dim > input_dim:
+            continue
+        if method == 'pca':
+            projection = PCAProjection.fit(sample, dim)
+        elif method == 'truncate':
+            projection = MatryoshkaTruncation(input_dim, dim)
+        else:
+            raise ValueError(f"Unknown projection method: {method}")
+
+        found = top_k(projection.transform(corpus), projection.transform(queries))
+        recall = np.mean([len(set(t) & set(f)) / k for t, f in zip(truth, found)])
+        rows.append({
+            'method': method,
+            'dim': dim,
+            f'recall@{k}': float(recall),
+            'memory_ratio': dim / input_dim
+        })
+
+    logging.getLogger(__name__).info(f"Computed {method} recall for dims {[row['dim'] for row in rows]}")
+    return rows
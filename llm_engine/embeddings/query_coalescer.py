@@ -0,0 +1,275 @@
+import json
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+
+
+class _PendingQuery:
+    __slots__ = ('vector', 'top_k', 'namespace', 'filter', 'future', 'enqueued_at')
+
+    def __init__(self, vector: List[float], top_k: int, namespace: str, filter: Dict[str, Any]):
+        self.vector = vector
+        self.top_k = top_k
+        self.namespace = namespace
+        self.filter = filter
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+    def group_key(self) -> Tuple[str, int, str]:
+        # Only queries sharing namespace, top_k and filter can go out as one request
+        return (self.namespace, self.top_k, json.dumps(self.filter, sort_keys=True, default=str))
+
+
+class QueryCoalescer:
+    def __init__(
+        self,
+        index: Any,
+        max_wait_ms: float = 5.0,
+        max_batch_size: int = 32,
+        max_concurrent_requests: int = 8,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Gather concurrent vector queries briefly and send them as batched requests
+
+        Backends exposing ``query_batch`` (such as LocalVectorBackend) receive one
+        call per group. Backends without a multi-vector query (the Pinecone data
+        plane) get each query sent over a shared pool, so one namespace's request
+        never waits behind another's.
+
+        :param index: Pinecone index or VectorBackend to query
+        :param max_wait_ms: Longest time the first query of a batch waits for company
+        :param max_batch_size: Largest number of queries sent in one batch
+        :param max_concurrent_requests: Pool size for backends without batch queries
+        :param logger: Optional logger for tracking operations
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.index = index
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self.max_concurrent_requests = max_concurrent_requests
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._queue: 'queue.Queue[Optional[_PendingQuery]]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._closed = False
+
+        # Metrics
+        self._batches = 0
+        self._queries = 0
+        self._total_wait_s = 0.0
+
+    def _enqueue(self, pending: _PendingQuery):
+        """
+        Queue a query, starting the batching thread on first use
+
+        :param pending: Query to queue
+        """
+        # Enqueue under the lock so nothing can land behind close()'s sentinel
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("QueryCoalescer is closed")
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='query-coalescer', daemon=True)
+                self._worker.start()
+            self._queue.put(pending)
+
+    def submit(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        namespace: str = 'default',
+        filter: Optional[Dict[str, Any]] = None
+    ) -> Future:
+        """
+        Queue a query and return a future for its result
+
+        :param query_embedding: Query embedding
+        :param top_k: Number of matches to return
+        :param namespace: Namespace to query
+        :param filter: Optional metadata filter
+        :return: Future resolving to the query result dictionary
+        """
+        vector = np.asarray(query_embedding, dtype=np.float32).reshape(-1).tolist()
+        pending = _PendingQuery(vector, top_k, namespace, filter or {})
+        self._enqueue(pending)
+        return pending.future
+
+    def query(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        namespace: str = 'default',
+        filter: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a query through the coalescer and wait for its result
+
+        :param query_embedding: Query embedding
+        :param top_k: Number of matches to return
+        :param namespace: Namespace to query
+        :param filter: Optional metadata filter
+        :return: Query result dictionary
+        """
+        return self.submit(query_embedding, top_k, namespace, filter).result()
+
+    def _collect_batch(self, first: _PendingQuery) -> Tuple[List[_PendingQuery], bool]:
+        """
+        Gather queries that arrive within max_wait_ms of the first one
+
+        :param first: Query that opened the batch
+        :return: Batch of queries and whether a shutdown sentinel was seen
+        """
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if pending is None:
+                return batch, True
+            batch.append(pending)
+
+        return batch, False
+
+    def _run(self):
+        """
+        Worker loop: collect a batch, group it and dispatch each group
+        """
+        batch: List[_PendingQuery] = []
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    return
+
+                batch = [first]
+                batch, stop = self._collect_batch(first)
+                dispatched_at = time.perf_counter()
+
+                groups: Dict[Tuple[str, int, str], List[_PendingQuery]] = {}
+                for pending in batch:
+                    groups.setdefault(pending.group_key(), []).append(pending)
+
+                for group in groups.values():
+                    self._dispatch(group)
+
+                with self._lock:
+                    self._batches += 1
+                    self._queries += len(batch)
+                    self._total_wait_s += sum(dispatched_at - p.enqueued_at for p in batch)
+
+                if stop:
+                    return
+        except Exception as e:
+            self.logger.error(f"Query coalescer stopped: {e}")
+            # Detach this worker first so new queries start a fresh one instead of queueing behind it
+            with self._lock:
+                self._worker = None
+                stranded = list(batch)
+                while True:
+                    try:
+                        pending = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if pending is not None:
+                        stranded.append(pending)
+            for pending in stranded:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+
+    def _dispatch(self, group: List[_PendingQuery]):
+        """
+        Send one group of compatible queries and resolve its futures
+
+        :param group: Queries sharing namespace, top_k and filter
+        """
+        head = group[0]
+        if hasattr(self.index, 'query_batch'):
+            try:
+                results = self.index.query_batch(
+                    [pending.vector for pending in group],
+                    top_k=head.top_k,
+                    namespace=head.namespace,
+                    filter=head.filter
+                )
+            except Exception as e:
+                self.logger.error(f"Batched query failed: {e}")
+                for pending in group:
+                    pending.future.set_exception(e)
+                return
+            for pending, result in zip(group, results):
+                pending.future.set_result(result)
+            return
+
+        # No multi-vector query on this backend: hand every query to the pool without
+        # waiting, so singleton groups (e.g. per-user namespaces) still run concurrently
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrent_requests,
+                thread_name_prefix='query-coalescer-io'
+            )
+        for pending in group:
+            self._executor.submit(self._resolve_single, pending)
+
+    def _resolve_single(self, pending: _PendingQuery):
+        """
+        Run one query against the index and resolve its future
+
+        :param pending: Pending query
+        """
+        try:
+            pending.future.set_result(self.index.query(
+                vector=pending.vector,
+                top_k=pending.top_k,
+                namespace=pending.namespace,
+                filter=pending.filter
+            ))
+        except Exception as e:
+            self.logger.error(f"Embedding query failed: {e}")
+            pending.future.set_exception(e)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Batching statistics
+
+        :return: Number of batches and queries, mean batch size and mean queue wait
+        """
+        with self._lock:
+            return {
+                'batches': self._batches,
+                'queries': self._queries,
+                'mean_batch_size': self._queries / self._batches if self._batches else 0.0,
+                'mean_wait_ms': 1000.0 * self._total_wait_s / self._queries if self._queries else 0.0,
+                'pending': self._queue.qsize()
+            }
+
+    def close(self):
+        """
+        Stop the worker after it drains already-queued queries
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+            if worker is not None and worker.is_alive():
+                self._queue.put(None)
+
+        if worker is not None:
+            worker.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
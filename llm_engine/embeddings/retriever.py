@@ -1,23 +1,34 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 import numpy as np
-from pymongo import MongoClient
-from sentence_transformers import SentenceTransformer
 from .pinecone_client import PineconeEmbeddingManager
 from .vector_store import VectorStore
+from .encoding_pool import MultiProcessEncodingPool
+from .length_bucketing import LengthBucketedEncoder
+from .embedding_service import EmbeddingService
+from .model_registry import EmbeddingModelRegistry
+from .stored_embeddings import EMBEDDING_FIELD, pack_embedding, load_embedding_matrix
 import logging
 import threading
 import time
 import uuid
 
+if TYPE_CHECKING:
+    from pymongo import MongoClient
+    from sentence_transformers import SentenceTransformer
+
 class RAGRetriever:
     def __init__(
         self, 
-        mongodb_client: MongoClient,
+        mongodb_client: 'MongoClient',
         pinecone_client: PineconeEmbeddingManager,
-        embedding_model: SentenceTransformer,
+        embedding_model: Optional['SentenceTransformer'] = None,
         database_name: str = 'user_documents',
         collection_name: str = 'documents',
-        sync_interval: int = 3600  # 1 hour
+        sync_interval: int = 3600,  # 1 hour
+        encoding_pool: Optional[MultiProcessEncodingPool] = None,
+        embedding_dtype: str = 'float32',
+        model_version: Optional[str] = None,
+        response_cache: Optional[Any] = None
     ):
         """
         Manage document retrieval across multiple vector stores
@@ -25,9 +36,15 @@ class RAGRetriever:
         :param mongodb_client: Initialized MongoDB client
         :param pinecone_client: Initialized Pinecone embedding manager
         :param embedding_model: Sentence transformer for generating embeddings
+                                (defaults to the model shared with the Pinecone manager)
         :param database_name: MongoDB database name
         :param collection_name: MongoDB collection name
         :param sync_interval: Time between synchronization attempts
+        :param encoding_pool: Optional multi-process pool used for bulk (re-)encoding
+        :param embedding_dtype: Precision of embeddings stored on Mongo documents ('float32' or 'float16')
+        :param model_version: Tag for stored embeddings (defaults to the Pinecone manager's model name;
+                              set it when passing a custom embedding_model)
+        :param response_cache: Optional ResponseCache whose entries are dropped when documents change
         """
         # Database connections
         self.mongo_client = mongodb_client
@@ -36,7 +53,12 @@ class RAGRetriever:
         
         # Vector database clients
         self.pinecone_client = pinecone_client
-        self.embedding_model = embedding_model
+        self._embedding_model = embedding_model
+        self.encoding_pool = encoding_pool
+        self._bulk_encoder = None
+        self.embedding_dtype = embedding_dtype
+        self._model_version = model_version
+        self.response_cache = response_cache
         
         # Local vector stores
         self.user_vector_stores: Dict[str, VectorStore] = {}
@@ -52,6 +74,117 @@ class RAGRetriever:
         self._stop_sync = threading.Event()
         self._sync_thread = None
 
+    @property
+    def embedding_model(self) -> 'SentenceTransformer':
+        """
+        Embedding model, shared with the Pinecone manager unless one was given
+        
+        When the manager has an embedding service, encoding goes through it so
+        concurrent add/retrieve calls are batched together.
+        """
+        if self._embedding_model is not None:
+            return self._embedding_model
+        return self.pinecone_client.encoder
+
+    @property
+    def bulk_encoder(self):
+        """
+        Encoder for large text lists; batches by token length to minimise padding
+        """
+        model = self.embedding_model
+        if isinstance(model, (LengthBucketedEncoder, EmbeddingService)):
+            return model
+        if self._bulk_encoder is None or self._bulk_encoder.model is not model:
+            self._bulk_encoder = LengthBucketedEncoder(model)
+        return self._bulk_encoder
+
+    @property
+    def model_version(self) -> str:
+        """
+        Version tag of stored embeddings; vectors with another tag are re-encoded
+        """
+        if self._model_version is not None:
+            return self._model_version
+        model_name = getattr(self.pinecone_client, 'model_name', None) or 'unknown'
+        return EmbeddingModelRegistry.normalize_name(model_name)
+
+    def _load_or_encode_embeddings(self, documents: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Embeddings for documents, reusing vectors stored in Mongo where current
+        
+        Only documents without a stored vector for this model version (or whose
+        text changed) are encoded; their vectors are written back to Mongo.
+        
+        :param documents: Documents as returned by MongoDB (updated in place)
+        :return: Float32 embedding matrix in document order
+        """
+        embeddings, missing = load_embedding_matrix(documents, self.model_version)
+        if not missing:
+            return embeddings
+        
+        encoded = self._encode_texts([documents[position].get('text', '') for position in missing])
+        
+        if embeddings.shape[1] != encoded.shape[1]:
+            resized = np.zeros((len(documents), encoded.shape[1]), dtype=np.float32)
+            stale = sorted(set(range(len(documents))) - set(missing))
+            if stale:
+                # Stored vectors of another dimension can't be mixed in: encode only those documents too
+                self.logger.warning("Stored embeddings have a different dimension; re-encoding all documents")
+                resized[stale] = self._encode_texts([documents[position].get('text', '') for position in stale])
+            embeddings = resized
+            embeddings[missing] = encoded
+            missing = list(range(len(documents)))
+        else:
+            embeddings[missing] = encoded
+        
+        changed = [documents[position] for position in missing]
+        self._store_embeddings(changed, embeddings[missing])
+        if self.response_cache is not None:
+            self.response_cache.invalidate_documents(str(document['_id']) for document in changed)
+        self.logger.info(
+            f"Reused {len(documents) - len(missing)} stored embeddings, encoded {len(missing)}"
+        )
+        return embeddings
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts in bulk
+        
+        :param texts: Texts to encode
+        :return: Float32 embedding matrix
+        """
+        # Bulk path uses the process pool when configured
+        if self.encoding_pool is not None:
+            encoded = self.encoding_pool.encode(texts)
+        else:
+            encoded = self.bulk_encoder.encode(texts)
+        return np.asarray(encoded, dtype=np.float32)
+
+    def _store_embeddings(self, documents: List[Dict[str, Any]], embeddings: np.ndarray):
+        """
+        Persist packed embeddings on their Mongo documents
+        
+        :param documents: Documents the embeddings belong to (updated in place)
+        :param embeddings: One embedding per document
+        """
+        from pymongo import UpdateOne
+        
+        operations = []
+        for document, embedding in zip(documents, embeddings):
+            document[EMBEDDING_FIELD] = pack_embedding(
+                embedding,
+                self.model_version,
+                dtype=self.embedding_dtype,
+                text=document.get('text', '')
+            )
+            operations.append(UpdateOne(
+                {'_id': document['_id']},
+                {'$set': {EMBEDDING_FIELD: document[EMBEDDING_FIELD]}}
+            ))
+        
+        if operations:
+            self.documents_collection.bulk_write(operations, ordered=False)
+
     def _get_or_create_local_store(self, user_id: str) -> VectorStore:
         """
         Get or create a local vector store for a user
@@ -61,7 +194,10 @@ class RAGRetriever:
         """
         if user_id not in self.user_vector_stores:
             dimension = self.embedding_model.get_sentence_embedding_dimension()
-            self.user_vector_stores[user_id] = VectorStore(dimension=dimension)
+            self.user_vector_stores[user_id] = VectorStore(
+                dimension=dimension,
+                projection=getattr(self.pinecone_client, 'projection', None)
+            )
         
         return self.user_vector_stores[user_id]
 
@@ -81,13 +217,16 @@ class RAGRetriever:
         document['user_id'] = user_id
         document['_id'] = str(uuid.uuid4())  # Ensure unique ID
         
-        # Insert into MongoDB
-        self.documents_collection.insert_one(document)
-        
         # Generate embedding
         text = document.get('text', '')
         embedding = self.embedding_model.encode(text)
         
+        # Insert into MongoDB with the packed embedding, so rebuilds need no re-encoding
+        document[EMBEDDING_FIELD] = pack_embedding(
+            embedding, self.model_version, dtype=self.embedding_dtype, text=text
+        )
+        self.documents_collection.insert_one(document)
+        
         # Update local vector store
         local_store = self._get_or_create_local_store(user_id)
         local_store.add_documents([document], embedding.reshape(1, -1))
@@ -108,6 +247,31 @@ class RAGRetriever:
         
         return document['_id']
 
+    def delete_document(self, user_id: str, document_id: str) -> bool:
+        """
+        Delete a document from MongoDB and vector stores
+        
+        Cached responses generated with the document as context are dropped too.
+        
+        :param user_id: Unique identifier for the user
+        :param document_id: MongoDB document ID
+        :return: Whether the document existed
+        """
+        result = self.documents_collection.delete_one({'_id': document_id, 'user_id': user_id})
+        
+        # The local store keys documents by its own IDs
+        local_store = self.user_vector_stores.get(user_id)
+        if local_store is not None:
+            for store_id, document in list(zip(local_store.document_ids, local_store.documents)):
+                if document.get('_id') == document_id:
+                    local_store.delete_document(store_id)
+        self.pinecone_client.delete_embeddings([str(document_id)], namespace=f"user_{user_id}")
+        
+        if self.response_cache is not None:
+            self.response_cache.invalidate_documents([str(document_id)])
+        
+        return result.deleted_count > 0
+
     def retrieve_documents(
         self, 
         user_id: str, 
@@ -142,10 +306,13 @@ class RAGRetriever:
             result.get('id') for result in pinecone_results.get('matches', [])
         ]
         
-        full_documents = list(self.documents_collection.find({
-            '_id': {'$in': document_ids},
-            'user_id': user_id
-        }))
+        full_documents = list(self.documents_collection.find(
+            {
+                '_id': {'$in': document_ids},
+                'user_id': user_id
+            },
+            {EMBEDDING_FIELD: 0}
+        ))
         
         return full_documents
 
@@ -168,8 +335,8 @@ class RAGRetriever:
             # Prepare for embedding
             texts = [doc.get('text', '') for doc in user_documents]
             
-            # Generate embeddings
-            embeddings = self.embedding_model.encode(texts)
+            # Reuse stored embeddings; encode only new or changed documents
+            embeddings = self._load_or_encode_embeddings(user_documents)
             
             # Update local vector store
             local_store = self._get_or_create_local_store(user_id)
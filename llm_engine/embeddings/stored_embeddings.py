@@ -0,0 +1,133 @@
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+
+# Document field holding the packed embedding
+EMBEDDING_FIELD = 'embedding'
+
+# Little-endian dtypes so stored bytes are portable across hosts
+_DTYPES = {
+    'float32': np.dtype('<f4'),
+    'float16': np.dtype('<f2')
+}
+
+
+def text_fingerprint(text: str) -> str:
+    """
+    Short hash of a document's text, used to detect stale stored embeddings
+
+    :param text: Document text
+    :return: Hex digest prefix
+    """
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def pack_embedding(
+    embedding: np.ndarray,
+    model_version: str,
+    dtype: str = 'float32',
+    text: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Pack an embedding into a compact sub-document for MongoDB
+
+    The vector is stored as raw little-endian bytes, which pymongo writes as
+    BSON binary, instead of an array of doubles.
+
+    :param embedding: 1-D embedding vector
+    :param model_version: Identifier of the model that produced the vector
+    :param dtype: 'float32' or 'float16'
+    :param text: Text the vector was computed from (stored as a fingerprint)
+    :return: Sub-document with data, dtype, dim, model and text fingerprint
+    """
+    if dtype not in _DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+    vector = np.asarray(embedding).reshape(-1)
+    packed = {
+        'data': vector.astype(_DTYPES[dtype]).tobytes(),
+        'dtype': dtype,
+        'dim': int(vector.shape[0]),
+        'model': model_version
+    }
+    if text is not None:
+        packed['text_hash'] = text_fingerprint(text)
+    return packed
+
+
+def unpack_embedding(packed: Dict[str, Any]) -> np.ndarray:
+    """
+    Decode a packed embedding sub-document
+
+    :param packed: Sub-document produced by pack_embedding
+    :return: Float32 vector
+    """
+    vector = np.frombuffer(bytes(packed['data']), dtype=_DTYPES[packed['dtype']])
+    if vector.shape[0] != packed['dim']:
+        raise ValueError(f"Stored embedding has {vector.shape[0]} values, expected {packed['dim']}")
+    return vector.astype(np.float32)
+
+
+def is_current(
+    packed: Optional[Dict[str, Any]],
+    model_version: Optional[str] = None,
+    text: Optional[str] = None
+) -> bool:
+    """
+    Check whether a stored embedding can be reused
+
+    :param packed: Stored sub-document (or None)
+    :param model_version: Required model version (any if None)
+    :param text: Current document text (not checked if None or no fingerprint was stored)
+    :return: True if the stored vector matches the model and text
+    """
+    if not isinstance(packed, dict) or packed.get('dtype') not in _DTYPES:
+        return False
+    if model_version is not None and packed.get('model') != model_version:
+        return False
+    if text is not None and 'text_hash' in packed and packed['text_hash'] != text_fingerprint(text):
+        return False
+    return True
+
+
+def load_embedding_matrix(
+    documents: List[Dict[str, Any]],
+    model_version: Optional[str] = None,
+    field: str = EMBEDDING_FIELD,
+    text_field: Optional[str] = 'text'
+) -> Tuple[np.ndarray, List[int]]:
+    """
+    Bulk-load stored embeddings of many documents into one matrix
+
+    Vectors of the same dtype are decoded with a single frombuffer call over
+    the concatenated bytes.
+
+    :param documents: Documents as returned by MongoDB
+    :param model_version: Only reuse vectors from this model version
+    :param field: Document field holding the packed embedding
+    :param text_field: Field whose fingerprint must match (None to skip the check)
+    :return: (float32 matrix with one row per document, positions lacking a usable vector).
+             Rows at missing positions are zero.
+    """
+    current = []
+    missing = []
+    for position, document in enumerate(documents):
+        packed = document.get(field)
+        text = document.get(text_field, '') if text_field else None
+        if is_current(packed, model_version, text):
+            current.append(position)
+        else:
+            missing.append(position)
+
+    dims = {documents[position][field]['dim'] for position in current}
+    if len(dims) > 1:
+        raise ValueError(f"Stored embeddings have mixed dimensions: {sorted(dims)}")
+
+    matrix = np.zeros((len(documents), dims.pop() if dims else 0), dtype=np.float32)
+    for dtype in _DTYPES:
+        positions = [p for p in current if documents[p][field]['dtype'] == dtype]
+        if positions:
+            data = b''.join(bytes(documents[p][field]['data']) for p in positions)
+            matrix[positions] = np.frombuffer(data, dtype=_DTYPES[dtype]).reshape(len(positions), -1)
+
+    return matrix, missing
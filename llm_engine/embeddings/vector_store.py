@@ -1,15 +1,26 @@
 import numpy as np
 from typing import List, Dict, Any, Optional, Union
-import faiss
 import uuid
 import logging
+from .projection import EmbeddingProjection
+from .stored_embeddings import EMBEDDING_FIELD
+
+def _faiss():
+    """
+    Import FAISS on first use so importing this module stays cheap
+    
+    :return: The faiss module
+    """
+    import faiss
+    return faiss
 
 class VectorStore:
     def __init__(
         self, 
         dimension: int = 1536, 
         metric: str = 'l2',
-        logger: Optional[logging.Logger] = None
+        logger: Optional[logging.Logger] = None,
+        projection: Optional[EmbeddingProjection] = None
     ):
         """
         Initialize the vector store with specified embedding dimension
@@ -17,21 +28,39 @@ class VectorStore:
         :param dimension: Dimensionality of embeddings
         :param metric: Distance metric for index ('l2' or 'cosine')
         :param logger: Optional logger for tracking operations
+        :param projection: Optional dimensionality reduction applied to stored and query vectors
         """
+        # With a projection the index holds the reduced vectors
+        self.projection = projection
+        if projection is not None:
+            dimension = projection.output_dim
+        
         self.dimension = dimension
+        self.metric = metric
         self.logger = logger or logging.getLogger(__name__)
         
         # Create FAISS index based on metric
-        if metric == 'l2':
-            self.index = faiss.IndexFlatL2(dimension)
-        elif metric == 'cosine':
-            self.index = faiss.IndexFlatIP(dimension)  # Inner product for cosine
-        else:
-            raise ValueError(f"Unsupported metric: {metric}")
+        self.index = self._new_index()
         
         # Document storage with enhanced metadata
         self.documents: List[Dict[str, Any]] = []
         self.document_ids: List[str] = []
+        
+        # Indexed (projected, normalized) vectors, one row per document, so the
+        # index can be rebuilt after deletes; capacity grows geometrically
+        self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+
+    def _new_index(self):
+        """
+        Create an empty FAISS index for the configured metric
+        
+        :return: FAISS index
+        """
+        if self.metric == 'l2':
+            return _faiss().IndexFlatL2(self.dimension)
+        elif self.metric == 'cosine':
+            return _faiss().IndexFlatIP(self.dimension)  # Inner product for cosine
+        raise ValueError(f"Unsupported metric: {self.metric}")
 
     def add_documents(
         self, 
@@ -49,9 +78,12 @@ class VectorStore:
         if len(documents) != embeddings.shape[0]:
             raise ValueError("Number of documents must match number of embeddings")
         
-        # Normalize and add embeddings to index
-        normalized_embeddings = self._normalize_embeddings(embeddings)
+        # Project, normalize and add embeddings to index
+        if self.projection is not None:
+            embeddings = self.projection.transform(embeddings)
+        normalized_embeddings = np.ascontiguousarray(self._normalize_embeddings(embeddings), dtype=np.float32)
         self.index.add(normalized_embeddings)
+        self._append_vectors(normalized_embeddings)
         
         # Process documents with ID management
         for doc, embedding in zip(documents, embeddings):
@@ -62,8 +94,8 @@ class VectorStore:
             if 'user_id' not in doc:
                 self.logger.warning("Document missing user_id")
             
-            # Store document and ID
-            self.documents.append(doc)
+            # Store document and ID; the packed embedding would duplicate the indexed vector
+            self.documents.append({key: value for key, value in doc.items() if key != EMBEDDING_FIELD})
             self.document_ids.append(doc_id)
 
     def search(
@@ -80,7 +112,9 @@ class VectorStore:
         :param filter_fn: Optional function to filter results
         :return: List of most similar documents
         """
-        # Normalize query embedding
+        # Project and normalize query embedding
+        if self.projection is not None:
+            query_embedding = self.projection.transform(query_embedding)
         normalized_query = self._normalize_embeddings(query_embedding.reshape(1, -1))
         
         # Perform search
@@ -89,11 +123,12 @@ class VectorStore:
         # Prepare results with scoring
         results = [
             {
-                **self.documents[idx], 
+                **self.documents[idx],
                 "score": float(score),
                 "id": self.document_ids[idx]
             } 
             for score, idx in zip(distances[0], indices[0])
+            if idx >= 0  # FAISS pads with -1 when the store holds fewer than k documents
         ]
         
         # Apply optional filtering
@@ -102,6 +137,19 @@ class VectorStore:
         
         return results
 
+    def _append_vectors(self, vectors: np.ndarray):
+        """
+        Record indexed vectors after the existing rows
+        
+        :param vectors: Projected, normalized vectors just added to the index
+        """
+        count = self.index.ntotal - len(vectors)
+        if self.index.ntotal > self._vectors.shape[0]:
+            grown = np.empty((max(self.index.ntotal, 2 * self._vectors.shape[0], 64), self.dimension), dtype=np.float32)
+            grown[:count] = self._vectors[:count]
+            self._vectors = grown
+        self._vectors[count:self.index.ntotal] = vectors
+
     def delete_document(self, document_id: str):
         """
         Delete a specific document by its ID
@@ -111,41 +159,29 @@ class VectorStore:
         try:
             # Find document index
             doc_index = self.document_ids.index(document_id)
-            
-            # Remove from documents and IDs
-            del self.documents[doc_index]
-            del self.document_ids[doc_index]
-            
-            # Rebuild FAISS index
-            self._rebuild_index()
-        
         except ValueError:
             self.logger.warning(f"Document {document_id} not found")
-
-    def _rebuild_index(self):
-        """
-        Rebuild the FAISS index after deletions
-        """
-        # Recreate index
-        self.index = faiss.IndexFlatL2(self.dimension)
+            return
         
-        # Re-add remaining embeddings
-        if self.documents:
-            embeddings = np.array([
-                self._get_embedding(doc) for doc in self.documents
-            ])
-            self.index.add(embeddings)
+        # Rebuild FAISS index first; the store is only changed once it succeeds
+        self._rebuild_index(exclude=doc_index)
+        del self.documents[doc_index]
+        del self.document_ids[doc_index]
 
-    def _get_embedding(self, document: Dict[str, Any]) -> np.ndarray:
+    def _rebuild_index(self, exclude: int):
         """
-        Extract or generate embedding for a document
+        Rebuild the FAISS index without one row, from the store's own vectors
         
-        :param document: Document dictionary
-        :return: Embedding vector
+        :param exclude: Row of the deleted document
         """
-        # Implement your embedding extraction logic here
-        # This is a placeholder and should be replaced with actual embedding retrieval
-        return np.zeros(self.dimension)
+        count = len(self.documents)
+        remaining = np.delete(self._vectors[:count], exclude, axis=0)
+        
+        index = self._new_index()
+        if len(remaining):
+            index.add(remaining)
+        self.index = index
+        self._vectors = remaining
 
     def _normalize_embeddings(self, embeddings: np.ndarray) -> np.ndarray:
         """
@@ -160,9 +196,10 @@ class VectorStore:
 
     def clear(self):
         """Clear the vector store completely."""
-        self.index = faiss.IndexFlatL2(self.dimension)
+        self.index = self._new_index()
         self.documents = []
         self.document_ids = []
+        self._vectors = np.empty((0, self.dimension), dtype=np.float32)
 
     def get_document_count(self) -> int:
         """
@@ -1,11 +1,11 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Tuple, Union
 import torch
 from .embeddings.vector_store import VectorStore
-from .embeddings.retriever import RAGRetriever
 from .models.inference import LLMInference
-from .models.tokenizer import TokenizerUtils
 from .utils.prompt_templates import PromptTemplates
 from .utils.llm_utils import LLMUtils
+from .utils.response_cache import ResponseCache, context_fingerprints
+from .utils.config_manager import config_manager
 
 class LLMEngine:
     def __init__(
@@ -13,13 +13,31 @@ class LLMEngine:
         model,
         tokenizer,
         embedding_model,
-        device: str = "cuda" if torch.cuda.is_available() else "cpu"
+        device: str = "cuda" if torch.cuda.is_available() else "cpu",
+        retriever: Optional[Any] = None,
+        response_cache: Union[ResponseCache, bool, None] = None
     ):
-        """Initialize the LLM engine with all components."""
+        """
+        Initialize the LLM engine with all components.
+
+        retriever is any object with retrieve(query, k) returning documents with
+        a "text" field; without one, queries are answered without RAG context.
+        embedding_model is unused; retrievers embed with their own model.
+        Document writes and deletes go through add_documents and
+        delete_documents, which pass them to the retriever's methods of the
+        same name and drop cached responses built from those documents.
+        response_cache reuses responses of repeated deterministic requests;
+        None builds one from model_config.yaml, False disables it.
+        """
         self.inference = LLMInference(model, tokenizer, device)
-        self.tokenizer_utils = TokenizerUtils(tokenizer)
+        # Share the inference wrapper's token-count cache
+        self.tokenizer_utils = self.inference.tokenizer_utils
         self.vector_store = VectorStore()
-        self.retriever = RAGRetriever(self.vector_store, embedding_model)
+        self.retriever = retriever
+
+        if response_cache is None:
+            response_cache = ResponseCache.from_config(config_manager.get_model_config('local', 'response_cache'))
+        self.response_cache = response_cache or None
 
     def process_query(
         self,
@@ -27,34 +45,128 @@ class LLMEngine:
         max_length: int = 1000,
         temperature: float = 0.7,
         use_rag: bool = True,
-        context_size: int = 5
+        context_size: int = 5,
+        stream: bool = False,
+        adapter: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Process a query and generate a response."""
+        """
+        Process a query and generate a response.
+
+        Retrieved documents are packed in rank order into the model window,
+        or into max_length when that is smaller; metadata["context_tokens"]
+        reports how many tokens they use. With stream=True, "response" is an
+        iterator of text increments and "metadata" gains token counts and
+        timings once it is exhausted.
+        adapter selects a user's LoRA adapter from the inference registry.
+        """
         # Get relevant context if RAG is enabled
         context = None
-        if use_rag:
-            context = self.retriever.retrieve(query, k=context_size)
+        context_tokens = 0
+        prompt = query
+        if use_rag and self.retriever is not None:
+            # Packed once here; generation receives the finished prompt
+            packed = self.inference.pack_context(query, self.retriever.retrieve(query, k=context_size), max_length)
+            context, context_tokens = packed["documents"], packed["tokens"]
+            prompt = self.inference.join_context(query, packed["text"])
             
+        if stream:
+            metadata = {"context_used": bool(context), "context_tokens": context_tokens}
+            return {
+                "response": self._stream_response(prompt, max_length, temperature, metadata, adapter),
+                "context": context,
+                "metadata": metadata
+            }
+
         # Generate response
-        response = self.inference.generate(
-            query,
-            max_length=max_length,
-            temperature=temperature,
-            context=context
-        )
+        params = {"max_length": max_length, "temperature": temperature}
+        if adapter is not None:
+            params["adapter"] = adapter
+        response, cached = self._generate(prompt, context=context, **params)
         
         return {
             "response": response,
             "context": context,
             "metadata": {
                 "tokens_used": self.tokenizer_utils.count_tokens(response),
-                "context_used": bool(context)
+                "context_used": bool(context),
+                "context_tokens": context_tokens,
+                "cached": cached
             }
         }
 
+    def _generate(
+        self,
+        prompt: str,
+        context: Optional[List[Dict[str, Any]]] = None,
+        **params
+    ) -> Tuple[str, bool]:
+        """
+        Generate a response, serving repeated deterministic requests from the cache.
+
+        prompt already includes any packed context; context lists the
+        documents it came from, so their changes invalidate the cached entry.
+        Returns the response and whether it came from the cache.
+        """
+        temperature = params.get("temperature", 0.7)
+        if self.response_cache is None or not self.inference.is_deterministic(temperature):
+            return self.inference.generate(prompt, **params), False
+
+        model_id = self.inference.model_id
+        if params.get("adapter") is not None:
+            # Retraining an adapter must not serve responses of its previous version
+            model_id += f":{params['adapter']}@{self.inference.adapter_version(params['adapter'])}"
+
+        context_ids = context_fingerprints(context)
+        key = ResponseCache.make_key(model_id, prompt, params, context_ids)
+        response = self.response_cache.get(key)
+        if response is not None:
+            return response, True
+
+        response = self.inference.generate(prompt, **params)
+        self.response_cache.put(key, response, context_ids)
+        return response, False
+
+    def invalidate_documents(self, document_ids: Iterable[Any]) -> int:
+        """Drop cached responses generated from any of the given documents."""
+        if self.response_cache is None:
+            return 0
+        return self.response_cache.invalidate_documents(document_ids)
+
+    def _stream_response(
+        self,
+        prompt: str,
+        max_length: int,
+        temperature: float,
+        metadata: Dict[str, Any],
+        adapter: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream a response to a prompt with packed context, recording token usage and timings."""
+        yield from self.inference.generate_stream(
+            prompt,
+            max_length=max_length,
+            temperature=temperature,
+            stats=metadata,
+            adapter=adapter
+        )
+        metadata["tokens_used"] = metadata.get("generated_tokens", 0)
+
     def add_documents(self, documents: List[Dict[str, Any]]):
-        """Add documents to the vector store for RAG."""
+        """Add documents to the retriever for RAG."""
+        if self.retriever is None:
+            raise RuntimeError("LLMEngine has no retriever; pass retriever= to add documents")
         self.retriever.add_documents(documents)
+        # A document added again under its ID replaces the version cached responses were built from
+        self.invalidate_documents(
+            document.get("_id", document.get("id")) for document in documents
+            if document.get("_id", document.get("id")) is not None
+        )
+
+    def delete_documents(self, document_ids: List[Any]):
+        """Delete documents from the retriever and drop responses built from them."""
+        if self.retriever is None:
+            raise RuntimeError("LLMEngine has no retriever; pass retriever= to delete documents")
+        self.retriever.delete_documents(document_ids)
+        self.invalidate_documents(document_ids)
 
     def analyze_style(self, text: str) -> Dict[str, Any]:
         """Analyze writing style characteristics."""
@@ -63,7 +175,7 @@ class LLMEngine:
             sample_text=text
         )
         
-        response = self.inference.generate(prompt)
+        response, _ = self._generate(prompt)
         return {"style_analysis": response}
 
     def generate_with_style(
@@ -79,7 +191,8 @@ class LLMEngine:
             prompt=prompt
         )
         
-        return self.inference.generate(
+        response, _ = self._generate(
             styled_prompt,
             temperature=temperature
         )
+        return response
@@ -1,61 +1,517 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterator
+import os
+import re
+import json
+import time
+import random
+import itertools
+import hashlib
+import logging
+import resource
+from functools import partial
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, Sampler
+from .inference import _local_model_config
+from .lora import DEFAULT_TARGET_MODULES, AdapterRegistry, inject_lora
+
+logger = logging.getLogger(__name__)
+
+IGNORE_INDEX = -100
+
+_CHECKPOINT_NAME = re.compile(r"checkpoint-\d+\.pt")
+
+
+def _peak_memory_mb(device: str) -> float:
+    """Peak memory of this process (CUDA allocations on GPU, resident set on CPU)."""
+    if str(device).startswith("cuda"):
+        return torch.cuda.max_memory_allocated() / 2 ** 20
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
 
 class PersonalStyleDataset(Dataset):
-    def __init__(self, texts: List[str], labels: List[str]):
-        self.texts = texts
-        self.labels = labels
+    def __init__(
+        self,
+        texts: List[str],
+        labels: List[str],
+        tokenizer,
+        max_length: int = 512,
+        cache_dir: Optional[str] = None
+    ):
+        """
+        Pre-tokenized (prompt, target) pairs for causal language model fine-tuning.
+
+        Each example is the text followed by its label; the loss covers only
+        the label tokens and the closing EOS. An empty label trains on the
+        whole text. Tokenization runs once in batch, and with cache_dir the
+        result is stored on disk keyed by the data, tokenizer and max_length.
+        """
+        self.max_length = max_length
+        self.input_ids: List[List[int]] = []
+        self.labels: List[List[int]] = []
+
+        cache_path = None
+        if cache_dir:
+            digest = hashlib.sha256()
+            digest.update(f"{getattr(tokenizer, 'name_or_path', '')}:{len(tokenizer)}:{max_length}".encode("utf-8"))
+            for text, label in zip(texts, labels):
+                digest.update(f"\0{text}\0{label or ''}".encode("utf-8"))
+            cache_path = os.path.join(os.path.expanduser(cache_dir), f"{digest.hexdigest()[:32]}.pt")
+            if os.path.exists(cache_path):
+                cached = torch.load(cache_path)
+                self.input_ids, self.labels = cached["input_ids"], cached["labels"]
+                logger.info(f"Loaded {len(self.input_ids)} tokenized examples from {cache_path}")
+                return
+
+        self._tokenize(texts, labels, tokenizer)
+
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            torch.save({"input_ids": self.input_ids, "labels": self.labels}, cache_path)
+
+    def _tokenize(self, texts: List[str], labels: List[str], tokenizer):
+        prompts = tokenizer(list(texts), return_attention_mask=False)["input_ids"]
+        targets = tokenizer(
+            [label or "" for label in labels], add_special_tokens=False, return_attention_mask=False
+        )["input_ids"]
+        eos = [tokenizer.eos_token_id] if tokenizer.eos_token_id is not None else []
+
+        skipped = 0
+        for prompt, target in zip(prompts, targets):
+            if target:
+                input_ids = (prompt + target + eos)[:self.max_length]
+                labels = ([IGNORE_INDEX] * len(prompt) + target + eos)[:self.max_length]
+            else:
+                input_ids = (prompt + eos)[:self.max_length]
+                labels = list(input_ids)
+
+            # Truncation can leave nothing to learn from
+            if all(label == IGNORE_INDEX for label in labels[1:]):
+                skipped += 1
+                continue
+            self.input_ids.append(input_ids)
+            self.labels.append(labels)
+
+        if skipped:
+            logger.warning(f"Skipped {skipped} examples whose labels fall beyond max_length={self.max_length}")
 
     def __len__(self):
-        return len(self.texts)
+        return len(self.input_ids)
 
     def __getitem__(self, idx):
-        return {"text": self.texts[idx], "label": self.labels[idx]}
+        return {"input_ids": self.input_ids[idx], "labels": self.labels[idx]}
+
+    def lengths(self) -> List[int]:
+        """Token length of every example."""
+        return [len(ids) for ids in self.input_ids]
+
+
+class LengthBucketSampler(Sampler):
+    def __init__(
+        self,
+        lengths: List[int],
+        batch_size: int,
+        shuffle: bool = True,
+        bucket_batches: int = 50,
+        seed: int = 0
+    ):
+        """
+        Batch sampler grouping examples of similar length.
+
+        Each epoch the examples are shuffled, split into pools of
+        bucket_batches batches, sorted by length within each pool and cut into
+        batches, and the batch order is shuffled. Batches stay nearly free of
+        padding while their composition still varies between epochs.
+        """
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucket_batches = bucket_batches
+        self.seed = seed
+        self.epoch = 0
+        self._skip = 0
+
+    def set_epoch(self, epoch: int):
+        """Select the epoch whose batch order is produced next."""
+        self.epoch = epoch
+
+    def skip_batches(self, count: int):
+        """Start the next iteration after the first count batches, to resume an epoch."""
+        self._skip = count
+
+    def batches(self) -> List[List[int]]:
+        """Batches of example indices for the current epoch."""
+        indices = list(range(len(self.lengths)))
+        rng = random.Random(self.seed + self.epoch)
+        if self.shuffle:
+            rng.shuffle(indices)
+
+        pool_size = self.batch_size * self.bucket_batches
+        batches = []
+        for start in range(0, len(indices), pool_size):
+            pool = sorted(indices[start:start + pool_size], key=lambda i: self.lengths[i])
+            batches.extend(pool[i:i + self.batch_size] for i in range(0, len(pool), self.batch_size))
+
+        if self.shuffle:
+            rng.shuffle(batches)
+        return batches
+
+    def __iter__(self) -> Iterator[List[int]]:
+        batches = self.batches()[self._skip:]
+        self._skip = 0
+        return iter(batches)
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+
+def collate_batch(examples: List[Dict[str, List[int]]], pad_token_id: int) -> Dict[str, torch.Tensor]:
+    """Pad a batch to its longest example."""
+    longest = max(len(example["input_ids"]) for example in examples)
+    input_ids = torch.full((len(examples), longest), pad_token_id, dtype=torch.long)
+    labels = torch.full((len(examples), longest), IGNORE_INDEX, dtype=torch.long)
+    attention_mask = torch.zeros((len(examples), longest), dtype=torch.long)
+
+    for row, example in enumerate(examples):
+        length = len(example["input_ids"])
+        input_ids[row, :length] = torch.tensor(example["input_ids"])
+        labels[row, :length] = torch.tensor(example["labels"])
+        attention_mask[row, :length] = 1
+    return {"input_ids": input_ids, "labels": labels, "attention_mask": attention_mask}
+
 
 class StyleFineTuner:
-    def __init__(self, model, tokenizer, device="cuda" if torch.cuda.is_available() else "cpu"):
-        """Initialize the fine-tuning manager."""
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        device="cuda" if torch.cuda.is_available() else "cpu",
+        config: Optional[Dict[str, Any]] = None,
+        lora: bool = False
+    ):
+        """
+        Initialize the fine-tuning manager.
+
+        config defaults to models.local.finetune in model_config.yaml. With
+        lora=True only low-rank adapters are trained (see enable_lora).
+        """
         self.model = model
         self.tokenizer = tokenizer
         self.device = device
+        self.config = (_local_model_config('finetune') or {}) if config is None else config
         self.model.to(device)
 
-    def prepare_dataset(self, texts: List[str], labels: List[str]) -> DataLoader:
-        """Prepare dataset for fine-tuning."""
-        dataset = PersonalStyleDataset(texts, labels)
-        return DataLoader(dataset, batch_size=4, shuffle=True)
-
-    def train(self, train_loader: DataLoader, epochs: int = 3):
-        """Fine-tune the model."""
-        optimizer = torch.optim.AdamW(self.model.parameters(), lr=5e-5)
-        
-        for epoch in range(epochs):
-            self.model.train()
-            total_loss = 0
-            
-            for batch in train_loader:
-                optimizer.zero_grad()
-                
-                inputs = self.tokenizer(
-                    batch["text"],
-                    padding=True,
-                    truncation=True,
-                    return_tensors="pt"
-                ).to(self.device)
-                
-                outputs = self.model(**inputs, labels=inputs["input_ids"])
-                loss = outputs.loss
-                
-                loss.backward()
-                optimizer.step()
-                
-                total_loss += loss.item()
-            
-            avg_loss = total_loss / len(train_loader)
-            print(f"Epoch {epoch+1}/{epochs}, Average Loss: {avg_loss:.4f}")
+        self.lora_config: Optional[Dict[str, Any]] = None
+        if lora:
+            self.enable_lora()
+
+    def enable_lora(
+        self,
+        rank: Optional[int] = None,
+        alpha: Optional[float] = None,
+        dropout: Optional[float] = None,
+        target_modules: Optional[List[str]] = None
+    ):
+        """
+        Train low-rank adapters instead of the full model.
+
+        Base weights are frozen and the target layers gain trainable rank-r
+        factors; settings default to models.local.lora. Save the result with
+        save_adapter, which stores only the factors.
+        """
+        settings = _local_model_config('lora') or {}
+        rank = rank or settings.get('rank', 8)
+        alpha = alpha or settings.get('alpha', 2 * rank)
+        dropout = settings.get('dropout', 0.05) if dropout is None else dropout
+        target_modules = list(target_modules or settings.get('target_modules', DEFAULT_TARGET_MODULES))
+
+        for param in self.model.parameters():
+            param.requires_grad_(False)
+        layers = inject_lora(self.model, target_modules)
+        for layer in layers:
+            layer.init_trainable(rank, alpha, dropout)
+
+        self.lora_config = {
+            'rank': rank,
+            'alpha': alpha,
+            'target_modules': target_modules,
+            'base_model': getattr(self.model.config, '_name_or_path', '')
+        }
+        trainable = sum(param.numel() for param in self.model.parameters() if param.requires_grad)
+        total = sum(param.numel() for param in self.model.parameters())
+        logger.info(f"LoRA rank {rank} on {len(layers)} layers: {trainable} of {total} parameters trainable")
+
+    def prepare_dataset(
+        self,
+        texts: List[str],
+        labels: List[str],
+        batch_size: Optional[int] = None,
+        max_length: Optional[int] = None,
+        num_workers: Optional[int] = None
+    ) -> DataLoader:
+        """
+        Prepare dataset for fine-tuning.
+
+        Examples are tokenized once (cached under finetune.dataset_cache_dir)
+        and served in length-bucketed batches padded only to their longest
+        member.
+        """
+        dataset = PersonalStyleDataset(
+            texts,
+            labels,
+            self.tokenizer,
+            max_length=max_length or self.config.get("max_length", 512),
+            cache_dir=self.config.get("dataset_cache_dir")
+        )
+        sampler = LengthBucketSampler(
+            dataset.lengths(),
+            batch_size or self.config.get("batch_size", 8),
+            seed=self.config.get("seed", 0)
+        )
+        num_workers = self.config.get("num_workers", 2) if num_workers is None else num_workers
+        # Leave a core for the training process itself
+        num_workers = min(num_workers, max(0, (os.cpu_count() or 1) - 1))
+        pad_token_id = self.tokenizer.pad_token_id
+        if pad_token_id is None:
+            pad_token_id = self.tokenizer.eos_token_id
+
+        return DataLoader(
+            dataset,
+            batch_sampler=sampler,
+            collate_fn=partial(collate_batch, pad_token_id=pad_token_id),
+            num_workers=num_workers,
+            persistent_workers=num_workers > 0,
+            pin_memory=str(self.device).startswith("cuda")
+        )
+
+    def _autocast(self):
+        """bf16 autocast context when finetune.mixed_precision is bf16, else a no-op."""
+        device_type = "cuda" if str(self.device).startswith("cuda") else "cpu"
+        enabled = self.config.get("mixed_precision", "bf16") == "bf16"
+        if device_type == "cuda" and enabled:
+            enabled = torch.cuda.is_bf16_supported()
+        return torch.autocast(device_type=device_type, dtype=torch.bfloat16, enabled=enabled)
+
+    def train(
+        self,
+        train_loader: DataLoader,
+        epochs: int = 3,
+        gradient_accumulation_steps: Optional[int] = None,
+        learning_rate: Optional[float] = None,
+        checkpoint_dir: Optional[str] = None,
+        resume: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Fine-tune the model.
+
+        Gradients are accumulated over gradient_accumulation_steps batches per
+        optimizer step, with a linear warmup and decay schedule. With a
+        checkpoint_dir (default finetune.checkpoint_dir), trainable weights,
+        optimizer, scheduler, data position and RNG state are saved every
+        finetune.checkpoint_every steps, and training resumes from the latest
+        checkpoint there. Per-step metrics are appended as JSON lines to
+        finetune.metrics_path (default metrics.jsonl in the checkpoint
+        directory). Returns the final average loss, throughput in real
+        (non-padding) tokens/sec and peak memory.
+        """
+        from transformers import get_linear_schedule_with_warmup
+
+        accumulation = gradient_accumulation_steps or self.config.get("gradient_accumulation_steps", 1)
+        learning_rate = learning_rate or self.config.get("learning_rate", 5e-5)
+        log_every = self.config.get("log_every", 10)
+        checkpoint_dir = checkpoint_dir or self.config.get("checkpoint_dir")
+        checkpoint_every = self.config.get("checkpoint_every", 100)
+        metrics_path = self.config.get("metrics_path")
+        if checkpoint_dir:
+            checkpoint_dir = os.path.expanduser(checkpoint_dir)
+            metrics_path = metrics_path or os.path.join(checkpoint_dir, "metrics.jsonl")
+
+        parameters = [param for param in self.model.parameters() if param.requires_grad]
+        optimizer = torch.optim.AdamW(parameters, lr=learning_rate)
+        steps_per_epoch = (len(train_loader) + accumulation - 1) // accumulation
+        total_steps = max(1, epochs * steps_per_epoch)
+        scheduler = get_linear_schedule_with_warmup(
+            optimizer, int(total_steps * self.config.get("warmup_ratio", 0.05)), total_steps
+        )
+
+        sampler = getattr(train_loader, "batch_sampler", None)
+        progress = {"step": 0, "epoch": 0, "batch": 0, "tokens": 0, "epoch_loss": 0.0}
+        if checkpoint_dir:
+            latest = self._latest_checkpoint(checkpoint_dir)
+            if latest and resume:
+                progress = self._load_checkpoint(latest, optimizer, scheduler)
+                logger.info(f"Resumed from {latest} at step {progress['step']}/{total_steps}")
+            elif latest:
+                # A fresh run must not be pruned in favour of an older run's later steps
+                for name in os.listdir(checkpoint_dir):
+                    if _CHECKPOINT_NAME.fullmatch(name):
+                        os.remove(os.path.join(checkpoint_dir, name))
+
+        # The generation cache is useless during training and costs memory
+        use_cache = getattr(self.model.config, "use_cache", None)
+        self.model.config.use_cache = False
+        if self.config.get("gradient_checkpointing", False):
+            self.model.gradient_checkpointing_enable()
+
+        metrics_file = None
+        if metrics_path:
+            os.makedirs(os.path.dirname(os.path.abspath(metrics_path)), exist_ok=True)
+            metrics_file = open(metrics_path, "a", buffering=1)
+
+        start = time.perf_counter()
+        session_tokens = 0
+        step = progress["step"]
+        avg_loss = 0.0
+
+        try:
+            for epoch in range(progress["epoch"], epochs):
+                if hasattr(sampler, "set_epoch"):
+                    sampler.set_epoch(epoch)
+                self.model.train()
+
+                # A resumed epoch continues after the batches it had already consumed
+                first_batch = progress["batch"] if epoch == progress["epoch"] else 0
+                total_loss = progress["epoch_loss"] if first_batch else 0.0
+                if first_batch and hasattr(sampler, "skip_batches"):
+                    sampler.skip_batches(first_batch)
+                    batches = iter(train_loader)
+                else:
+                    batches = itertools.islice(train_loader, first_batch, None)
+
+                window_tokens, window_start = 0, time.perf_counter()
+                step_loss, step_tokens, step_start = 0.0, 0, time.perf_counter()
+
+                optimizer.zero_grad(set_to_none=True)
+                for index, batch in enumerate(batches, start=first_batch):
+                    batch = {key: value.to(self.device, non_blocking=True) for key, value in batch.items()}
+                    with self._autocast():
+                        loss = self.model(**batch).loss
+                    (loss / accumulation).backward()
+
+                    total_loss += loss.item()
+                    step_loss += loss.item()
+                    tokens = int(batch["attention_mask"].sum())
+                    session_tokens += tokens
+                    window_tokens += tokens
+                    step_tokens += tokens
+
+                    micro_batches = (index % accumulation) + 1
+                    if micro_batches == accumulation or index + 1 == len(train_loader):
+                        torch.nn.utils.clip_grad_norm_(parameters, self.config.get("max_grad_norm", 1.0))
+                        optimizer.step()
+                        scheduler.step()
+                        optimizer.zero_grad(set_to_none=True)
+                        step += 1
+
+                        step_time = time.perf_counter() - step_start
+                        if metrics_file is not None:
+                            metrics_file.write(json.dumps({
+                                "step": step,
+                                "epoch": epoch,
+                                "loss": step_loss / micro_batches,
+                                "learning_rate": scheduler.get_last_lr()[0],
+                                "tokens": step_tokens,
+                                "tokens_per_second": step_tokens / step_time if step_time > 0 else 0.0,
+                                "step_time_s": step_time,
+                                "peak_memory_mb": _peak_memory_mb(self.device),
+                                "time": time.time()
+                            }) + "\n")
+                        step_loss, step_tokens, step_start = 0.0, 0, time.perf_counter()
+
+                        if step % log_every == 0:
+                            elapsed = time.perf_counter() - window_start
+                            logger.info(
+                                f"Step {step}/{total_steps}: loss {loss.item():.4f}, "
+                                f"{window_tokens / elapsed:.0f} tokens/s, "
+                                f"peak memory {_peak_memory_mb(self.device):.0f} MiB"
+                            )
+                            window_tokens, window_start = 0, time.perf_counter()
+
+                        if checkpoint_dir and step % checkpoint_every == 0 and step < total_steps:
+                            self._save_checkpoint(checkpoint_dir, optimizer, scheduler, {
+                                "step": step,
+                                "epoch": epoch,
+                                "batch": index + 1,
+                                "tokens": progress["tokens"] + session_tokens,
+                                "epoch_loss": total_loss
+                            })
+
+                avg_loss = total_loss / max(1, len(train_loader))
+                logger.info(f"Epoch {epoch+1}/{epochs}, Average Loss: {avg_loss:.4f}")
+        finally:
+            if metrics_file is not None:
+                metrics_file.close()
+            if use_cache is not None:
+                self.model.config.use_cache = use_cache
+            self.model.eval()
+
+        if checkpoint_dir:
+            self._save_checkpoint(checkpoint_dir, optimizer, scheduler, {
+                "step": step, "epoch": epochs, "batch": 0,
+                "tokens": progress["tokens"] + session_tokens, "epoch_loss": 0.0
+            })
+
+        elapsed = time.perf_counter() - start
+        return {
+            "loss": avg_loss,
+            "steps": step,
+            "tokens": progress["tokens"] + session_tokens,
+            "tokens_per_second": session_tokens / elapsed if elapsed > 0 else 0.0,
+            "peak_memory_mb": _peak_memory_mb(self.device)
+        }
+
+    @staticmethod
+    def _latest_checkpoint(checkpoint_dir: str) -> Optional[str]:
+        """Path of the checkpoint with the highest step, if any."""
+        if not os.path.isdir(checkpoint_dir):
+            return None
+        names = sorted(name for name in os.listdir(checkpoint_dir) if _CHECKPOINT_NAME.fullmatch(name))
+        return os.path.join(checkpoint_dir, names[-1]) if names else None
+
+    def _save_checkpoint(self, checkpoint_dir: str, optimizer, scheduler, progress: Dict[str, Any]):
+        """Write a checkpoint atomically and drop all but the newest finetune.keep_checkpoints."""
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        state = {
+            # Frozen weights come from the base model, so only trained ones are stored
+            "model": {name: param.detach().cpu() for name, param in self.model.named_parameters() if param.requires_grad},
+            "optimizer": optimizer.state_dict(),
+            "scheduler": scheduler.state_dict(),
+            "progress": progress,
+            "rng": {"torch": torch.get_rng_state(), "python": random.getstate()}
+        }
+        path = os.path.join(checkpoint_dir, f"checkpoint-{progress['step']:08d}.pt")
+        torch.save(state, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+        names = sorted(name for name in os.listdir(checkpoint_dir) if _CHECKPOINT_NAME.fullmatch(name))
+        for name in names[:-self.config.get("keep_checkpoints", 2)]:
+            os.remove(os.path.join(checkpoint_dir, name))
+        logger.info(f"Saved checkpoint {path}")
+
+    def _load_checkpoint(self, path: str, optimizer, scheduler) -> Dict[str, Any]:
+        """Restore weights, optimizer, scheduler and RNG state; returns the saved progress."""
+        state = torch.load(path, weights_only=False)
+        missing = set(state["model"]) - {name for name, _ in self.model.named_parameters()}
+        if missing:
+            raise ValueError(f"Checkpoint {path} does not match the model: {sorted(missing)[:5]}")
+        self.model.load_state_dict(state["model"], strict=False)
+        optimizer.load_state_dict(state["optimizer"])
+        scheduler.load_state_dict(state["scheduler"])
+        torch.set_rng_state(state["rng"]["torch"])
+        random.setstate(state["rng"]["python"])
+        return state["progress"]
 
     def save_model(self, path: str):
         """Save the fine-tuned model."""
         self.model.save_pretrained(path)
         self.tokenizer.save_pretrained(path)
+
+    def save_adapter(self, adapter_id: str, registry: Optional[AdapterRegistry] = None):
+        """Store the trained LoRA adapter under adapter_id (usually a user ID)."""
+        if self.lora_config is None:
+            raise ValueError("LoRA is not enabled; use save_model for full fine-tuning")
+
+        registry = registry or AdapterRegistry.from_config(_local_model_config('lora'))
+        if registry is None:
+            raise ValueError("No adapter registry configured (models.local.lora.adapter_dir)")
+        registry.save(adapter_id, self.model, self.lora_config)
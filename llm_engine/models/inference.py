@@ -1,18 +1,153 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union, Iterator
+import os
+import time
+import inspect
+import hashlib
+import queue
+import logging
+import threading
+import numpy as np
 import torch
-from transformers import PreTrainedModel, PreTrainedTokenizer
+from transformers import PreTrainedModel, PreTrainedTokenizer, StoppingCriteria, StoppingCriteriaList
+from transformers.generation.streamers import BaseStreamer
+from .kv_cache import PrefixKVCache, build_cache, cache_layers
+from .scheduler import ContinuousBatchingScheduler
+from .speculative import SpeculativeDecoder
+from .lora import AdapterRegistry, activate_adapter, inject_lora
+from .tokenizer import TokenizerUtils
+from ..utils.context_packer import ContextPacker
+
+def _local_model_config(key: str) -> Optional[Dict[str, Any]]:
+    """Settings under models.local.<key> in model_config.yaml."""
+    try:
+        from ..utils.config_manager import config_manager
+        return config_manager.get_model_config('local', key)
+    except Exception:
+        return None
+
+class _TokenQueueStreamer(BaseStreamer):
+    """Forwards generated token IDs from model.generate to a queue."""
+
+    def __init__(self, token_queue: "queue.Queue"):
+        self.token_queue = token_queue
+        self._prompt_seen = False
+
+    def put(self, value: torch.Tensor):
+        # The first call carries the prompt
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        for token_id in value.reshape(-1).tolist():
+            self.token_queue.put(token_id)
+
+    def end(self):
+        self.token_queue.put(None)
+
+class _CancelCriteria(StoppingCriteria):
+    """Stops generation once the consumer of a stream goes away."""
+
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids: torch.Tensor, scores: torch.Tensor, **kwargs) -> torch.Tensor:
+        return torch.full((input_ids.shape[0],), self.cancelled.is_set(), dtype=torch.bool, device=input_ids.device)
 
 class LLMInference:
     def __init__(
         self,
         model: PreTrainedModel,
         tokenizer: PreTrainedTokenizer,
-        device: str = "cuda" if torch.cuda.is_available() else "cpu"
+        device: str = "cuda" if torch.cuda.is_available() else "cpu",
+        prefix_cache: Union[PrefixKVCache, bool, None] = None,
+        scheduler: Union[ContinuousBatchingScheduler, bool, None] = None,
+        speculative: Union[SpeculativeDecoder, bool, None] = None,
+        adapters: Union[AdapterRegistry, bool, None] = None
     ):
-        """Initialize the LLM inference wrapper."""
+        """
+        Initialize the LLM inference wrapper.
+
+        prefix_cache reuses attention key/values of recently seen prompt
+        prefixes; scheduler batches concurrent generate() calls token by token;
+        speculative drafts tokens with a small model for the main model to
+        verify; adapters holds per-user LoRA adapters applied on request. For
+        each, None builds one from model_config.yaml and False disables it.
+        Retrieved context is packed into the model's window according to
+        models.local.context.
+        """
         self.model = model.to(device)
         self.tokenizer = tokenizer
         self.device = device
+        self.logger = logging.getLogger(__name__)
+
+        context_config = _local_model_config('context') or {}
+        self.tokenizer_utils = TokenizerUtils(tokenizer)
+        self.context_packer = ContextPacker.from_config(self.tokenizer_utils, context_config)
+        self.answer_tokens = context_config.get('answer_tokens', 256)
+
+        if prefix_cache is None:
+            prefix_cache = PrefixKVCache.from_config(_local_model_config('prefix_cache'))
+        self.prefix_cache = prefix_cache or None
+
+        if scheduler is None:
+            scheduler = ContinuousBatchingScheduler.from_config(
+                self.model, tokenizer, device, _local_model_config('batching')
+            )
+        self.scheduler = scheduler or None
+
+        if speculative is None:
+            speculative = SpeculativeDecoder.from_config(self.model, device, _local_model_config('speculative'))
+        self.speculative = speculative or None
+
+        if adapters is None:
+            adapters = AdapterRegistry.from_config(_local_model_config('lora'))
+        self.adapters = adapters or None
+        self._lora_targets = set()
+        self._model_id: Optional[str] = None
+
+    @property
+    def model_id(self) -> str:
+        """Identifier of the loaded weights and their precision, for cache keys."""
+        if self._model_id is None:
+            name = getattr(self.model.config, "_name_or_path", "") or type(self.model).__name__
+            dtype = str(getattr(self.model, "dtype", ""))
+            quantized = any("quantized" in type(module).__module__ for module in self.model.modules())
+            self._model_id = f"{name}:{dtype}{':int8' if quantized else ''}:{self._weights_fingerprint(name)}"
+        return self._model_id
+
+    def _weights_fingerprint(self, name: str) -> str:
+        """
+        Hash of the model config and the size and mtime of its weight files.
+
+        The name alone stays the same when weights under a path are replaced,
+        and the disk tier of the response cache outlives restarts. Computed
+        once, since the loaded weights do not change while the process runs.
+        """
+        digest = hashlib.sha256(self.model.config.to_json_string(use_diff=False).encode("utf-8"))
+        if os.path.isdir(name):
+            for file_name in sorted(os.listdir(name)):
+                if file_name.endswith((".safetensors", ".bin")):
+                    stat = os.stat(os.path.join(name, file_name))
+                    digest.update(f"{file_name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    @property
+    def context_window(self) -> int:
+        """Longest token sequence the model and tokenizer accept."""
+        limits = [
+            getattr(self.model.config, "max_position_embeddings", None),
+            getattr(self.tokenizer, "model_max_length", None)
+        ]
+        # Tokenizers without a limit report a huge sentinel value
+        limits = [limit for limit in limits if limit and limit < 1_000_000]
+        return min(limits) if limits else 2048
+
+    def is_deterministic(self, temperature: float) -> bool:
+        """Whether generate() with this temperature always returns the same text."""
+        if temperature <= 0:
+            return True
+        if self.scheduler is not None:
+            return False
+        return not getattr(self.model.generation_config, "do_sample", False)
 
     def generate(
         self,
@@ -20,51 +155,398 @@ class LLMInference:
         max_length: int = 1000,
         temperature: float = 0.7,
         top_p: float = 0.9,
-        context: Optional[List[Dict[str, Any]]] = None
+        context: Optional[List[Dict[str, Any]]] = None,
+        adapter: Optional[str] = None
     ) -> str:
-        """Generate text response from the model."""
-        # Prepare input with context if provided
-        if context:
-            context_text = "\n".join([doc["text"] for doc in context])
-            full_prompt = f"{context_text}\n\n{prompt}"
-        else:
-            full_prompt = prompt
-
-        # Tokenize input
-        inputs = self.tokenizer(
-            full_prompt,
-            return_tensors="pt",
-            padding=True,
-            truncation=True
-        ).to(self.device)
+        """
+        Generate text response from the model.
 
-        # Generate response
-        with torch.no_grad():
-            outputs = self.model.generate(
-                **inputs,
-                max_length=max_length,
+        adapter names a LoRA adapter from the registry to apply on top of the
+        shared base model for this request only; such requests run on their
+        own, without the scheduler, draft model or prefix cache.
+
+        With a scheduler, the request joins the shared decode batch and samples
+        when temperature > 0. With a draft model, greedy decoding is speculative
+        (same output, fewer main-model passes) and sampling uses transformers'
+        assisted generation. Otherwise model.generate runs on its own.
+        """
+        full_prompt = self._full_prompt(prompt, context, max_length)
+        inputs = self._tokenize(full_prompt)
+        prompt_length = inputs["input_ids"].shape[1]
+
+        if adapter is not None:
+            with activate_adapter(self._load_adapter(adapter)), torch.no_grad():
+                outputs = self.model.generate(
+                    **self._generation_kwargs(inputs, max_length, temperature, top_p, use_prefix_cache=False)
+                )
+            return self.tokenizer.decode(outputs[0][prompt_length:], skip_special_tokens=True).strip()
+
+        if self.scheduler is not None:
+            if max_length <= prompt_length:
+                raise ValueError(f"max_length {max_length} leaves no room to generate after a {prompt_length}-token prompt")
+            return self.scheduler.generate(
+                full_prompt,
+                max_new_tokens=max_length - prompt_length,
                 temperature=temperature,
-                top_p=top_p,
-                pad_token_id=self.tokenizer.pad_token_id,
+                top_p=top_p
+            )
+
+        outputs = None
+        with torch.no_grad():
+            if self.speculative is not None:
+                outputs = self._generate_speculative(inputs, max_length, temperature, top_p)
+            if outputs is None:
+                outputs = self.model.generate(**self._generation_kwargs(inputs, max_length, temperature, top_p))
+
+        # Decode only the generated tokens
+        return self.tokenizer.decode(outputs[0][prompt_length:], skip_special_tokens=True).strip()
+
+    def _generate_speculative(
+        self,
+        inputs: Dict[str, torch.Tensor],
+        max_length: int,
+        temperature: float,
+        top_p: float
+    ) -> Optional[torch.Tensor]:
+        """Generate with the draft model; None falls back to plain generation."""
+        prompt_length = inputs["input_ids"].shape[1]
+        try:
+            if getattr(self.model.generation_config, "do_sample", False):
+                return self.model.generate(
+                    **inputs,
+                    assistant_model=self.speculative.draft_model,
+                    max_length=max_length,
+                    temperature=temperature,
+                    top_p=top_p,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    eos_token_id=self.tokenizer.eos_token_id,
+                )
+
+            return self.speculative.generate(
+                inputs["input_ids"],
+                max_new_tokens=max_length - prompt_length,
                 eos_token_id=self.tokenizer.eos_token_id,
+                past_key_values=self._prefill_from_cache(inputs["input_ids"])
             )
+        except Exception as e:
+            self.logger.warning(f"Speculative decoding failed, disabling it: {e}")
+            self.speculative = None
+            return None
 
-        # Decode and return response
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return response[len(full_prompt):].strip()
+    def generate_stream(
+        self,
+        prompt: str,
+        max_length: int = 1000,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        context: Optional[List[Dict[str, Any]]] = None,
+        stats: Optional[Dict[str, Any]] = None,
+        adapter: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Generate a response, yielding decoded text increments as tokens are produced.
 
-    def get_embedding(self, text: str) -> torch.Tensor:
-        """Get embeddings for input text."""
-        inputs = self.tokenizer(
+        Decoding settings match generate(). When the stream finishes, stats (if
+        given) is filled with prompt_tokens, generated_tokens, ttft_ms,
+        total_ms and tokens_per_second. Closing the generator early stops
+        generation.
+        """
+        start = time.perf_counter()
+        inputs = self._prepare_inputs(prompt, context, max_length)
+        prompt_length = inputs["input_ids"].shape[1]
+        lora = self._load_adapter(adapter) if adapter is not None else None
+
+        token_queue: "queue.Queue" = queue.Queue()
+        cancelled = threading.Event()
+
+        def run():
+            try:
+                # The adapter is activated in the generating thread itself
+                with activate_adapter(lora), torch.no_grad():
+                    self.model.generate(
+                        **self._generation_kwargs(inputs, max_length, temperature, top_p, lora is None),
+                        streamer=_TokenQueueStreamer(token_queue),
+                        stopping_criteria=StoppingCriteriaList([_CancelCriteria(cancelled)])
+                    )
+            except Exception as e:
+                token_queue.put(e)
+                token_queue.put(None)
+
+        worker = threading.Thread(target=run, name="generate-stream", daemon=True)
+        worker.start()
+
+        token_ids: List[int] = []
+        # Only tokens from prefix_offset on are decoded; the ones before read_offset were emitted
+        prefix_offset = read_offset = 0
+        started = False
+        first_token_at = None
+        try:
+            while True:
+                item = token_queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+
+                token_ids.append(item)
+                delta = self._decode_delta(token_ids, prefix_offset, read_offset)
+                # Hold back partial multi-byte characters until the next token completes them
+                if not delta or delta.endswith("\ufffd"):
+                    continue
+                prefix_offset, read_offset = read_offset, len(token_ids)
+
+                if not started:
+                    delta = delta.lstrip()
+                    started = bool(delta)
+                if delta:
+                    yield delta
+
+            # Flush whatever the last tokens decode to, even an incomplete character
+            if read_offset < len(token_ids):
+                delta = self._decode_delta(token_ids, prefix_offset, read_offset)
+                if not started:
+                    delta = delta.lstrip()
+                if delta:
+                    yield delta
+        finally:
+            cancelled.set()
+            worker.join()
+
+            end = time.perf_counter()
+            decode_seconds = end - first_token_at if first_token_at is not None else 0.0
+            metrics = {
+                "prompt_tokens": prompt_length,
+                "generated_tokens": len(token_ids),
+                "ttft_ms": (first_token_at - start) * 1000 if first_token_at is not None else None,
+                "total_ms": (end - start) * 1000,
+                "tokens_per_second": (len(token_ids) - 1) / decode_seconds if decode_seconds > 0 else 0.0
+            }
+            if stats is not None:
+                stats.update(metrics)
+            self.logger.info(
+                f"Streamed {metrics['generated_tokens']} tokens, TTFT {metrics['ttft_ms'] or 0:.0f} ms, "
+                f"{metrics['tokens_per_second']:.1f} tok/s"
+            )
+
+    def _decode_delta(self, token_ids: List[int], prefix_offset: int, read_offset: int) -> str:
+        """
+        Text added by token_ids[read_offset:], decoded together with the preceding window.
+
+        Decoding a few earlier tokens along with the new ones keeps tokenizer
+        spacing rules right, while the cost per token stays constant instead of
+        growing with the answer.
+        """
+        prefix_text = self.tokenizer.decode(token_ids[prefix_offset:read_offset], skip_special_tokens=True)
+        text = self.tokenizer.decode(token_ids[prefix_offset:], skip_special_tokens=True)
+        return text[len(prefix_text):]
+
+    def pack_context(
+        self,
+        prompt: str,
+        context: Optional[List[Dict[str, Any]]],
+        max_length: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Fit ranked context documents into the model window.
+
+        The window is the model's context window, or max_length (prompt plus
+        answer, as passed to generate) when that is smaller. The budget is the
+        window minus the prompt, the separator, special tokens and room for
+        the answer (answer_tokens, at most half the window). Returns
+        ContextPacker.pack's result.
+        """
+        window = self.context_window if max_length is None else min(self.context_window, max_length)
+        reserved = (
+            self.tokenizer_utils.count_text_tokens(prompt)
+            + self.tokenizer_utils.count_text_tokens("\n\n")
+            + self.tokenizer.num_special_tokens_to_add()
+            + min(self.answer_tokens, window // 2)
+        )
+        return self.context_packer.pack(context, max(0, window - reserved))
+
+    def _full_prompt(
+        self,
+        prompt: str,
+        context: Optional[List[Dict[str, Any]]] = None,
+        max_length: Optional[int] = None
+    ) -> str:
+        """Prompt text prefixed with as much context as fits the window and max_length."""
+        if context:
+            return self.join_context(prompt, self.pack_context(prompt, context, max_length)["text"])
+        return prompt
+
+    @staticmethod
+    def join_context(prompt: str, context_text: str) -> str:
+        """Full prompt for already packed context text (see pack_context)."""
+        return f"{context_text}\n\n{prompt}" if context_text else prompt
+
+    def _prepare_inputs(
+        self,
+        prompt: str,
+        context: Optional[List[Dict[str, Any]]] = None,
+        max_length: Optional[int] = None
+    ) -> Dict[str, torch.Tensor]:
+        """Tokenize the prompt, prefixed with context text if provided."""
+        return self._tokenize(self._full_prompt(prompt, context, max_length))
+
+    def _tokenize(self, text: str) -> Dict[str, torch.Tensor]:
+        """Tokenize a full prompt, truncated to the context window."""
+        return self.tokenizer(
             text,
             return_tensors="pt",
             padding=True,
-            truncation=True
+            truncation=True,
+            max_length=self.context_window
         ).to(self.device)
 
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            # Use the last hidden state as embedding
-            embeddings = outputs.last_hidden_state.mean(dim=1)
+    def _generation_kwargs(
+        self,
+        inputs: Dict[str, torch.Tensor],
+        max_length: int,
+        temperature: float,
+        top_p: float,
+        use_prefix_cache: bool = True
+    ) -> Dict[str, Any]:
+        """Arguments for model.generate, resuming from the longest cached prompt prefix."""
+        kwargs = dict(inputs)
+        past_key_values = self._prefill_from_cache(inputs["input_ids"]) if use_prefix_cache else None
+        if past_key_values is not None:
+            kwargs["past_key_values"] = past_key_values
+
+        kwargs.update(
+            max_length=max_length,
+            temperature=temperature,
+            top_p=top_p,
+            pad_token_id=self.tokenizer.pad_token_id,
+            eos_token_id=self.tokenizer.eos_token_id,
+        )
+        return kwargs
+
+    def adapter_version(self, adapter: str) -> str:
+        """
+        Version of a registry adapter, for cache keys.
+
+        Raises ValueError without a registry and KeyError for unknown adapters.
+        """
+        return str(self._load_adapter(adapter)["modified"])
+
+    def _load_adapter(self, adapter: str) -> Dict[str, Any]:
+        """Registry entry of an adapter, wrapping its target layers on first use."""
+        if self.adapters is None:
+            raise ValueError("No adapter registry configured (models.local.lora.adapter_dir)")
+        entry = self.adapters.load(adapter, self.device, getattr(self.model, "dtype", torch.float32))
+        if not set(entry["target_modules"]) <= self._lora_targets:
+            # Wrapped layers behave exactly like the originals while no adapter is active
+            inject_lora(self.model, entry["target_modules"])
+            self._lora_targets |= set(entry["target_modules"])
+        return entry
+
+    def _prefill_from_cache(self, input_ids: torch.Tensor) -> Optional[Any]:
+        """
+        Past key/values for all but the last prompt token, reusing the prefix cache.
+
+        The longest cached prefix is reused and only the remaining prompt tokens
+        are run through the model; the result is cached for later prompts.
+        Returns None (plain generation) when caching is off or unsupported.
+        """
+        if self.prefix_cache is None or input_ids.shape[0] != 1:
+            return None
+
+        prefix_length = input_ids.shape[1] - 1
+        if prefix_length < self.prefix_cache.min_prefix_tokens:
+            return None
+
+        tokens = input_ids[0, :prefix_length].cpu().numpy()
+        reused, entry = self.prefix_cache.lookup(tokens)
+        past_key_values = None
+        if entry is not None:
+            past_key_values = build_cache(entry["layers"], reused, entry["legacy"])
+        if reused == prefix_length:
+            return past_key_values
+
+        try:
+            outputs = self.model(
+                input_ids=input_ids[:, reused:prefix_length],
+                attention_mask=torch.ones((1, prefix_length), dtype=torch.long, device=input_ids.device),
+                past_key_values=past_key_values,
+                use_cache=True
+            )
+        except Exception as e:
+            self.logger.warning(f"Prefix cache prefill failed, generating without it: {e}")
+            return None
+
+        past_key_values = outputs.past_key_values
+        layers = cache_layers(past_key_values)
+        if layers is None or layers[0][0].shape[-2] != prefix_length:
+            self.logger.warning("Model cache layout not supported by the prefix cache; disabling it")
+            self.prefix_cache = None
+            return None
+
+        self.prefix_cache.record_computed(prefix_length - reused)
+        self.prefix_cache.store(tokens, layers, isinstance(past_key_values, (tuple, list)))
+        return past_key_values
+
+    def get_embeddings(self, texts: List[str], batch_size: int = 16, normalize: bool = False) -> np.ndarray:
+        """
+        Embed texts with the model's hidden states.
+
+        Runs the base transformer without the language-model head on batches
+        of similar length, and averages each text's final hidden states over
+        its real tokens only. Returns a contiguous float32 array of shape
+        (len(texts), hidden_size) in input order.
+        """
+        base_model = getattr(self.model, "base_model", self.model)
+        encoded = self.tokenizer(
+            list(texts), truncation=True, max_length=self.context_window
+        )["input_ids"]
+        # Sorting by length keeps padding inside each batch to a minimum
+        order = np.argsort([len(ids) for ids in encoded], kind="stable")
+
+        # Padded positions are masked out, so any ID works for tokenizers without a pad token (GPT-2)
+        pad_id = self.tokenizer.pad_token_id
+        if pad_id is None:
+            pad_id = self.tokenizer.eos_token_id if self.tokenizer.eos_token_id is not None else 0
+        left = getattr(self.tokenizer, "padding_side", "right") == "left"
+        # Some models (Bloom and other ALiBi models) take no position_ids and reject unknown arguments
+        accepts_positions = "position_ids" in inspect.signature(base_model.forward).parameters
+
+        embeddings = np.empty((len(encoded), getattr(self.model.config, "hidden_size", 0)), dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                positions = order[start:start + batch_size]
+                batch = self._pad_batch([encoded[i] for i in positions], pad_id, left)
+                extra = {}
+                if left and accepts_positions:
+                    # Positions count real tokens only, so left padding does not shift them
+                    extra["position_ids"] = (batch["attention_mask"].cumsum(dim=-1) - 1).clamp(min=0)
+                outputs = base_model(
+                    input_ids=batch["input_ids"],
+                    attention_mask=batch["attention_mask"],
+                    **extra
+                )
+                hidden = outputs[0].float()
+
+                mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+                if normalize:
+                    pooled = torch.nn.functional.normalize(pooled, dim=-1)
+                embeddings[positions] = pooled.cpu().numpy()
 
         return embeddings
+
+    def _pad_batch(self, sequences: List[List[int]], pad_id: int, left: bool) -> Dict[str, torch.Tensor]:
+        """Pad token ID lists to one length, with an attention mask marking real tokens."""
+        width = max(len(ids) for ids in sequences)
+        input_ids = torch.full((len(sequences), width), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), width), dtype=torch.long)
+        for row, ids in enumerate(sequences):
+            span = slice(width - len(ids), width) if left else slice(0, len(ids))
+            input_ids[row, span] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, span] = 1
+        return {"input_ids": input_ids.to(self.device), "attention_mask": attention_mask.to(self.device)}
+
+    def get_embedding(self, text: str) -> torch.Tensor:
+        """Get the embedding of one text as a (1, hidden_size) tensor."""
+        return torch.from_numpy(self.get_embeddings([text]))
@@ -0,0 +1,208 @@
+import threading
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import torch
+
+# Key/value tensors of one attention layer, shaped (batch, heads, sequence, head_dim)
+LayerKV = Tuple[torch.Tensor, torch.Tensor]
+
+
+def cache_layers(past_key_values: Any) -> Optional[List[LayerKV]]:
+    """
+    Per-layer key/value tensors of a model's past_key_values
+
+    Handles legacy tuples and the DynamicCache layouts of older and newer
+    transformers releases.
+
+    :param past_key_values: Cache returned by a forward pass
+    :return: List of (key, value) tensors, or None for unsupported cache types
+    """
+    if isinstance(past_key_values, (tuple, list)):
+        return [(layer[0], layer[1]) for layer in past_key_values]
+
+    if type(past_key_values).__name__ != 'DynamicCache':
+        return None
+    if hasattr(past_key_values, 'layers'):
+        if any(getattr(layer, 'is_sliding', False) for layer in past_key_values.layers):
+            return None
+        return [(layer.keys, layer.values) for layer in past_key_values.layers]
+    if hasattr(past_key_values, 'key_cache'):
+        return list(zip(past_key_values.key_cache, past_key_values.value_cache))
+    return None
+
+
+def build_cache(layers: List[LayerKV], length: int, legacy: bool) -> Any:
+    """
+    Fresh past_key_values holding the first `length` positions of cached layers
+
+    Slices are views; generation appends by concatenation, so the stored
+    tensors are never modified.
+
+    :param layers: Cached (key, value) tensors
+    :param length: Number of prefix positions to keep
+    :param legacy: Return legacy tuples instead of a DynamicCache
+    :return: Cache object accepted by model.generate
+    """
+    cropped = tuple((key[..., :length, :], value[..., :length, :]) for key, value in layers)
+    if legacy:
+        return cropped
+
+    from transformers import DynamicCache
+    if hasattr(DynamicCache, 'from_legacy_cache'):
+        return DynamicCache.from_legacy_cache(cropped)
+    return DynamicCache(ddp_cache_data=cropped)
+
+
+class PrefixKVCache:
+    def __init__(
+        self,
+        max_memory_mb: float = 512,
+        max_entries: int = 32,
+        min_prefix_tokens: int = 32,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        LRU cache of attention key/values for recently processed prompt prefixes
+
+        Because attention is causal, the key/values computed for a token
+        sequence are valid for any prompt sharing its leading tokens. A lookup
+        therefore returns the longest common prefix with any cached entry, which
+        covers a shared system prompt, template scaffolding and retrieved
+        context even when the final question differs.
+
+        :param max_memory_mb: Upper bound on the size of cached tensors
+        :param max_entries: Upper bound on the number of cached prefixes
+        :param min_prefix_tokens: Shortest prefix worth reusing or storing
+        :param logger: Optional logger for tracking operations
+        """
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.max_entries = max_entries
+        self.min_prefix_tokens = min_prefix_tokens
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._entries: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self._next_key = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._reused_tokens = 0
+        self._computed_tokens = 0
+        self._evictions = 0
+
+    @classmethod
+    def from_config(cls, cache_config: Optional[Dict[str, Any]]) -> Optional['PrefixKVCache']:
+        """
+        Build a cache from the models.local.prefix_cache settings
+
+        :param cache_config: Settings dictionary (None or enabled: false disables caching)
+        :return: PrefixKVCache or None
+        """
+        if not cache_config or not cache_config.get('enabled', True):
+            return None
+        return cls(
+            max_memory_mb=cache_config.get('max_memory_mb', 512),
+            max_entries=cache_config.get('max_entries', 32),
+            min_prefix_tokens=cache_config.get('min_prefix_tokens', 32)
+        )
+
+    @staticmethod
+    def _layer_bytes(layers: List[LayerKV]) -> int:
+        return sum(
+            key.numel() * key.element_size() + value.numel() * value.element_size()
+            for key, value in layers
+        )
+
+    def lookup(self, token_ids: np.ndarray) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """
+        Find the cached entry sharing the longest prefix with token_ids
+
+        :param token_ids: Prompt token IDs
+        :return: (reusable prefix length, entry) or (0, None) on a miss
+        """
+        best_length, best_key = 0, None
+        with self._lock:
+            for key, entry in self._entries.items():
+                length = min(len(entry['tokens']), len(token_ids))
+                mismatches = np.flatnonzero(entry['tokens'][:length] != token_ids[:length])
+                common = int(mismatches[0]) if len(mismatches) else length
+                if common > best_length:
+                    best_length, best_key = common, key
+
+            if best_key is None or best_length < self.min_prefix_tokens:
+                self._misses += 1
+                return 0, None
+
+            self._entries.move_to_end(best_key)
+            self._hits += 1
+            self._reused_tokens += best_length
+            return best_length, self._entries[best_key]
+
+    def store(self, token_ids: np.ndarray, layers: List[LayerKV], legacy: bool):
+        """
+        Cache the key/values of a processed prefix, evicting least recently used entries
+
+        :param token_ids: Token IDs the key/values cover
+        :param layers: Per-layer (key, value) tensors
+        :param legacy: Whether the model uses legacy tuple caches
+        """
+        size = self._layer_bytes(layers)
+        if len(token_ids) < self.min_prefix_tokens or size > self.max_bytes:
+            return
+
+        with self._lock:
+            while self._entries and (
+                self._bytes + size > self.max_bytes or len(self._entries) >= self.max_entries
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted['bytes']
+                self._evictions += 1
+
+            self._entries[self._next_key] = {
+                'tokens': np.array(token_ids, dtype=np.int64),
+                'layers': layers,
+                'legacy': legacy,
+                'bytes': size
+            }
+            self._next_key += 1
+            self._bytes += size
+
+    def record_computed(self, tokens: int):
+        """
+        Count prompt tokens that had to be run through the model
+
+        :param tokens: Number of uncached prompt tokens
+        """
+        with self._lock:
+            self._computed_tokens += tokens
+
+    def clear(self):
+        """Drop every cached prefix."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit rate, token reuse and memory usage of the cache
+
+        :return: Statistics dictionary
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            prompt_tokens = self._reused_tokens + self._computed_tokens
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'reused_tokens': self._reused_tokens,
+                'computed_tokens': self._computed_tokens,
+                'token_reuse_ratio': self._reused_tokens / prompt_tokens if prompt_tokens else 0.0,
+                'evictions': self._evictions
+            }
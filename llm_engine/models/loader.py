@@ -0,0 +1,366 @@
+import os
+import json
+import time
+import struct
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple, Union
+import torch
+from transformers import PreTrainedModel, PreTrainedTokenizer
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ('none', 'int8', 'bf16')
+
+SAFETENSORS_DTYPES = {
+    'F64': torch.float64, 'F32': torch.float32, 'F16': torch.float16, 'BF16': torch.bfloat16,
+    'I64': torch.int64, 'I32': torch.int32, 'I16': torch.int16, 'I8': torch.int8,
+    'U8': torch.uint8, 'BOOL': torch.bool
+}
+
+
+def resolve_quantization(setting: Union[bool, str, None]) -> str:
+    """
+    Normalize the models.local.quantization setting
+
+    true means dynamic int8; false or null means none.
+
+    :param setting: Value from model_config.yaml
+    :return: 'none', 'int8' or 'bf16'
+    """
+    if setting is True:
+        return 'int8'
+    if not setting:
+        return 'none'
+
+    mode = str(setting).lower()
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unsupported quantization mode: {setting} (expected one of {QUANTIZATION_MODES})")
+    return mode
+
+
+def quantize_model(model: PreTrainedModel, mode: str, device: str = 'cpu') -> PreTrainedModel:
+    """
+    Apply CPU quantization to a loaded model
+
+    int8 replaces nn.Linear layers with dynamically quantized ones (int8
+    weights, activations quantized per batch); bf16 casts all weights.
+
+    :param model: Model in fp32
+    :param mode: 'none', 'int8' or 'bf16'
+    :param device: Device the model will run on (int8 is CPU-only)
+    :return: Quantized model (int8 returns a new module)
+    """
+    if mode == 'none':
+        return model
+    if mode == 'bf16':
+        return model.to(torch.bfloat16)
+
+    if not str(device).startswith('cpu'):
+        logger.warning(f"Dynamic int8 quantization runs on CPU only; keeping fp32 weights on {device}")
+        return model
+
+    linear_layers = sum(isinstance(module, torch.nn.Linear) for module in model.modules())
+    if linear_layers == 0:
+        logger.warning("Model has no nn.Linear layers; int8 dynamic quantization has no effect")
+        return model
+
+    quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    logger.info(f"Quantized {linear_layers} linear layers to int8")
+    return quantized
+
+
+def _tensor_bytes(value: Any) -> int:
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item) for item in value)
+    return 0
+
+
+def model_memory_bytes(model: PreTrainedModel) -> int:
+    """
+    Size of a model's weights, including packed int8 weights
+
+    :param model: Loaded model
+    :return: Size in bytes
+    """
+    # Dynamically quantized layers expose their weights as (qweight, bias) tuples in the state dict
+    return sum(_tensor_bytes(value) for value in model.state_dict().values())
+
+
+def measure_tokens_per_second(
+    model: PreTrainedModel,
+    tokenizer: PreTrainedTokenizer,
+    prompt: str = "The quick brown fox jumps over the lazy dog.",
+    new_tokens: int = 32,
+    repeats: int = 2
+) -> float:
+    """
+    Greedy decoding throughput of a model on CPU
+
+    :param model: Loaded model
+    :param tokenizer: Matching tokenizer
+    :param prompt: Prompt to continue
+    :param new_tokens: Tokens generated per run
+    :param repeats: Timed runs after one warmup run
+    :return: Best tokens/sec across runs
+    """
+    inputs = tokenizer(prompt, return_tensors="pt").to(getattr(model, 'device', 'cpu'))
+    generate_kwargs = dict(
+        max_new_tokens=new_tokens,
+        min_new_tokens=new_tokens,
+        do_sample=False,
+        pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+    )
+
+    best = 0.0
+    with torch.no_grad():
+        model.generate(**inputs, **generate_kwargs)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            outputs = model.generate(**inputs, **generate_kwargs)
+            generated = outputs.shape[1] - inputs["input_ids"].shape[1]
+            best = max(best, generated / (time.perf_counter() - start))
+    return best
+
+
+def safetensors_files(model_path: str) -> Optional[List[str]]:
+    """
+    Safetensors weight files of a local model directory
+
+    :param model_path: Model directory
+    :return: Paths of the single or sharded weight files, or None if there are none
+    """
+    if not os.path.isdir(model_path):
+        return None
+
+    index_path = os.path.join(model_path, 'model.safetensors.index.json')
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            shards = sorted(set(json.load(f)['weight_map'].values()))
+        return [os.path.join(model_path, shard) for shard in shards]
+
+    single = os.path.join(model_path, 'model.safetensors')
+    return [single] if os.path.exists(single) else None
+
+
+def mmap_safetensors(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Tensors of a safetensors file backed by a private memory map
+
+    Nothing is read up front: pages are loaded on first access and, as long
+    as the weights are not modified, stay shared through the page cache with
+    every other process mapping the same file.
+
+    :param path: Safetensors file
+    :return: Tensors keyed by name
+    """
+    with open(path, 'rb') as f:
+        header_length = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_length))
+    header.pop('__metadata__', None)
+
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+    raw = torch.empty(0, dtype=torch.uint8).set_(storage)
+    data_start = 8 + header_length
+
+    tensors = {}
+    for name, info in header.items():
+        if info['dtype'] not in SAFETENSORS_DTYPES:
+            raise ValueError(f"Unsupported safetensors dtype {info['dtype']} for {name}")
+        begin, end = info['data_offsets']
+        chunk = raw[data_start + begin:data_start + end]
+        try:
+            tensor = chunk.view(SAFETENSORS_DTYPES[info['dtype']])
+        except RuntimeError:
+            # Offsets not aligned to the element size: this tensor gets its own copy
+            tensor = chunk.clone().view(SAFETENSORS_DTYPES[info['dtype']])
+        tensors[name] = tensor.reshape(info['shape'])
+    return tensors
+
+
+@contextmanager
+def _parameters_on_meta():
+    """Create module parameters on the meta device; buffers stay on CPU."""
+    register_parameter = torch.nn.Module.register_parameter
+
+    def register_on_meta(module, name, param):
+        if param is not None:
+            param = torch.nn.Parameter(param.to('meta'), requires_grad=param.requires_grad)
+        register_parameter(module, name, param)
+
+    torch.nn.Module.register_parameter = register_on_meta
+    try:
+        yield
+    finally:
+        torch.nn.Module.register_parameter = register_parameter
+
+
+def load_mmap_model(model_path: str) -> PreTrainedModel:
+    """
+    Build a causal language model whose weights are memory-mapped safetensors
+
+    The model is constructed without allocating or initializing parameters,
+    then the mapped tensors are assigned in place of them.
+
+    :param model_path: Local model directory with safetensors weights
+    :return: Model in eval mode
+    """
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    files = safetensors_files(model_path)
+    if not files:
+        raise FileNotFoundError(f"No safetensors weights in {model_path}")
+
+    config = AutoConfig.from_pretrained(model_path)
+    with _parameters_on_meta():
+        model = AutoModelForCausalLM.from_config(config)
+
+    state_dict = {}
+    for path in files:
+        state_dict.update(mmap_safetensors(path))
+    model.load_state_dict(state_dict, strict=False, assign=True)
+    model.tie_weights()
+
+    missing = [name for name, param in model.named_parameters() if param.is_meta]
+    if missing:
+        raise ValueError(f"Weights missing from {model_path}: {', '.join(missing[:5])}")
+    return model.eval()
+
+
+def warmup_model(model: PreTrainedModel, tokenizer: PreTrainedTokenizer, new_tokens: int = 8):
+    """
+    Run one short greedy generation so the first request skips lazy initialization
+
+    :param model: Loaded model
+    :param tokenizer: Matching tokenizer
+    :param new_tokens: Tokens to generate
+    """
+    inputs = tokenizer("Hello", return_tensors="pt").to(getattr(model, 'device', 'cpu'))
+    with torch.no_grad():
+        model.generate(
+            **inputs,
+            max_new_tokens=new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        )
+
+
+def load_local_model(
+    model_path: Optional[str] = None,
+    quantization: Union[bool, str, None] = None,
+    device: str = 'cpu',
+    config: Optional[Dict[str, Any]] = None,
+    mmap: Optional[bool] = None,
+    warmup_tokens: Optional[int] = None,
+    timings: Optional[Dict[str, float]] = None
+) -> Tuple[PreTrainedModel, PreTrainedTokenizer]:
+    """
+    Load the local causal language model as configured in model_config.yaml
+
+    Local safetensors weights are memory-mapped (see load_mmap_model), so
+    processes on one host share weight pages as long as the weights are used
+    as stored; int8 quantization or a dtype cast makes a private copy.
+
+    :param model_path: Model name or path (defaults to models.local.model_path)
+    :param quantization: Override for models.local.quantization
+    :param device: Device the model will run on
+    :param config: Local model settings (defaults to ConfigManager.get_model_config('local'))
+    :param mmap: Override for models.local.mmap_weights
+    :param warmup_tokens: Override for models.local.warmup_tokens (0 skips the warmup)
+    :param timings: Optional dictionary filled with the seconds spent in each load phase
+    :return: (model, tokenizer)
+    """
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    if config is None:
+        from ..utils.config_manager import config_manager
+        config = config_manager.get_model_config('local')
+
+    model_path = model_path or config.get('model_path')
+    mode = resolve_quantization(config.get('quantization') if quantization is None else quantization)
+    mmap = config.get('mmap_weights', True) if mmap is None else mmap
+    warmup_tokens = config.get('warmup_tokens', 8) if warmup_tokens is None else warmup_tokens
+
+    phases: Dict[str, float] = {}
+    start = phase_start = time.perf_counter()
+
+    def phase(name: str):
+        nonlocal phase_start
+        now = time.perf_counter()
+        phases[name] = now - phase_start
+        phase_start = now
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    phase('tokenizer_s')
+
+    model = None
+    if mmap and str(device).startswith('cpu') and safetensors_files(model_path):
+        try:
+            model = load_mmap_model(model_path)
+        except Exception as e:
+            logger.warning(f"Memory-mapped loading of {model_path} failed, using from_pretrained: {e}")
+    if model is None:
+        model = AutoModelForCausalLM.from_pretrained(model_path).eval()
+    phase('weights_s')
+
+    model = quantize_model(model, mode, device).eval()
+    phase('quantize_s')
+
+    if warmup_tokens:
+        warmup_model(model.to(device), tokenizer, warmup_tokens)
+    phase('warmup_s')
+    phases['total_s'] = time.perf_counter() - start
+
+    if timings is not None:
+        timings.update(phases)
+    logger.info(
+        f"Loaded {model_path} ({mode}) in {phases['total_s']:.1f}s "
+        f"({', '.join(f'{name[:-2]} {seconds:.2f}s' for name, seconds in phases.items() if name != 'total_s')}), "
+        f"{model_memory_bytes(model) / 2 ** 20:.0f} MiB of weights"
+    )
+    return model, tokenizer
+
+
+def quantization_report(
+    model: PreTrainedModel,
+    tokenizer: PreTrainedTokenizer,
+    modes: Tuple[str, ...] = ('int8', 'bf16'),
+    new_tokens: int = 32
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Weight memory and decoding throughput of an fp32 model and its quantized variants
+
+    :param model: Model in fp32 on CPU (left unmodified)
+    :param tokenizer: Matching tokenizer
+    :param modes: Quantization modes to compare against fp32
+    :param new_tokens: Tokens generated per throughput run
+    :return: Report keyed by mode with memory_bytes, tokens_per_second and ratios
+    """
+    import copy
+
+    baseline_memory = model_memory_bytes(model)
+    baseline_speed = measure_tokens_per_second(model, tokenizer, new_tokens=new_tokens)
+    report = {'fp32': {
+        'memory_bytes': baseline_memory,
+        'tokens_per_second': baseline_speed,
+        'memory_ratio': 1.0,
+        'speedup': 1.0
+    }}
+
+    for mode in modes:
+        variant = quantize_model(copy.deepcopy(model), mode).eval()
+        memory = model_memory_bytes(variant)
+        speed = measure_tokens_per_second(variant, tokenizer, new_tokens=new_tokens)
+        report[mode] = {
+            'memory_bytes': memory,
+            'tokens_per_second': speed,
+            'memory_ratio': memory / baseline_memory,
+            'speedup': speed / baseline_speed if baseline_speed else 0.0
+        }
+        del variant
+
+    return report
@@ -0,0 +1,318 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import torch
+from torch import nn
+
+DEFAULT_TARGET_MODULES = ('q_proj', 'v_proj')
+
+ADAPTER_WEIGHTS = 'adapter.safetensors'
+ADAPTER_CONFIG = 'adapter_config.json'
+
+# Adapter applied by LoRALinear layers in the current thread or task, if any
+_ACTIVE_ADAPTER: ContextVar[Optional[Dict[str, Any]]] = ContextVar('active_lora_adapter', default=None)
+
+
+class LoRALinear(nn.Module):
+    def __init__(self, base: nn.Module, name: str):
+        """
+        Linear layer with an optional low-rank update
+
+        Computes base(x) + scaling * x A^T B^T. The update comes from the
+        adapter activated for the current request (see activate_adapter) or,
+        when training, from the layer's own lora_A and lora_B parameters.
+        Without either, the layer is exactly the base layer, so wrapping a
+        shared model does not change requests that use no adapter.
+
+        :param base: nn.Linear or dynamically quantized Linear to wrap
+        :param name: Module path of the layer, used to look up adapter weights
+        """
+        super().__init__()
+        self.base = base
+        self.name = name
+        self.in_features = base.in_features
+        self.out_features = base.out_features
+        self.lora_A: Optional[nn.Parameter] = None
+        self.lora_B: Optional[nn.Parameter] = None
+        self.scaling = 1.0
+        self.lora_dropout: nn.Module = nn.Identity()
+
+    def init_trainable(self, rank: int, alpha: float, dropout: float = 0.0):
+        """
+        Create trainable low-rank factors; B starts at zero so training starts from the base model
+
+        :param rank: Rank of the update
+        :param alpha: Scaling numerator (the update is scaled by alpha / rank)
+        :param dropout: Dropout on the adapter input during training
+        """
+        device = next(self.base.parameters(), torch.empty(0)).device
+        self.lora_A = nn.Parameter(torch.empty(rank, self.in_features, device=device))
+        nn.init.kaiming_uniform_(self.lora_A, a=math.sqrt(5))
+        self.lora_B = nn.Parameter(torch.zeros(self.out_features, rank, device=device))
+        self.scaling = alpha / rank
+        self.lora_dropout = nn.Dropout(dropout) if dropout else nn.Identity()
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        output = self.base(x)
+
+        adapter = _ACTIVE_ADAPTER.get()
+        if adapter is not None:
+            factors = adapter['weights'].get(self.name)
+            if factors is None:
+                return output
+            lora_A, lora_B = factors
+            update = (x.to(lora_A.dtype) @ lora_A.t()) @ lora_B.t()
+            return output + (update * adapter['scaling']).to(output.dtype)
+
+        if self.lora_A is not None:
+            x = self.lora_dropout(x).to(self.lora_A.dtype)
+            return output + ((x @ self.lora_A.t()) @ self.lora_B.t() * self.scaling).to(output.dtype)
+        return output
+
+
+_inject_lock = threading.Lock()
+
+
+def inject_lora(model: nn.Module, target_modules: Sequence[str] = DEFAULT_TARGET_MODULES) -> List[LoRALinear]:
+    """
+    Wrap the model's target linear layers in LoRALinear, once
+
+    :param model: Model to modify in place
+    :param target_modules: Leaf module names to wrap (e.g. q_proj, v_proj)
+    :return: All LoRALinear layers of the model
+    """
+    with _inject_lock:
+        targets = [
+            (name, module) for name, module in model.named_modules()
+            if name.rsplit('.', 1)[-1] in target_modules
+            and not isinstance(module, LoRALinear)
+            and hasattr(module, 'in_features') and hasattr(module, 'out_features')
+        ]
+        for name, module in targets:
+            parent_name, _, child = name.rpartition('.')
+            parent = model.get_submodule(parent_name) if parent_name else model
+            if not isinstance(parent, LoRALinear):
+                setattr(parent, child, LoRALinear(module, name))
+
+    layers = [module for module in model.modules() if isinstance(module, LoRALinear)]
+    if not layers:
+        raise ValueError(f"No linear layers named {', '.join(target_modules)} to adapt")
+    return layers
+
+
+def adapter_state_dict(model: nn.Module) -> Dict[str, torch.Tensor]:
+    """
+    Trained low-rank factors of every LoRALinear layer
+
+    :param model: Model with trainable adapters
+    :return: Tensors keyed '<module path>.lora_A' / '.lora_B'
+    """
+    state = {}
+    for module in model.modules():
+        if isinstance(module, LoRALinear) and module.lora_A is not None:
+            state[f"{module.name}.lora_A"] = module.lora_A.detach().float().cpu().contiguous()
+            state[f"{module.name}.lora_B"] = module.lora_B.detach().float().cpu().contiguous()
+    return state
+
+
+@contextmanager
+def activate_adapter(adapter: Optional[Dict[str, Any]]):
+    """
+    Apply an adapter to forward passes run in the current thread
+
+    Other threads keep seeing their own adapter, or none, so requests for
+    different users can share one base model concurrently.
+
+    :param adapter: Entry from AdapterRegistry.load, or None for the base model
+    """
+    token = _ACTIVE_ADAPTER.set(adapter)
+    try:
+        yield
+    finally:
+        _ACTIVE_ADAPTER.reset(token)
+
+
+class AdapterRegistry:
+    def __init__(
+        self,
+        adapter_dir: str,
+        max_loaded: int = 8,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        On-disk store of per-user LoRA adapters with an LRU of loaded ones
+
+        Each adapter is a directory holding adapter.safetensors and
+        adapter_config.json. Loaded adapters are reloaded when their files
+        change, so a newly trained adapter is picked up without a restart.
+
+        :param adapter_dir: Root directory of the registry
+        :param max_loaded: Adapters kept in memory
+        :param logger: Optional logger for tracking operations
+        """
+        self.adapter_dir = os.path.expanduser(adapter_dir)
+        self.max_loaded = max_loaded
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._loaded: 'OrderedDict[Tuple[str, str, str], Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._loads = 0
+
+    @classmethod
+    def from_config(cls, lora_config: Optional[Dict[str, Any]]) -> Optional['AdapterRegistry']:
+        """
+        Build a registry from the models.local.lora settings
+
+        :param lora_config: Settings dictionary (no adapter_dir disables adapters)
+        :return: AdapterRegistry or None
+        """
+        if not lora_config or not lora_config.get('adapter_dir'):
+            return None
+        return cls(lora_config['adapter_dir'], max_loaded=lora_config.get('max_loaded', 8))
+
+    def path(self, adapter_id: str) -> str:
+        """
+        Directory of an adapter
+
+        :param adapter_id: Adapter name, usually a user ID
+        :return: Path inside the registry
+        """
+        if not re.fullmatch(r'[A-Za-z0-9_.@-]+', adapter_id) or adapter_id.startswith('.'):
+            raise ValueError(f"Invalid adapter id: {adapter_id!r}")
+        return os.path.join(self.adapter_dir, adapter_id)
+
+    def exists(self, adapter_id: str) -> bool:
+        """
+        Whether an adapter is stored
+
+        :param adapter_id: Adapter name
+        :return: True if its weights exist on disk
+        """
+        return os.path.exists(os.path.join(self.path(adapter_id), ADAPTER_WEIGHTS))
+
+    def version(self, adapter_id: str) -> str:
+        """
+        Identifier that changes whenever an adapter is saved again
+
+        :param adapter_id: Adapter name
+        :return: Modification time of the weights file
+        """
+        weights_path = os.path.join(self.path(adapter_id), ADAPTER_WEIGHTS)
+        if not os.path.exists(weights_path):
+            raise KeyError(f"No adapter named {adapter_id}")
+        return str(os.path.getmtime(weights_path))
+
+    def list_adapters(self) -> List[str]:
+        """
+        IDs of all stored adapters
+
+        :return: Sorted adapter IDs
+        """
+        if not os.path.isdir(self.adapter_dir):
+            return []
+        return sorted(name for name in os.listdir(self.adapter_dir) if self.exists(name))
+
+    def save(self, adapter_id: str, model: nn.Module, config: Dict[str, Any]):
+        """
+        Store the trained adapter of a model
+
+        :param adapter_id: Adapter name, usually a user ID
+        :param model: Model with trained LoRALinear layers
+        :param config: rank, alpha, target_modules and any extra metadata
+        """
+        from safetensors.torch import save_file
+
+        state = adapter_state_dict(model)
+        if not state:
+            raise ValueError("Model has no trained LoRA layers")
+
+        path = self.path(adapter_id)
+        os.makedirs(path, exist_ok=True)
+        # Write to temporary files and rename, so readers never see a partial adapter
+        save_file(state, os.path.join(path, ADAPTER_WEIGHTS + '.tmp'))
+        with open(os.path.join(path, ADAPTER_CONFIG + '.tmp'), 'w') as f:
+            json.dump({**config, 'saved_at': time.time()}, f, indent=2)
+        os.replace(os.path.join(path, ADAPTER_CONFIG + '.tmp'), os.path.join(path, ADAPTER_CONFIG))
+        os.replace(os.path.join(path, ADAPTER_WEIGHTS + '.tmp'), os.path.join(path, ADAPTER_WEIGHTS))
+        self.logger.info(f"Saved adapter {adapter_id} ({len(state) // 2} layers) to {path}")
+
+    def delete(self, adapter_id: str):
+        """
+        Remove an adapter from disk and memory
+
+        :param adapter_id: Adapter name
+        """
+        import shutil
+
+        with self._lock:
+            for key in [key for key in self._loaded if key[0] == adapter_id]:
+                del self._loaded[key]
+        shutil.rmtree(self.path(adapter_id), ignore_errors=True)
+
+    def load(self, adapter_id: str, device: str = 'cpu', dtype: torch.dtype = torch.float32) -> Dict[str, Any]:
+        """
+        Adapter weights ready for activate_adapter, from memory when possible
+
+        :param adapter_id: Adapter name
+        :param device: Device of the base model
+        :param dtype: Dtype the low-rank factors are computed in
+        :return: Dict with 'weights' ({module path: (A, B)}), 'scaling', 'target_modules' and 'config'
+        """
+        from safetensors.torch import load_file
+
+        weights_path = os.path.join(self.path(adapter_id), ADAPTER_WEIGHTS)
+        if not os.path.exists(weights_path):
+            raise KeyError(f"No adapter named {adapter_id}")
+        modified = os.path.getmtime(weights_path)
+        key = (adapter_id, str(device), str(dtype))
+
+        with self._lock:
+            entry = self._loaded.get(key)
+            if entry is not None and entry['modified'] == modified:
+                self._loaded.move_to_end(key)
+                self._hits += 1
+                return entry
+
+        with open(os.path.join(self.path(adapter_id), ADAPTER_CONFIG)) as f:
+            config = json.load(f)
+        state = load_file(weights_path)
+        weights = {
+            name[:-len('.lora_A')]: (
+                state[name].to(device=device, dtype=dtype),
+                state[name[:-len('.lora_A')] + '.lora_B'].to(device=device, dtype=dtype)
+            )
+            for name in state if name.endswith('.lora_A')
+        }
+        entry = {
+            'weights': weights,
+            'scaling': config['alpha'] / config['rank'],
+            'target_modules': tuple(config.get('target_modules', DEFAULT_TARGET_MODULES)),
+            'config': config,
+            'modified': modified
+        }
+
+        with self._lock:
+            self._loaded[key] = entry
+            self._loaded.move_to_end(key)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+            self._loads += 1
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Memory hits and disk loads since creation
+
+        :return: Statistics dictionary
+        """
+        with self._lock:
+            return {'loaded': len(self._loaded), 'hits': self._hits, 'loads': self._loads}
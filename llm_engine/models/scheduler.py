@@ -0,0 +1,415 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional
+import torch
+from transformers import PreTrainedModel, PreTrainedTokenizer
+from .kv_cache import build_cache, cache_layers
+
+
+class SchedulerBusyError(RuntimeError):
+    """Raised when the generation queue stays full past the admission timeout"""
+    pass
+
+
+class _Sequence:
+    def __init__(self, prompt_ids: torch.Tensor, max_new_tokens: int, temperature: float, top_p: float):
+        self.prompt_ids = prompt_ids
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.future: Future = Future()
+        self.generated: List[int] = []
+        self.position = prompt_ids.shape[-1]
+        self.submitted_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+
+
+class ContinuousBatchingScheduler:
+    def __init__(
+        self,
+        model: PreTrainedModel,
+        tokenizer: PreTrainedTokenizer,
+        device: str = "cpu",
+        max_batch_size: int = 8,
+        max_queue_size: int = 64,
+        queue_timeout: float = 30.0,
+        seed: Optional[int] = None,
+        max_prompt_tokens: Optional[int] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Token-level scheduler that runs concurrent generation requests as one batch
+
+        New requests are prefilled on their own and merged into the running
+        batch between decode steps; finished sequences leave the batch right
+        away. The batch shares one left-padded key/value cache, so each step
+        is a single forward pass over every active sequence. Each request keeps
+        its own temperature, top_p and token limit.
+
+        :param model: Causal language model
+        :param tokenizer: Matching tokenizer
+        :param device: Device the model runs on
+        :param max_batch_size: Largest number of sequences decoded together
+        :param max_queue_size: Requests allowed to wait for a batch slot
+        :param queue_timeout: Default seconds submit() waits for queue space
+        :param seed: Optional seed for sampling
+        :param max_prompt_tokens: Longest prompt accepted; longer prompts are truncated
+                                  (defaults to the model's context window)
+        :param logger: Optional logger for tracking operations
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.queue_timeout = queue_timeout
+        self.max_prompt_tokens = max_prompt_tokens or self._context_window()
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._queue: "queue.Queue[Optional[_Sequence]]" = queue.Queue(maxsize=max_queue_size)
+        self._generator = torch.Generator(device=device)
+        if seed is not None:
+            self._generator.manual_seed(seed)
+
+        # Running batch: per-layer (key, value) tensors, left-padded to a shared length
+        self._active: List[_Sequence] = []
+        self._layers: Optional[List[tuple]] = None
+        self._mask: Optional[torch.Tensor] = None
+        self._legacy = False
+
+        self._stats_lock = threading.Lock()
+        self._steps = 0
+        self._batched_tokens = 0
+        self._completed = 0
+        self._rejected = 0
+        self._started_at: Optional[float] = None
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lifecycle_lock = threading.Lock()
+
+    @classmethod
+    def from_config(
+        cls,
+        model: PreTrainedModel,
+        tokenizer: PreTrainedTokenizer,
+        device: str,
+        batching_config: Optional[Dict[str, Any]]
+    ) -> Optional['ContinuousBatchingScheduler']:
+        """
+        Build a scheduler from the models.local.batching settings
+
+        :param model: Causal language model
+        :param tokenizer: Matching tokenizer
+        :param device: Device the model runs on
+        :param batching_config: Settings dictionary (None or enabled: false disables batching)
+        :return: ContinuousBatchingScheduler or None
+        """
+        if not batching_config or not batching_config.get('enabled', False):
+            return None
+        return cls(
+            model,
+            tokenizer,
+            device,
+            max_batch_size=batching_config.get('max_batch_size', 8),
+            max_queue_size=batching_config.get('max_queue_size', 64),
+            queue_timeout=batching_config.get('queue_timeout_s', 30.0)
+        )
+
+    def _context_window(self) -> int:
+        """
+        Longest token sequence the model and tokenizer accept
+
+        :return: Token count
+        """
+        limits = [
+            getattr(self.model.config, "max_position_embeddings", None),
+            getattr(self.tokenizer, "model_max_length", None)
+        ]
+        # Tokenizers without a limit report a huge sentinel value
+        limits = [limit for limit in limits if limit and limit < 1_000_000]
+        return min(limits) if limits else 2048
+
+    def start(self):
+        """Start the scheduling loop if it is not running."""
+        # Concurrent first submits must not start two loops over the same batch
+        with self._lifecycle_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._started_at = time.perf_counter()
+                self._thread = threading.Thread(target=self._run, name="generation-scheduler", daemon=True)
+                self._thread.start()
+
+    def submit(
+        self,
+        prompt: str,
+        max_new_tokens: int = 256,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        timeout: Optional[float] = None
+    ) -> Future:
+        """
+        Queue a generation request
+
+        :param prompt: Full prompt text
+        :param max_new_tokens: Token limit for this request
+        :param temperature: Sampling temperature (<= 0 decodes greedily)
+        :param top_p: Nucleus sampling threshold
+        :param timeout: Seconds to wait for queue space (defaults to queue_timeout)
+        :return: Future resolving to a dict with text, token counts and timings
+        """
+        self.start()
+        prompt_ids = self.tokenizer(
+            prompt, return_tensors="pt", truncation=True, max_length=self.max_prompt_tokens
+        )["input_ids"].to(self.device)
+        sequence = _Sequence(prompt_ids, max(1, max_new_tokens), temperature, top_p)
+
+        try:
+            self._queue.put(sequence, timeout=self.queue_timeout if timeout is None else timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise SchedulerBusyError(
+                f"Generation queue is full ({self._queue.maxsize} waiting requests)"
+            )
+        return sequence.future
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        """
+        Generate a response through the shared batch, blocking until it is done
+
+        :param prompt: Full prompt text
+        :return: Generated text
+        """
+        return self.submit(prompt, **kwargs).result()["text"]
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._admit(block=not self._active)
+                if self._active:
+                    self._step()
+            except Exception as e:
+                self.logger.error(f"Generation step failed: {e}")
+                for sequence in self._active:
+                    if not sequence.future.done():
+                        sequence.future.set_exception(e)
+                self._active, self._layers, self._mask = [], None, None
+
+    def _admit(self, block: bool):
+        """
+        Prefill waiting requests and merge them into the running batch
+
+        :param block: Wait for a request when the batch is empty
+        """
+        while len(self._active) < self.max_batch_size:
+            try:
+                sequence = self._queue.get(timeout=0.1) if block else self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if sequence is None:
+                return
+            block = False
+
+            # A failed prefill fails only its own request; the running batch is untouched
+            try:
+                with torch.no_grad():
+                    outputs = self.model(input_ids=sequence.prompt_ids, use_cache=True)
+                layers = cache_layers(outputs.past_key_values)
+                if layers is None:
+                    raise RuntimeError("Model cache layout is not supported by the batching scheduler")
+                finished = self._accept_token(sequence, outputs.logits[:, -1, :])[0]
+            except Exception as e:
+                self.logger.error(f"Prefill failed: {e}")
+                if not sequence.future.done():
+                    sequence.future.set_exception(e)
+                continue
+            if finished:
+                continue
+            self._legacy = isinstance(outputs.past_key_values, (tuple, list))
+            self._merge(sequence, layers)
+
+    def _merge(self, sequence: _Sequence, layers: List[tuple]):
+        """
+        Add a prefilled sequence to the batch, left-padding whichever side is shorter
+
+        :param sequence: Prefilled sequence
+        :param layers: Its per-layer (key, value) tensors
+        """
+        length = layers[0][0].shape[-2]
+        mask = torch.ones((1, length), dtype=torch.long, device=self.device)
+        if self._layers is None:
+            self._active, self._layers, self._mask = [sequence], list(layers), mask
+            return
+
+        def left_pad(tensor: torch.Tensor, target: int, dim: int) -> torch.Tensor:
+            missing = target - tensor.shape[dim]
+            if missing <= 0:
+                return tensor
+            shape = list(tensor.shape)
+            shape[dim] = missing
+            return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+        target = max(length, self._mask.shape[1])
+        self._layers = [
+            (
+                torch.cat([left_pad(key, target, -2), left_pad(new_key, target, -2)], dim=0),
+                torch.cat([left_pad(value, target, -2), left_pad(new_value, target, -2)], dim=0)
+            )
+            for (key, value), (new_key, new_value) in zip(self._layers, layers)
+        ]
+        self._mask = torch.cat([left_pad(self._mask, target, 1), left_pad(mask, target, 1)], dim=0)
+        self._active.append(sequence)
+
+    def _step(self):
+        """Decode one token for every active sequence and retire finished ones."""
+        input_ids = torch.tensor([[s.generated[-1]] for s in self._active], device=self.device)
+        position_ids = torch.tensor([[s.position] for s in self._active], device=self.device)
+        attention_mask = torch.cat([self._mask, torch.ones_like(self._mask[:, :1])], dim=1)
+
+        with torch.no_grad():
+            outputs = self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=build_cache(self._layers, self._mask.shape[1], self._legacy),
+                use_cache=True
+            )
+        self._layers = cache_layers(outputs.past_key_values)
+        self._mask = attention_mask
+
+        with self._stats_lock:
+            self._steps += 1
+            self._batched_tokens += len(self._active)
+
+        keep = []
+        for row, sequence in enumerate(self._active):
+            sequence.position += 1
+            if not self._accept_token(sequence, outputs.logits[row:row + 1, -1, :])[0]:
+                keep.append(row)
+
+        if len(keep) < len(self._active):
+            self._retire(keep)
+
+    def _retire(self, keep: List[int]):
+        """
+        Drop finished rows from the batch and trim padding no row needs
+
+        :param keep: Batch rows still generating
+        """
+        self._active = [self._active[row] for row in keep]
+        if not keep:
+            self._layers, self._mask = None, None
+            return
+
+        rows = torch.tensor(keep, device=self.device)
+        mask = self._mask.index_select(0, rows)
+        start = int(mask.any(dim=0).nonzero()[0])
+        self._mask = mask[:, start:]
+        self._layers = [
+            (key.index_select(0, rows)[..., start:, :], value.index_select(0, rows)[..., start:, :])
+            for key, value in self._layers
+        ]
+
+    def _accept_token(self, sequence: _Sequence, logits: torch.Tensor) -> tuple:
+        """
+        Sample the next token of a sequence and resolve its future when finished
+
+        :param sequence: Sequence being decoded
+        :param logits: Next-token logits of shape (1, vocab)
+        :return: (finished, token id)
+        """
+        token_id = self._sample(logits[0].float(), sequence.temperature, sequence.top_p)
+        now = time.perf_counter()
+        if sequence.first_token_at is None:
+            sequence.first_token_at = now
+
+        finished = token_id == self.tokenizer.eos_token_id
+        if not finished:
+            sequence.generated.append(token_id)
+            finished = len(sequence.generated) >= sequence.max_new_tokens
+
+        if finished:
+            decode_seconds = now - sequence.first_token_at
+            sequence.future.set_result({
+                "text": self.tokenizer.decode(sequence.generated, skip_special_tokens=True).strip(),
+                "prompt_tokens": sequence.prompt_ids.shape[-1],
+                "generated_tokens": len(sequence.generated),
+                "ttft_ms": (sequence.first_token_at - sequence.submitted_at) * 1000,
+                "total_ms": (now - sequence.submitted_at) * 1000,
+                "tokens_per_second": (len(sequence.generated) - 1) / decode_seconds if decode_seconds > 0 else 0.0
+            })
+            with self._stats_lock:
+                self._completed += 1
+        return finished, token_id
+
+    def _sample(self, logits: torch.Tensor, temperature: float, top_p: float) -> int:
+        """
+        Pick the next token: greedy for temperature <= 0, otherwise nucleus sampling
+
+        :param logits: Next-token logits of shape (vocab,)
+        :param temperature: Sampling temperature
+        :param top_p: Nucleus sampling threshold
+        :return: Token id
+        """
+        if temperature <= 0:
+            return int(torch.argmax(logits))
+
+        probs = torch.softmax(logits / temperature, dim=-1)
+        if top_p < 1.0:
+            sorted_probs, sorted_ids = torch.sort(probs, descending=True)
+            # Keep the smallest set of tokens whose mass reaches top_p
+            outside = torch.cumsum(sorted_probs, dim=-1) - sorted_probs >= top_p
+            sorted_probs[outside] = 0.0
+            probs = torch.zeros_like(probs).scatter_(0, sorted_ids, sorted_probs)
+        return int(torch.multinomial(probs, 1, generator=self._generator))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Throughput and batching statistics since start
+
+        :return: Statistics dictionary
+        """
+        with self._stats_lock:
+            elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+            return {
+                'active': len(self._active),
+                'queued': self._queue.qsize(),
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'decode_steps': self._steps,
+                'mean_batch_size': self._batched_tokens / self._steps if self._steps else 0.0,
+                'decode_tokens_per_second': self._batched_tokens / elapsed if elapsed else 0.0
+            }
+
+    def close(self, timeout: float = 30.0):
+        """
+        Stop the scheduling loop; queued and running requests are failed
+
+        :param timeout: Seconds to wait for the loop to exit
+        """
+        with self._lifecycle_lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+
+        error = RuntimeError("Generation scheduler closed")
+        while True:
+            try:
+                sequence = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if sequence is not None:
+                sequence.future.set_exception(error)
+        for sequence in self._active:
+            if not sequence.future.done():
+                sequence.future.set_exception(error)
+        self._active, self._layers, self._mask = [], None, None
@@ -0,0 +1,209 @@
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+import torch
+from transformers import PreTrainedModel
+from .kv_cache import build_cache, cache_layers
+
+
+def _crop(past_key_values: Any, length: int) -> Any:
+    """
+    Cache holding only the first `length` positions
+
+    :param past_key_values: Cache returned by a forward pass
+    :param length: Positions to keep
+    :return: Cropped cache of the same kind
+    """
+    layers = cache_layers(past_key_values)
+    if layers is None:
+        raise RuntimeError("Model cache layout is not supported by speculative decoding")
+    return build_cache(layers, length, isinstance(past_key_values, (tuple, list)))
+
+
+class SpeculativeDecoder:
+    def __init__(
+        self,
+        model: PreTrainedModel,
+        draft_model: PreTrainedModel,
+        num_draft_tokens: int = 4,
+        max_draft_tokens: int = 8,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Greedy speculative decoding with a small draft model
+
+        Each round the draft model proposes a few tokens one by one and the main
+        model scores all of them in a single forward pass. The longest run of
+        proposals matching the main model's own greedy choices is kept, plus
+        the main model's next token, so the output is identical to plain greedy
+        decoding with the main model. The number of proposals adapts: it grows
+        after a fully accepted round and shrinks after a rejection.
+
+        :param model: Main causal language model
+        :param draft_model: Smaller model sharing the main model's tokenizer
+        :param num_draft_tokens: Initial proposals per round
+        :param max_draft_tokens: Upper bound for the adaptive proposal count
+        :param logger: Optional logger for tracking operations
+        """
+        self.model = model
+        self.draft_model = draft_model
+        self.num_draft_tokens = num_draft_tokens
+        self.max_draft_tokens = max_draft_tokens
+        self.logger = logger or logging.getLogger(__name__)
+
+        main_vocab = model.get_output_embeddings().weight.shape[0]
+        draft_vocab = draft_model.get_output_embeddings().weight.shape[0]
+        self._vocab_size = min(main_vocab, draft_vocab)
+        if main_vocab != draft_vocab:
+            self.logger.warning(
+                f"Draft vocabulary ({draft_vocab}) differs from the main model's ({main_vocab}); "
+                f"comparing the first {self._vocab_size} token IDs"
+            )
+
+        self._lock = threading.Lock()
+        self._rounds = 0
+        self._proposed = 0
+        self._accepted = 0
+        self._generated = 0
+        self._draft_seconds = 0.0
+        self._verify_seconds = 0.0
+
+    @classmethod
+    def from_config(
+        cls,
+        model: PreTrainedModel,
+        device: str,
+        speculative_config: Optional[Dict[str, Any]]
+    ) -> Optional['SpeculativeDecoder']:
+        """
+        Build a decoder from the models.local.speculative settings
+
+        The draft model is loaded with the same quantization as the main model.
+
+        :param model: Main causal language model
+        :param device: Device the models run on
+        :param speculative_config: Settings dictionary (no draft_model_path disables it)
+        :return: SpeculativeDecoder or None
+        """
+        if not speculative_config or not speculative_config.get('draft_model_path'):
+            return None
+
+        from .loader import load_local_model
+        draft_model, _ = load_local_model(speculative_config['draft_model_path'], device=device)
+        return cls(
+            model,
+            draft_model.to(device),
+            num_draft_tokens=speculative_config.get('num_draft_tokens', 4),
+            max_draft_tokens=speculative_config.get('max_draft_tokens', 8)
+        )
+
+    def generate(
+        self,
+        input_ids: torch.Tensor,
+        max_new_tokens: int,
+        eos_token_id: Optional[int] = None,
+        past_key_values: Optional[Any] = None
+    ) -> torch.Tensor:
+        """
+        Greedily extend a single prompt
+
+        :param input_ids: Prompt token IDs of shape (1, prompt_length)
+        :param max_new_tokens: Token limit
+        :param eos_token_id: Token that ends generation
+        :param past_key_values: Optional main-model cache covering all but the last prompt token
+        :return: Prompt followed by generated token IDs, shape (1, total_length)
+        """
+        if input_ids.shape[0] != 1:
+            raise ValueError("Speculative decoding handles one sequence at a time")
+
+        sequence: List[int] = input_ids[0].tolist()
+        prompt_length = len(sequence)
+        device = input_ids.device
+        main_cache = past_key_values
+        main_cached = prompt_length - 1 if past_key_values is not None else 0
+        draft_cache, draft_cached = None, 0
+        num_draft = self.num_draft_tokens
+
+        with torch.no_grad():
+            while len(sequence) - prompt_length < max_new_tokens:
+                remaining = max_new_tokens - (len(sequence) - prompt_length)
+                k = max(1, min(num_draft, remaining - 1)) if remaining > 1 else 0
+
+                # Draft: catch up on accepted tokens, then propose k tokens greedily
+                start = time.perf_counter()
+                proposals: List[int] = []
+                if k:
+                    pending = sequence[draft_cached:]
+                    for _ in range(k):
+                        outputs = self.draft_model(
+                            input_ids=torch.tensor([pending], device=device),
+                            past_key_values=draft_cache,
+                            use_cache=True
+                        )
+                        draft_cache = outputs.past_key_values
+                        draft_cached += len(pending)
+                        proposals.append(int(torch.argmax(outputs.logits[0, -1, :self._vocab_size])))
+                        pending = proposals[-1:]
+                self._draft_seconds += time.perf_counter() - start
+
+                # Verify: one main forward pass over the uncached tokens and all proposals
+                start = time.perf_counter()
+                outputs = self.model(
+                    input_ids=torch.tensor([sequence[main_cached:] + proposals], device=device),
+                    past_key_values=main_cache,
+                    use_cache=True
+                )
+                self._verify_seconds += time.perf_counter() - start
+                predictions = torch.argmax(outputs.logits[0, -(k + 1):, :self._vocab_size], dim=-1).tolist()
+
+                accepted = 0
+                while accepted < k and proposals[accepted] == predictions[accepted]:
+                    accepted += 1
+                new_tokens = proposals[:accepted] + [predictions[accepted]]
+
+                with self._lock:
+                    self._rounds += 1
+                    self._proposed += k
+                    self._accepted += accepted
+
+                # Keep only cache positions consistent with the accepted sequence
+                valid = len(sequence) + accepted
+                main_cache = _crop(outputs.past_key_values, valid)
+                main_cached = valid
+                if draft_cache is not None and draft_cached > valid:
+                    draft_cache = _crop(draft_cache, valid)
+                    draft_cached = valid
+
+                if eos_token_id is not None and eos_token_id in new_tokens:
+                    new_tokens = new_tokens[:new_tokens.index(eos_token_id) + 1]
+                    sequence.extend(new_tokens)
+                    break
+                sequence.extend(new_tokens)
+
+                if k:
+                    num_draft = min(num_draft + 2, self.max_draft_tokens) if accepted == k else max(1, num_draft - 1)
+
+        generated = sequence[prompt_length:prompt_length + max_new_tokens]
+        with self._lock:
+            self._generated += len(generated)
+        return torch.tensor([sequence[:prompt_length] + generated], device=device)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Acceptance and cost statistics since creation
+
+        :return: Statistics dictionary
+        """
+        with self._lock:
+            return {
+                'rounds': self._rounds,
+                'proposed_tokens': self._proposed,
+                'accepted_tokens': self._accepted,
+                'acceptance_rate': self._accepted / self._proposed if self._proposed else 0.0,
+                'generated_tokens': self._generated,
+                'tokens_per_main_pass': self._generated / self._rounds if self._rounds else 0.0,
+                'draft_seconds': self._draft_seconds,
+                'verify_seconds': self._verify_seconds,
+                'num_draft_tokens': self.num_draft_tokens
+            }
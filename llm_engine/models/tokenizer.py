@@ -1,23 +1,125 @@
-from typing import List, Dict, Any
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
 from transformers import PreTrainedTokenizer
 
 class TokenizerUtils:
-    def __init__(self, tokenizer: PreTrainedTokenizer):
-        """Initialize tokenizer utilities."""
+    def __init__(self, tokenizer: PreTrainedTokenizer, max_cached_counts: int = 4096):
+        """
+        Initialize tokenizer utilities.
+
+        Token counts of up to max_cached_counts texts are remembered by text
+        hash, so retrieved documents and prompt scaffolding that recur across
+        queries are tokenized once.
+        """
         self.tokenizer = tokenizer
+        self.max_cached_counts = max_cached_counts
+        self._text_counts: 'OrderedDict[str, int]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._special_tokens = tokenizer.num_special_tokens_to_add()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, count: int):
+        with self._lock:
+            self._text_counts[key] = count
+            self._text_counts.move_to_end(key)
+            if len(self._text_counts) > self.max_cached_counts:
+                self._text_counts.popitem(last=False)
 
-    def count_tokens(self, text: str) -> int:
+    def count_tokens(self, text: str, add_special_tokens: bool = True) -> int:
         """Count the number of tokens in a text."""
-        return len(self.tokenizer.encode(text))
+        return self.count_tokens_many([text], add_special_tokens)[0]
+
+    def count_text_tokens(self, text: str) -> int:
+        """Count the tokens of a text fragment (no special tokens)."""
+        return self.count_tokens(text, add_special_tokens=False)
+
+    def count_tokens_many(self, texts: List[str], add_special_tokens: bool = True) -> List[int]:
+        """
+        Count the tokens of several texts.
+
+        Cached counts are reused; the remaining texts are tokenized in one
+        batch call, which fast tokenizers run in parallel.
+        """
+        keys = [self._key(text) for text in texts]
+        counts: List[Optional[int]] = []
+        with self._lock:
+            for key in keys:
+                count = self._text_counts.get(key)
+                if count is not None:
+                    self._text_counts.move_to_end(key)
+                counts.append(count)
+
+        missing = [i for i, count in enumerate(counts) if count is None]
+        if missing:
+            # Deduplicate so repeated texts in one call are tokenized once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = self.tokenizer(
+                unique,
+                add_special_tokens=False,
+                return_attention_mask=False,
+                return_token_type_ids=False
+            )["input_ids"]
+            fresh = {text: len(ids) for text, ids in zip(unique, encoded)}
+            for i in missing:
+                counts[i] = fresh[texts[i]]
+                self._remember(keys[i], counts[i])
+
+        extra = self._special_tokens if add_special_tokens else 0
+        return [count + extra for count in counts]
+
+    def token_end_offsets(self, text: str) -> Optional[List[int]]:
+        """Character offset where each token of text ends, or None for slow tokenizers."""
+        if not getattr(self.tokenizer, "is_fast", False):
+            return None
+        encoding = self.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False
+        )
+        offsets = [end for _, end in encoding["offset_mapping"]]
+        self._remember(self._key(text), len(offsets))
+        return offsets
 
     def truncate_text(self, text: str, max_tokens: int) -> str:
-        """Truncate text to fit within max_tokens limit."""
-        tokens = self.tokenizer.encode(text)
-        if len(tokens) <= max_tokens:
+        """
+        Truncate text to fit within max_tokens limit.
+
+        The result is always a prefix of text, found without decoding. With a
+        fast tokenizer it is cut at a token boundary from character offsets;
+        slow tokenizers scale the cut by the measured token count. A prefix
+        can tokenize differently from the head of the full text, so the cut
+        moves back until the prefix's own count fits.
+        """
+        budget = max(0, max_tokens - self._special_tokens)
+        offsets = self.token_end_offsets(text)
+        if offsets is None:
+            total = self.count_text_tokens(text)
+            if total <= budget:
+                return text
+            cut = len(text) * budget // total
+            while cut > 0:
+                count = self.count_text_tokens(text[:cut])
+                if count <= budget:
+                    break
+                cut = min(cut - 1, cut * budget // count)
+            return text[:max(cut, 0)]
+
+        if len(offsets) <= budget:
             return text
-        
-        truncated_tokens = tokens[:max_tokens]
-        return self.tokenizer.decode(truncated_tokens)
+        kept = budget
+        while kept > 0:
+            count = self.count_text_tokens(text[:offsets[kept - 1]])
+            if count <= budget:
+                return text[:offsets[kept - 1]]
+            kept -= count - budget
+        return ""
 
     def batch_encode(self, texts: List[str], **kwargs) -> Dict[str, Any]:
         """Encode a batch of texts."""
@@ -1,8 +1,16 @@
 from ..embeddings.pinecone_client import PineconeEmbeddingManager
 
 class ContextRetriever:
-    def __init__(self, top_k=5):
-        self.embedding_manager = PineconeEmbeddingManager()
+    def __init__(self, top_k=5, embedding_manager=None):
+        """
+        Initialize the context retriever
+        
+        Args:
+            top_k (int): Number of context snippets to retrieve
+            embedding_manager (PineconeEmbeddingManager, optional): Manager to query;
+                defaults to the process-wide shared manager
+        """
+        self.embedding_manager = embedding_manager or PineconeEmbeddingManager.shared()
         self.top_k = top_k
 
     def retrieve_context(self, query):
@@ -17,7 +25,7 @@ class ContextRetriever:
         """
         try:
             results = self.embedding_manager.index.query(
-                self.embedding_manager.model.encode([query])[0].tolist(), 
+                self.embedding_manager.generate_embeddings([query])[0], 
                 top_k=self.top_k,
                 include_metadata=True
             )
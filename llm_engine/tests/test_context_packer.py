@@ -0,0 +1,86 @@
+import os
+import sys
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.engine import LLMEngine
+from llm_engine.models.inference import LLMInference
+from llm_engine.models.tokenizer import TokenizerUtils
+from llm_engine.utils.context_packer import ContextPacker
+from llm_engine.tests.test_prefix_cache import WORDS, _tiny_model_and_tokenizer
+
+
+def _sentences(start, count, length=5):
+    return " ".join(" ".join(WORDS[start + i * length:start + (i + 1) * length]) + " ." for i in range(count))
+
+
+def test_packs_in_rank_order_and_trims_at_sentence_boundary():
+    _, tokenizer = _tiny_model_and_tokenizer()
+    packer = ContextPacker(TokenizerUtils(tokenizer), separator=" [UNK] ", min_document_tokens=4)
+    documents = [
+        {'id': 'a', 'text': _sentences(0, 2)},   # 12 tokens
+        {'id': 'b', 'text': _sentences(20, 4)},  # 24 tokens
+        {'id': 'c', 'text': _sentences(60, 1)}
+    ]
+
+    packed = packer.pack(documents, max_tokens=30)
+    assert [doc['id'] for doc in packed['documents']] == ['a', 'b']
+    # 30 - 12 - 1 separator leaves 17 tokens: two whole sentences of the second document
+    assert packed['documents'][1]['text'] == _sentences(20, 2)
+    assert packed['tokens'] == 12 + 1 + 12 <= 30
+    assert packed['truncated'] and packed['dropped'] == 1
+    # Packing the result again keeps it unchanged
+    assert packer.pack(packed['documents'], max_tokens=30)['text'] == packed['text']
+
+    # Too little room for a useful trimmed document
+    assert [doc['id'] for doc in packer.pack(documents, max_tokens=15)['documents']] == ['a']
+
+
+def test_inference_keeps_prompt_and_answer_room_within_window():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    inference = LLMInference(model, tokenizer, "cpu", prefix_cache=False, scheduler=False, speculative=False)
+    inference.answer_tokens = 64
+    context = [{'text': _sentences(0, 30)} for _ in range(3)]
+    prompt = " ".join(WORDS[190:])
+
+    packed = inference.pack_context(prompt, context)
+    prompt_tokens = inference._prepare_inputs(prompt, context)["input_ids"].shape[1]
+    assert 0 < packed['tokens'] and prompt_tokens + 64 <= inference.context_window
+    assert inference.context_window - prompt_tokens - 64 < 6  # at most one sentence is left unused
+    assert inference.generate(prompt, max_length=prompt_tokens + 4, context=context) is not None
+
+
+def test_context_is_budgeted_against_max_length():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    inference = LLMInference(model, tokenizer, "cpu", prefix_cache=False, scheduler=False, speculative=False)
+    context = [{'text': _sentences(0, 30)} for _ in range(3)]
+    prompt = " ".join(WORDS[:2])
+
+    # The full window would leave no room under max_length=100
+    assert inference.pack_context(prompt, context)['tokens'] > 100
+    packed = inference.pack_context(prompt, context, max_length=100)
+    assert 0 < packed['tokens'] <= 50
+
+    prompt_tokens = inference._prepare_inputs(prompt, context, max_length=100)["input_ids"].shape[1]
+    assert prompt_tokens <= 50
+    assert inference.generate(prompt, max_length=100, context=context) is not None
+
+
+def test_engine_packs_context_once_per_query():
+    class Retriever:
+        def retrieve(self, query, k):
+            return [{'_id': str(i), 'text': _sentences(i, 3)} for i in range(k)]
+
+    model, tokenizer = _tiny_model_and_tokenizer()
+    engine = LLMEngine(model, tokenizer, embedding_model=None, device="cpu", retriever=Retriever(), response_cache=False)
+    engine.inference.scheduler = None
+    packs = []
+    pack = engine.inference.context_packer.pack
+    engine.inference.context_packer.pack = lambda *args, **kwargs: packs.append(1) or pack(*args, **kwargs)
+
+    result = engine.process_query(" ".join(WORDS[:3]), max_length=120, temperature=0)
+    assert result["metadata"]["context_used"] and len(packs) == 1
+
+    stream = engine.process_query(" ".join(WORDS[:3]), max_length=120, temperature=0, stream=True)
+    assert "".join(stream["response"]) and len(packs) == 2
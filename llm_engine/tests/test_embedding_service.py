@@ -0,0 +1,78 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.embeddings.embedding_service import EmbeddingService
+
+
+class RecordingModel:
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def encode(self, texts, batch_size=32):
+        with self.lock:
+            self.batches.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+
+def test_concurrent_requests_share_batches():
+    model = RecordingModel()
+    service = EmbeddingService(model=model, max_batch_size=8, max_wait_ms=50)
+    texts = [f"text {'x' * i}" for i in range(16)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(service.encode, texts))
+    service.close()
+
+    for text, embedding in zip(texts, results):
+        assert embedding.shape == (2,)
+        assert embedding[0] == len(text)
+
+    assert len(model.batches) < len(texts)
+    assert all(len(batch) <= 8 for batch in model.batches)
+    stats = service.stats()
+    assert stats['texts'] == 16
+    assert 0 < stats['batch_fill_ratio'] <= 1
+
+
+def test_list_request_keeps_order_and_sorts_batches_by_length():
+    model = RecordingModel()
+    service = EmbeddingService(model=model, max_batch_size=2, max_wait_ms=1)
+    texts = ['long text here', 'a', 'medium', 'bb']
+
+    embeddings = service.encode(texts)
+    service.close()
+
+    assert embeddings.shape == (4, 2)
+    assert list(embeddings[:, 0]) == [len(text) for text in texts]
+    assert model.batches == [['a', 'bb'], ['medium', 'long text here']]
+
+
+def test_encode_honors_sentence_transformer_arguments():
+    import torch
+    import pytest
+
+    service = EmbeddingService(model=RecordingModel(), max_wait_ms=1)
+    texts = ['abc', 'de']
+
+    normalized = service.encode(texts, normalize_embeddings=True, batch_size=4, show_progress_bar=False)
+    np.testing.assert_allclose(np.linalg.norm(normalized, axis=1), [1.0, 1.0], rtol=1e-6)
+
+    tensor = service.encode(texts, convert_to_tensor=True)
+    assert isinstance(tensor, torch.Tensor) and tuple(tensor.shape) == (2, 2)
+    rows = service.encode(texts, convert_to_numpy=False)
+    assert isinstance(rows, list) and all(isinstance(row, torch.Tensor) for row in rows)
+
+    with pytest.raises(TypeError, match='precision'):
+        service.encode(texts, precision='int8')
+    service.close()
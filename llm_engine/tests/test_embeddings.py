@@ -1,13 +1,8 @@
 import sys
 import os
+import zlib
 import logging
-from dotenv import load_dotenv
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from pymongo import MongoClient
-
-# Load environment variables
-load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env'))
 
 # Add the parent directory to sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -15,132 +10,150 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 # Import default user ID from backend config
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'backend')))
 from config import DEFAULT_USER_ID
-from db.mongo_connection import init_db, get_db
 
 from embeddings.vector_store import VectorStore
 from embeddings.retriever import RAGRetriever
 from embeddings.pinecone_client import PineconeEmbeddingManager
+from embeddings.model_registry import EmbeddingModelRegistry
+from embeddings.backends import LocalVectorBackend, matches_filter
+
+DOCUMENTS = [
+    {"text": "Machine learning is fascinating", "source": "AI book"},
+    {"text": "Python is a great programming language", "source": "Coding manual"},
+    {"text": "Neural networks simulate brain function", "source": "Neuroscience journal"}
+]
+
+
+class StubEmbeddingModel:
+    """Bag-of-words hashing model: texts sharing words get similar vectors, no download needed"""
+
+    dimension = 32
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        vectors = np.zeros((1 if single else len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % self.dimension] += 1.0
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+
+class StubCollection:
+    """In-memory stand-in for the Mongo document collection"""
+
+    def __init__(self):
+        self.documents = {}
+
+    def insert_one(self, document):
+        self.documents[document['_id']] = dict(document)
+
+    def delete_one(self, query):
+        matched = [key for key, document in self.documents.items() if matches_filter(document, query)][:1]
+        for key in matched:
+            del self.documents[key]
+        return type('DeleteResult', (), {'deleted_count': len(matched)})()
+
+    def find(self, query, projection=None):
+        hidden = [field for field, shown in (projection or {}).items() if not shown]
+        return [
+            {key: value for key, value in document.items() if key not in hidden}
+            for document in self.documents.values() if matches_filter(document, query)
+        ]
+
+
+def _manager(model):
+    registry = EmbeddingModelRegistry(loader=lambda name: model)
+    return PineconeEmbeddingManager(registry=registry, backend=LocalVectorBackend())
+
 
 def test_vector_store():
-    print("Testing Vector Store...")
-    
-    # Initialize embedding model
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    
-    # Sample documents
-    documents = [
-        {"text": "Machine learning is fascinating", "source": "AI book", "user_id": DEFAULT_USER_ID},
-        {"text": "Python is a great programming language", "source": "Coding manual", "user_id": DEFAULT_USER_ID},
-        {"text": "Neural networks simulate brain function", "source": "Neuroscience journal", "user_id": DEFAULT_USER_ID}
-    ]
-    
-    # Generate embeddings
+    model = StubEmbeddingModel()
+    documents = [{**doc, "user_id": DEFAULT_USER_ID} for doc in DOCUMENTS]
+
     embeddings = model.encode([doc['text'] for doc in documents])
-    
-    # Create vector store
     vector_store = VectorStore(dimension=embeddings.shape[1])
-    
-    # Add documents
     vector_store.add_documents(documents, embeddings)
-    
-    # Test search
-    query = "programming language"
-    query_embedding = model.encode(query)
-    
-    results = vector_store.search(query_embedding, k=2)
-    
-    print("Search Results:")
-    for result in results:
-        print(f"Text: {result['text']}, Score: {result['score']}")
+
+    results = vector_store.search(model.encode("programming language"), k=2)
+    assert len(results) == 2
+    assert results[0]['text'] == "Python is a great programming language"
+
 
 def test_rag_retriever():
-    print("\nTesting RAG Retriever...")
-    
-    # Initialize embedding model
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    
-    # Initialize MongoDB client using backend connection
-    mongo_client = MongoClient(os.getenv('MONGO_URI'))
-    
-    # Initialize Pinecone client
-    pinecone_client = PineconeEmbeddingManager(
-        api_key=os.getenv('PINECONE_API_KEY'), 
-        index_name=os.getenv('PINECONE_INDEX_NAME', 'test-index')
+    model = StubEmbeddingModel()
+    collection = StubCollection()
+    retriever = RAGRetriever(
+        mongodb_client={'user_documents': {'documents': collection}},
+        pinecone_client=_manager(model),
+        embedding_model=model,
+        model_version='stub-model'
     )
-    
-    # Create RAG retriever
+
+    for document in DOCUMENTS:
+        retriever.add_document(DEFAULT_USER_ID, dict(document))
+
+    results = retriever.retrieve_documents(DEFAULT_USER_ID, "programming language", k=1)
+    assert [doc['text'] for doc in results] == ["Python is a great programming language"]
+    assert 'embedding' not in results[0]
+    assert retriever.retrieve_documents("someone_else", "programming language") == []
+
+
+def test_deleting_a_document_drops_cached_responses():
+    class RecordingCache:
+        def __init__(self):
+            self.invalidated = []
+
+        def invalidate_documents(self, document_ids):
+            self.invalidated.extend(document_ids)
+
+    model = StubEmbeddingModel()
+    cache = RecordingCache()
     retriever = RAGRetriever(
-        mongodb_client=mongo_client, 
-        pinecone_client=pinecone_client, 
+        mongodb_client={'user_documents': {'documents': StubCollection()}},
+        pinecone_client=_manager(model),
         embedding_model=model,
-        database_name=os.getenv('DATABASE_NAME'),
-        collection_name='documents'
+        model_version='stub-model',
+        response_cache=cache
     )
-    
-    # Add some test logic if needed
-    print("RAG Retriever initialized successfully")
+    doc_ids = [retriever.add_document(DEFAULT_USER_ID, dict(document)) for document in DOCUMENTS]
+
+    assert retriever.delete_document(DEFAULT_USER_ID, doc_ids[1])
+    assert cache.invalidated == [doc_ids[1]]
+    assert retriever.user_vector_stores[DEFAULT_USER_ID].get_document_count() == 2
+    results = retriever.retrieve_documents(DEFAULT_USER_ID, "programming language", k=3)
+    assert doc_ids[1] not in [doc['_id'] for doc in results]
+
 
 def test_pinecone_embeddings():
     """
-    Test Pinecone embedding functionality
+    Test embedding, upsert and filtered query through the manager on the local backend
     """
     logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
-    
-    try:
-        # Initialize Pinecone Embedding Manager
-        pinecone_manager = PineconeEmbeddingManager(
-            api_key=os.getenv('PINECONE_API_KEY'), 
-            index_name=os.getenv('PINECONE_INDEX_NAME', 'test-index')
-        )
-        
-        # Sample texts for embedding
-        texts = [
-            "Machine learning is fascinating",
-            "Python is a great programming language",
-            "Neural networks simulate brain function"
-        ]
-        
-        # Test embedding generation
-        logger.info("Testing embedding generation...")
-        embeddings = pinecone_manager.generate_embeddings(texts)
-        assert len(embeddings) == len(texts), "Embedding generation failed"
-        logger.info(f"Successfully generated {len(embeddings)} embeddings")
-        
-        # Test upserting embeddings
-        logger.info("Testing embedding upsert...")
-        pinecone_manager.upsert_embeddings(
-            texts,
-            metadata=[{'source': 'test', 'user_id': DEFAULT_USER_ID} for _ in texts]
-        )
-        logger.info("Successfully upserted embeddings")
-        
-        # Test querying embeddings
-        logger.info("Testing embedding query...")
-        query_text = "programming language"
-        query_embedding = pinecone_manager.generate_embeddings([query_text])[0]
-        results = pinecone_manager.index.query(
-            vector=query_embedding, 
-            top_k=3, 
-            include_metadata=True,
-            filter={
-                "user_id": {"$eq": DEFAULT_USER_ID}
-            }
-        )
-        
-        logger.info("Successfully queried embeddings")
-        print("Query Results:")
-        for match in results['matches']:
-            print(f"Score: {match['score']}, Metadata: {match.get('metadata', {})}")
-        
-    except Exception as e:
-        logger.error(f"Pinecone embedding test failed: {e}")
-        raise
-
-def main():
-    test_vector_store()
-    test_rag_retriever()
-    test_pinecone_embeddings()
-
-if __name__ == "__main__":
-    main()
+    pinecone_manager = _manager(StubEmbeddingModel())
+    texts = [doc['text'] for doc in DOCUMENTS]
+
+    embeddings = pinecone_manager.generate_embeddings(texts)
+    assert len(embeddings) == len(texts), "Embedding generation failed"
+
+    pinecone_manager.upsert_embeddings(
+        texts,
+        metadata=[{'source': 'test', 'user_id': DEFAULT_USER_ID} for _ in texts]
+    )
+
+    query_embedding = pinecone_manager.generate_embeddings(["programming language"])[0]
+    results = pinecone_manager.index.query(
+        vector=query_embedding,
+        top_k=3,
+        namespace='default',
+        include_metadata=True,
+        filter={
+            "user_id": {"$eq": DEFAULT_USER_ID}
+        }
+    )
+
+    assert len(results['matches']) == 3
+    assert results['matches'][0]['id'] == '1'
+    assert all(match['metadata']['user_id'] == DEFAULT_USER_ID for match in results['matches'])
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import numpy as np
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.embeddings.encoding_pool import MultiProcessEncodingPool
+
+
+class LengthModel:
+    def encode(self, texts, batch_size=32):
+        return np.array([[len(text), text.count('a')] for text in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+
+def load_length_model(model_name):
+    return LengthModel()
+
+
+def test_pool_encodes_in_input_order():
+    texts = [('a' * (i % 7)) + 'x' * i for i in range(50)]
+
+    with MultiProcessEncodingPool(num_workers=2, shard_size=8, model_loader=load_length_model) as pool:
+        embeddings = pool.encode(texts)
+        report = pool.throughput_report()
+
+    assert embeddings.dtype == np.float32
+    assert embeddings.shape == (50, 2)
+    np.testing.assert_array_equal(embeddings[:, 0], [len(text) for text in texts])
+    np.testing.assert_array_equal(embeddings[:, 1], [text.count('a') for text in texts])
+    assert sum(worker['texts'] for worker in report) == 50
+    assert not pool.running
+
+
+def test_concurrent_jobs_each_get_their_own_results():
+    from concurrent.futures import ThreadPoolExecutor
+
+    jobs = [[('a' * job) + 'x' * i for i in range(40)] for job in range(4)]
+
+    with MultiProcessEncodingPool(num_workers=2, shard_size=4, model_loader=load_length_model, task_timeout=30) as pool:
+        with ThreadPoolExecutor(max_workers=4) as threads:
+            results = list(threads.map(pool.encode, jobs))
+
+    for texts, embeddings in zip(jobs, results):
+        np.testing.assert_array_equal(embeddings[:, 0], [len(text) for text in texts])
+        np.testing.assert_array_equal(embeddings[:, 1], [text.count('a') for text in texts])
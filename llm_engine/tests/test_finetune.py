@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+
+import torch
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.models.finetune import IGNORE_INDEX, LengthBucketSampler, PersonalStyleDataset, StyleFineTuner
+from llm_engine.tests.test_prefix_cache import WORDS, _tiny_model_and_tokenizer
+
+
+def test_dataset_masks_prompts_and_is_cached(tmp_path):
+    _, tokenizer = _tiny_model_and_tokenizer()
+    texts, labels = ["w1 w2 w3", "w4 w5"], ["w10 w11", ""]
+
+    dataset = PersonalStyleDataset(texts, labels, tokenizer, cache_dir=str(tmp_path))
+    assert dataset[0]["labels"] == [IGNORE_INDEX] * 3 + dataset[0]["input_ids"][3:]
+    assert dataset[0]["input_ids"][-1] == tokenizer.eos_token_id
+    assert dataset[1]["labels"] == dataset[1]["input_ids"]
+
+    cached = PersonalStyleDataset(texts, labels, tokenizer=tokenizer, cache_dir=str(tmp_path))
+    assert cached.input_ids == dataset.input_ids and len(os.listdir(tmp_path)) == 1
+
+
+def test_bucketed_batches_cover_every_example_once_per_epoch():
+    lengths = [(i * 7) % 50 + 1 for i in range(100)]
+    sampler = LengthBucketSampler(lengths, batch_size=8, bucket_batches=4)
+
+    first = sampler.batches()
+    assert sorted(i for batch in first for i in batch) == list(range(100))
+    sampler.set_epoch(1)
+    assert sampler.batches() != first
+    # Within a pool, batches hold neighbouring lengths
+    spread = sum(max(lengths[i] for i in b) - min(lengths[i] for i in b) for b in first) / len(first)
+    assert spread < 15
+
+
+def test_training_with_accumulation_lowers_loss():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    tuner = StyleFineTuner(model, tokenizer, device="cpu", config={"mixed_precision": "bf16", "log_every": 1})
+    texts = [" ".join(WORDS[i:i + 4 + i % 5]) for i in range(24)]
+    labels = [" ".join(WORDS[100:103])] * 24
+
+    loader = tuner.prepare_dataset(texts, labels, batch_size=4, num_workers=0)
+    first = tuner.train(loader, epochs=1, gradient_accumulation_steps=2, learning_rate=1e-2)
+    last = tuner.train(loader, epochs=3, gradient_accumulation_steps=2, learning_rate=1e-2)
+
+    assert first["steps"] == 3 and last["tokens_per_second"] > 0 and last["peak_memory_mb"] > 0
+    assert last["loss"] < first["loss"]
+    assert model.config.use_cache and not model.training
+
+
+def test_resume_after_crash_matches_uninterrupted_run(tmp_path):
+    config = {"mixed_precision": "none", "checkpoint_every": 2, "keep_checkpoints": 1}
+    texts = [" ".join(WORDS[i:i + 3 + i % 6]) for i in range(24)]
+    labels = [" ".join(WORDS[100:102])] * 24
+
+    def run(checkpoint_dir, crash_after=None):
+        model, tokenizer = _tiny_model_and_tokenizer()
+        tuner = StyleFineTuner(model, tokenizer, device="cpu", config=config)
+        loader = tuner.prepare_dataset(texts, labels, batch_size=4, num_workers=0)
+        if crash_after is not None:
+            forward, calls = model.forward, []
+            def crashing_forward(*args, **kwargs):
+                calls.append(1)
+                if len(calls) > crash_after:
+                    raise RuntimeError("preempted")
+                return forward(*args, **kwargs)
+            model.forward = crashing_forward
+        tuner.train(loader, epochs=2, gradient_accumulation_steps=2, learning_rate=1e-2,
+                    checkpoint_dir=str(checkpoint_dir))
+        return model
+
+    reference = run(tmp_path / "reference")
+    try:
+        run(tmp_path / "resumed", crash_after=7)
+    except RuntimeError:
+        pass
+    assert sorted(os.listdir(tmp_path / "resumed")) == ["checkpoint-00000002.pt", "metrics.jsonl"]
+    resumed = run(tmp_path / "resumed")
+
+    for (name, expected), (_, actual) in zip(reference.named_parameters(), resumed.named_parameters()):
+        torch.testing.assert_close(actual, expected, msg=name)
+
+    with open(tmp_path / "resumed" / "metrics.jsonl") as f:
+        records = [json.loads(line) for line in f]
+    assert records[-1]["step"] == 6 and {"loss", "tokens_per_second", "step_time_s", "peak_memory_mb"} <= set(records[-1])
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import numpy as np
+import torch
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.models.inference import LLMInference
+from llm_engine.tests.test_prefix_cache import WORDS, _tiny_model_and_tokenizer
+
+
+def test_batched_embeddings_ignore_padding_and_keep_input_order():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    inference = LLMInference(model, tokenizer, "cpu", prefix_cache=False, scheduler=False, speculative=False)
+    texts = [" ".join(WORDS[i:i + length]) for i, length in enumerate([12, 3, 30, 7, 1])]
+
+    embeddings = inference.get_embeddings(texts, batch_size=2)
+    assert embeddings.shape == (5, model.config.hidden_size)
+    assert embeddings.dtype == np.float32 and embeddings.flags['C_CONTIGUOUS']
+
+    # Each row equals the unpadded mean of the base model's hidden states
+    for text, row in zip(texts, embeddings):
+        input_ids = tokenizer(text, return_tensors="pt")["input_ids"]
+        with torch.no_grad():
+            expected = model.model(input_ids=input_ids).last_hidden_state.mean(dim=1)[0].numpy()
+        np.testing.assert_allclose(row, expected, atol=1e-5)
+
+    tokenizer.padding_side = "left"
+    np.testing.assert_allclose(inference.get_embeddings(texts, batch_size=5), embeddings, atol=1e-5)
+    assert inference.get_embedding(texts[0]).shape == (1, model.config.hidden_size)
+
+
+def test_embeddings_work_without_a_pad_token():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    inference = LLMInference(model, tokenizer, "cpu", prefix_cache=False, scheduler=False, speculative=False)
+    texts = [" ".join(WORDS[i:i + length]) for i, length in enumerate([12, 3, 30, 7, 1])]
+    expected = inference.get_embeddings(texts, batch_size=5)
+
+    # GPT-2 style tokenizer: no pad token at all
+    tokenizer.pad_token = None
+    assert tokenizer.pad_token_id is None
+    np.testing.assert_allclose(inference.get_embeddings(texts, batch_size=5), expected, atol=1e-5)
+
+
+def test_embeddings_skip_position_ids_for_models_without_them():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    inference = LLMInference(model, tokenizer, "cpu", prefix_cache=False, scheduler=False, speculative=False)
+    texts = [" ".join(WORDS[i:i + length]) for i, length in enumerate([12, 3, 30])]
+    expected = inference.get_embeddings(texts)
+
+    class NoPositionsModel(torch.nn.Module):
+        # Like Bloom: no position_ids parameter, and unknown arguments raise
+        def __init__(self, base):
+            super().__init__()
+            self.base = base
+
+        def forward(self, input_ids=None, attention_mask=None):
+            return self.base(input_ids=input_ids, attention_mask=attention_mask)
+
+    model.model = NoPositionsModel(model.model)
+    for side in ("right", "left"):
+        tokenizer.padding_side = side
+        embeddings = inference.get_embeddings(texts)
+        assert embeddings.shape == expected.shape
+    tokenizer.padding_side = "right"
+    np.testing.assert_allclose(inference.get_embeddings(texts), expected, atol=1e-5)
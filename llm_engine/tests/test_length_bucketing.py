@@ -0,0 +1,85 @@
+import os
+import sys
+
+import numpy as np
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.embeddings.length_bucketing import LengthBucketedEncoder, padded_tokens
+
+
+class WordModel:
+    """Model without a tokenizer: lengths fall back to word counts."""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size=32):
+        self.batches.append(list(texts))
+        return np.array([[len(text.split()), 0.0] for text in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+
+def test_padded_tokens_counts_per_batch_maximum():
+    assert padded_tokens([1, 5, 2, 2], batch_size=2) == 5 * 2 + 2 * 2
+
+
+def test_encode_restores_order_and_reduces_padding():
+    texts = ['word ' * 200, 'short one', 'word ' * 150, 'tiny', 'a medium length text here']
+    model = WordModel()
+    encoder = LengthBucketedEncoder(model, batch_size=2, bucket_boundaries=(8, 64, 512))
+
+    embeddings = encoder.encode(texts)
+
+    np.testing.assert_array_equal(embeddings[:, 0], [len(t.split()) for t in texts])
+    assert all(len(batch) <= 2 for batch in model.batches)
+    stats = encoder.stats()
+    assert stats['texts'] == 5
+    assert stats['padded_tokens'] < stats['baseline_padded_tokens']
+    assert stats['token_efficiency'] > stats['baseline_token_efficiency']
+    assert encoder.padding_report(texts)['padded_tokens'] == stats['padded_tokens']
+
+
+def test_single_text_returns_vector():
+    encoder = LengthBucketedEncoder(WordModel())
+    assert encoder.encode('just one').shape == (2,)
+
+
+def test_small_calls_skip_length_measurement():
+    class CountingTokenizer:
+        calls = 0
+
+        def __call__(self, texts, **kwargs):
+            CountingTokenizer.calls += 1
+            return {'input_ids': [text.split() for text in texts]}
+
+    model = WordModel()
+    model.tokenizer = CountingTokenizer()
+    encoder = LengthBucketedEncoder(model, batch_size=4)
+
+    encoder.encode(['one query'])
+    encoder.encode(['a', 'b c', 'd e f'])
+    assert CountingTokenizer.calls == 0 and len(model.batches) == 2
+
+    encoder.encode(['x'] * 5)
+    assert CountingTokenizer.calls == 1
+
+
+def test_encode_honors_output_arguments():
+    import torch
+
+    encoder = LengthBucketedEncoder(WordModel(), batch_size=2)
+    texts = ['a b c', 'd', 'e f', 'g h i j', 'k']
+
+    tensor = encoder.encode(texts, convert_to_tensor=True, normalize_embeddings=True)
+    assert isinstance(tensor, torch.Tensor) and tensor.shape == (5, 2)
+    np.testing.assert_allclose(tensor.norm(dim=1).numpy(), 1.0, rtol=1e-6)
+
+    rows = encoder.encode(texts[:2], convert_to_numpy=False)
+    assert isinstance(rows, list) and all(isinstance(row, torch.Tensor) for row in rows)
+    assert isinstance(encoder.encode('one', convert_to_tensor=True), torch.Tensor)
+    # batch_size is the encoder's own; a caller's value is ignored rather than passed on twice
+    assert encoder.encode(texts, batch_size=64).shape == (5, 2)
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+import torch
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.models.loader import load_local_model, model_memory_bytes, quantize_model, resolve_quantization
+from llm_engine.tests.test_prefix_cache import _tiny_model_and_tokenizer
+
+
+def test_resolve_quantization_setting():
+    assert resolve_quantization(True) == 'int8'
+    assert resolve_quantization(False) == 'none'
+    assert resolve_quantization(None) == 'none'
+    assert resolve_quantization('BF16') == 'bf16'
+    with pytest.raises(ValueError):
+        resolve_quantization('int4')
+
+
+def test_int8_and_bf16_shrink_weights_and_still_generate():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    baseline = model_memory_bytes(model)
+    inputs = tokenizer("w1 w2 w3", return_tensors="pt")
+
+    int8_model = quantize_model(model, 'int8')
+    assert int8_model is not model
+    assert model_memory_bytes(int8_model) < 0.7 * baseline
+
+    bf16_model = quantize_model(model, 'bf16')
+    assert next(bf16_model.parameters()).dtype == torch.bfloat16
+    assert model_memory_bytes(bf16_model) < 0.6 * baseline
+
+    for variant in (int8_model, bf16_model):
+        with torch.no_grad():
+            outputs = variant.generate(**inputs, max_new_tokens=4, min_new_tokens=4, do_sample=False)
+        assert outputs.shape[1] == inputs["input_ids"].shape[1] + 4
+
+
+def test_mmap_loading_matches_weights_and_reports_phases(tmp_path):
+    model, tokenizer = _tiny_model_and_tokenizer()
+    model.save_pretrained(tmp_path)
+    tokenizer.save_pretrained(tmp_path)
+
+    timings = {}
+    loaded, _ = load_local_model(str(tmp_path), quantization=False, config={}, warmup_tokens=2, timings=timings)
+    assert set(timings) == {'tokenizer_s', 'weights_s', 'quantize_s', 'warmup_s', 'total_s'}
+
+    # Parameters are views of the mapped file rather than private copies
+    weight = loaded.model.embed_tokens.weight
+    assert weight.untyped_storage().nbytes() == os.path.getsize(tmp_path / 'model.safetensors')
+
+    inputs = tokenizer("w1 w2 w3", return_tensors="pt")
+    with torch.no_grad():
+        torch.testing.assert_close(loaded(**inputs).logits, model(**inputs).logits)
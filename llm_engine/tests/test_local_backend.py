@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.embeddings.backends import LocalVectorBackend, matches_filter
+from llm_engine.embeddings.model_registry import EmbeddingModelRegistry
+from llm_engine.embeddings.pinecone_client import PineconeEmbeddingManager
+
+
+def _vectors():
+    return [
+        {'id': 'a', 'values': [1.0, 0.0, 0.0], 'metadata': {'user_id': 'u1', 'year': 2020}},
+        {'id': 'b', 'values': [0.9, 0.1, 0.0], 'metadata': {'user_id': 'u1', 'year': 2023}},
+        {'id': 'c', 'values': [0.0, 1.0, 0.0], 'metadata': {'user_id': 'u2', 'tags': ['resume']}},
+    ]
+
+
+def test_query_ranks_by_cosine_and_applies_filters():
+    backend = LocalVectorBackend()
+    backend.upsert(_vectors(), namespace='ns')
+
+    results = backend.query([1.0, 0.0, 0.0], top_k=2, namespace='ns')
+    assert [match['id'] for match in results['matches']] == ['a', 'b']
+    assert results['matches'][0]['score'] > results['matches'][1]['score']
+
+    filtered = backend.query([1.0, 0.0, 0.0], top_k=3, namespace='ns', filter={'year': {'$gte': 2021}})
+    assert [match['id'] for match in filtered['matches']] == ['b']
+
+    assert backend.query([1.0, 0.0, 0.0], namespace='other')['matches'] == []
+
+
+def test_filter_operators():
+    metadata = {'user_id': 'u1', 'year': 2023, 'tags': ['resume', 'cv']}
+
+    assert matches_filter(metadata, {'user_id': 'u1'})
+    assert matches_filter(metadata, {'tags': {'$in': ['cv']}})
+    assert matches_filter(metadata, {'$or': [{'year': {'$lt': 2000}}, {'user_id': {'$ne': 'u2'}}]})
+    assert not matches_filter(metadata, {'$and': [{'user_id': 'u1'}, {'year': {'$gt': 2023}}]})
+    assert not matches_filter(metadata, {'missing': {'$exists': True}})
+
+
+def test_fetch_delete_and_stats():
+    backend = LocalVectorBackend()
+    backend.upsert(_vectors(), namespace='ns')
+
+    fetched = backend.fetch(['a', 'missing'], namespace='ns')['vectors']
+    assert list(fetched) == ['a']
+    assert fetched['a']['metadata']['user_id'] == 'u1'
+
+    backend.delete(ids=['a'], namespace='ns')
+    backend.delete(filter={'user_id': 'u2'}, namespace='ns')
+    stats = backend.describe_index_stats()
+    assert stats['dimension'] == 3
+    assert stats['total_vector_count'] == 1
+    assert backend.query([1.0, 0.0, 0.0], namespace='ns')['matches'][0]['id'] == 'b'
+
+
+def test_persists_to_disk(tmp_path):
+    backend = LocalVectorBackend(persist_dir=str(tmp_path))
+    backend.upsert(_vectors(), namespace='user_u1')
+    backend.delete(ids=['c'], namespace='user_u1')
+
+    # Bulk writes stay in memory until saved; each namespace is then one file
+    assert LocalVectorBackend(persist_dir=str(tmp_path)).describe_index_stats()['namespaces'] == {}
+    backend.save()
+    assert [path.name for path in tmp_path.iterdir()] == [f"ns_{'user_u1'.encode().hex()}.npz"]
+
+    reloaded = LocalVectorBackend(persist_dir=str(tmp_path))
+    assert reloaded.describe_index_stats()['namespaces'] == {'user_u1': {'vector_count': 2}}
+    assert reloaded.fetch(['b'], namespace='user_u1')['vectors']['b']['metadata']['year'] == 2023
+
+
+def test_injected_latency():
+    backend = LocalVectorBackend(latency_ms=20)
+    start = time.perf_counter()
+    backend.upsert(_vectors())
+    assert time.perf_counter() - start >= 0.02
+
+
+def test_manager_runs_on_local_backend():
+    class FakeModel:
+        def encode(self, texts, **kwargs):
+            return np.array([[len(text), 1.0, 0.0] for text in texts], dtype=np.float32)
+
+        def get_sentence_embedding_dimension(self):
+            return 3
+
+    registry = EmbeddingModelRegistry(loader=lambda name: FakeModel())
+    manager = PineconeEmbeddingManager(registry=registry, backend=LocalVectorBackend())
+
+    manager.upsert_embeddings(['short', 'a much longer text'], ids=['s', 'l'], namespace='ns')
+    query = np.array(manager.generate_embeddings(['a much longer text'])[0])
+    results = manager.query(query, k=1, namespace='ns')
+
+    assert results['matches'][0]['id'] == 'l'
+    assert manager.get_index_stats()['total_vector_count'] == 2
+
+
+def test_concurrent_queries_are_coalesced():
+    from concurrent.futures import ThreadPoolExecutor
+    from llm_engine.embeddings.query_coalescer import QueryCoalescer
+
+    backend = LocalVectorBackend(latency_ms=5)
+    backend.upsert(_vectors(), namespace='ns')
+    coalescer = QueryCoalescer(backend, max_wait_ms=50, max_batch_size=16)
+
+    queries = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]] * 8
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda q: coalescer.query(q, top_k=1, namespace='ns'), queries))
+    coalescer.close()
+
+    assert [r['matches'][0]['id'] for r in results] == ['a', 'c'] * 8
+    stats = coalescer.stats()
+    assert stats['queries'] == 16
+    assert stats['batches'] < 16
+
+
+def test_fetch_vectors_fills_one_matrix():
+    backend = LocalVectorBackend()
+    backend.upsert(_vectors(), namespace='ns')
+    manager = PineconeEmbeddingManager(backend=backend)
+
+    matrix, ids = manager.fetch_vectors(['c', 'missing', 'a', 'b'], namespace='ns', batch_size=1)
+
+    assert matrix.dtype == np.float32
+    assert matrix.shape == (3, 3)
+    assert list(ids) == ['c', 'a', 'b']
+    np.testing.assert_allclose(matrix[0], [0.0, 1.0, 0.0])
+
+
+def test_coalescer_runs_singleton_groups_concurrently():
+    from concurrent.futures import ThreadPoolExecutor
+
+    class SlowIndex:
+        # Pinecone-like index: no query_batch, 50 ms per request
+        def query(self, vector, top_k, namespace, filter):
+            time.sleep(0.05)
+            return {'matches': [], 'namespace': namespace}
+
+    manager = PineconeEmbeddingManager(backend=SlowIndex(), query_batching=True, batch_max_wait_ms=1)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        namespaces = list(pool.map(
+            lambda user: manager.query(np.ones(3), k=1, namespace=f"user_{user}")['namespace'], range(8)
+        ))
+    elapsed = time.perf_counter() - start
+    manager.close()
+
+    assert namespaces == [f"user_{user}" for user in range(8)]
+    # Serialized dispatch would take 8 x 50 ms
+    assert elapsed < 0.3
+
+
+def test_coalescer_fails_pending_queries_when_its_worker_dies():
+    from llm_engine.embeddings.query_coalescer import QueryCoalescer
+
+    backend = LocalVectorBackend()
+    backend.upsert(_vectors(), namespace='ns')
+    coalescer = QueryCoalescer(backend, max_wait_ms=1)
+    coalescer._collect_batch = lambda first: 1 / 0
+
+    future = coalescer.submit([1.0, 0.0, 0.0], top_k=1, namespace='ns')
+    try:
+        future.result(timeout=5)
+        assert False, "expected the worker failure to propagate"
+    except ZeroDivisionError:
+        pass
+
+    # The next query starts a fresh worker
+    del coalescer._collect_batch
+    assert coalescer.query([1.0, 0.0, 0.0], top_k=1, namespace='ns')['matches'][0]['id'] == 'a'
+    coalescer.close()
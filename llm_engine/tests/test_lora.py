@@ -0,0 +1,77 @@
+import os
+import sys
+import threading
+
+import pytest
+import torch
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.engine import LLMEngine
+from llm_engine.models.finetune import StyleFineTuner
+from llm_engine.models.inference import LLMInference
+from llm_engine.models.lora import AdapterRegistry, LoRALinear
+from llm_engine.utils.response_cache import ResponseCache
+from llm_engine.tests.test_prefix_cache import WORDS, _tiny_model_and_tokenizer
+
+
+def _train_adapter(registry, adapter_id, target_word):
+    model, tokenizer = _tiny_model_and_tokenizer()
+    tuner = StyleFineTuner(model, tokenizer, device="cpu", config={"mixed_precision": "none"})
+    tuner.enable_lora(rank=4, alpha=8, dropout=0.0, target_modules=["q_proj", "v_proj", "o_proj"])
+
+    trainable = [name for name, param in model.named_parameters() if param.requires_grad]
+    assert trainable and all("lora_" in name for name in trainable)
+
+    texts = [" ".join(WORDS[i:i + 5]) for i in range(16)]
+    loader = tuner.prepare_dataset(texts, [" ".join([target_word] * 4)] * 16, batch_size=4, num_workers=0)
+    tuner.train(loader, epochs=6, learning_rate=3e-2)
+    tuner.save_adapter(adapter_id, registry)
+
+
+def test_adapters_are_applied_per_request_on_a_shared_model(tmp_path):
+    registry = AdapterRegistry(str(tmp_path), max_loaded=1)
+    _train_adapter(registry, "alice", "w150")
+    _train_adapter(registry, "bob", "w160")
+    assert registry.list_adapters() == ["alice", "bob"]
+    assert set(os.listdir(tmp_path / "alice")) == {"adapter.safetensors", "adapter_config.json"}
+
+    model, tokenizer = _tiny_model_and_tokenizer()
+    inference = LLMInference(model, tokenizer, "cpu", prefix_cache=False, scheduler=False,
+                             speculative=False, adapters=registry)
+    prompt = " ".join(WORDS[3:8])
+    base = inference.generate(prompt, max_length=12, temperature=0)
+
+    assert inference.generate(prompt, max_length=12, temperature=0, adapter="alice").split()[0] == "w150"
+    assert "".join(inference.generate_stream(prompt, max_length=12, temperature=0, adapter="bob")).split()[0] == "w160"
+    # The base model is untouched for requests without an adapter
+    assert any(isinstance(module, LoRALinear) for module in model.modules())
+    assert inference.generate(prompt, max_length=12, temperature=0) == base
+
+    # Concurrent requests each see only their own adapter
+    results = {}
+    def run(name):
+        results[name] = inference.generate(prompt, max_length=12, temperature=0, adapter=name)
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("alice", "bob") * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results["alice"].split()[0] == "w150" and results["bob"].split()[0] == "w160"
+    assert registry.stats()["loaded"] == 1
+
+
+def test_cached_engine_rejects_missing_registry_and_unknown_adapters(tmp_path):
+    model, tokenizer = _tiny_model_and_tokenizer()
+    engine = LLMEngine(model, tokenizer, embedding_model=None, device="cpu", response_cache=ResponseCache())
+    engine.inference.scheduler = None
+    engine.inference.adapters = None
+    query = " ".join(WORDS[:5])
+
+    with pytest.raises(ValueError):
+        engine.process_query(query, max_length=12, temperature=0, adapter="alice")
+
+    engine.inference.adapters = AdapterRegistry(str(tmp_path))
+    with pytest.raises(KeyError):
+        engine.process_query(query, max_length=12, temperature=0, adapter="alice")
@@ -0,0 +1,72 @@
+import os
+import sys
+import threading
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.embeddings.model_registry import EmbeddingModelRegistry
+
+
+class FakeModel:
+    def get_sentence_embedding_dimension(self):
+        return 384
+
+
+def test_model_is_loaded_once_per_name():
+    calls = []
+
+    def loader(name):
+        calls.append(name)
+        return FakeModel()
+
+    registry = EmbeddingModelRegistry(loader=loader)
+    assert not registry.is_loaded('all-MiniLM-L6-v2')
+
+    first = registry.get('all-MiniLM-L6-v2')
+    second = registry.get('sentence-transformers/all-MiniLM-L6-v2')
+
+    assert first is second
+    assert calls == ['all-MiniLM-L6-v2']
+    assert registry.get_dimension('all-MiniLM-L6-v2') == 384
+
+    stats = registry.stats()
+    assert stats['loaded_count'] == 1
+    assert stats['models']['all-MiniLM-L6-v2']['hits'] == 2
+
+
+def test_concurrent_first_use_loads_once():
+    calls = []
+    start = threading.Event()
+
+    def loader(name):
+        calls.append(name)
+        return FakeModel()
+
+    registry = EmbeddingModelRegistry(loader=loader)
+    results = []
+
+    def worker():
+        start.wait()
+        results.append(registry.get('all-MiniLM-L6-v2'))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(model is results[0] for model in results)
+
+
+def test_register_and_unload():
+    registry = EmbeddingModelRegistry(loader=lambda name: FakeModel())
+    model = FakeModel()
+
+    registry.register('custom-model', model)
+    assert registry.get('custom-model') is model
+
+    registry.unload('custom-model')
+    assert not registry.is_loaded('custom-model')
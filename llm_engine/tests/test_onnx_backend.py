@@ -0,0 +1,89 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+pytest.importorskip('onnxruntime')
+pytest.importorskip('sentence_transformers')
+
+from llm_engine.embeddings.onnx_backend import OnnxEmbeddingModel, check_parity, export_onnx_model
+
+WORDS = ["the", "a", "model", "vector", "search", "python", "language", "neural", "network", "brain",
+         "fast", "slow", "query", "document", "index", "user", "embedding", "token", "batch", "cache"]
+
+
+def _tiny_sentence_transformer(path):
+    import torch
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+
+    torch.manual_seed(0)
+    vocab_file = os.path.join(path, 'vocab.txt')
+    with open(vocab_file, 'w') as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    BertTokenizerFast(vocab_file=vocab_file).save_pretrained(path)
+    BertModel(BertConfig(
+        vocab_size=len(WORDS) + 5, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=64
+    )).save_pretrained(path)
+
+    transformer = models.Transformer(path, max_seq_length=32)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension(), pooling_mode='mean')
+    model = SentenceTransformer(modules=[transformer, pooling, models.Normalize()], device='cpu')
+    model.save(path)
+    return model
+
+
+def _texts():
+    return [" ".join(WORDS[i % 20:i % 20 + 1 + i % 7]) for i in range(24)]
+
+
+def test_onnx_matches_torch_backend(tmp_path):
+    model_dir = str(tmp_path / 'model')
+    os.makedirs(model_dir)
+    reference = _tiny_sentence_transformer(model_dir)
+
+    onnx_model = OnnxEmbeddingModel(model_dir, cache_dir=str(tmp_path / 'onnx'))
+    report = check_parity(_texts(), onnx_model, reference_model=reference, top_k=3)
+
+    assert report['max_abs_diff'] < 1e-4
+    assert report['cosine_min'] > 0.9999
+    assert report['top3_overlap'] == 1.0
+    assert onnx_model.encode("search query").shape == (32,)
+
+    quantized = OnnxEmbeddingModel(model_dir, cache_dir=str(tmp_path / 'onnx'), quantize=True)
+    assert check_parity(_texts(), quantized, reference_model=reference)['cosine_mean'] > 0.95
+
+
+def test_concurrent_exports_share_one_complete_artifact(tmp_path):
+    model_dir = str(tmp_path / 'model')
+    os.makedirs(model_dir)
+    _tiny_sentence_transformer(model_dir)
+    cache_dir = str(tmp_path / 'onnx')
+
+    paths, errors = [], []
+
+    def export():
+        try:
+            paths.append(export_onnx_model(model_dir, cache_dir=cache_dir))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=export) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors and len(set(paths)) == 1
+    artifact_dir = os.path.dirname(paths[0])
+    leftovers = [
+        name for name in os.listdir(artifact_dir)
+        if '.tmp' in name or os.path.isdir(os.path.join(artifact_dir, name))
+    ]
+    assert not leftovers
+    assert OnnxEmbeddingModel(model_dir, cache_dir=cache_dir).encode(_texts()).shape == (24, 32)
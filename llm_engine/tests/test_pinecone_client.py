@@ -0,0 +1,42 @@
+import os
+import sys
+import subprocess
+
+# Add the repository root to sys.path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from llm_engine.embeddings import pinecone_client
+from llm_engine.embeddings.pinecone_client import IndexDescriptionCache
+
+
+def test_index_description_cache_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pinecone_client.time, 'monotonic', lambda: now[0])
+
+    cache = IndexDescriptionCache(ttl_seconds=60)
+    key = ('fingerprint', 'test-index')
+    cache.set(key, {'name': 'test-index', 'dimension': 384})
+
+    now[0] += 30
+    assert cache.get(key)['dimension'] == 384
+
+    now[0] += 31
+    assert cache.get(key) is None
+
+
+def test_package_import_does_not_load_heavy_modules():
+    code = (
+        "import sys\n"
+        "from llm_engine.embeddings import PineconeEmbeddingManager, VectorStore, RAGRetriever\n"
+        "print(sorted(m for m in ('torch', 'faiss', 'pinecone', 'sentence_transformers') if m in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=REPO_ROOT,
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout
+
+    assert output.strip() == '[]'
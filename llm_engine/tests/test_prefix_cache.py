@@ -0,0 +1,63 @@
+import os
+import sys
+
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers
+from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.models.inference import LLMInference
+from llm_engine.models.kv_cache import PrefixKVCache
+
+WORDS = [f"w{i}" for i in range(200)]
+
+
+def _tiny_model_and_tokenizer():
+    vocab = {"[PAD]": 0, "[UNK]": 1, "[EOS]": 2, **{w: i + 3 for i, w in enumerate(WORDS)}}
+    word_level = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    word_level.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=word_level, pad_token="[PAD]", unk_token="[UNK]", eos_token="[EOS]"
+    )
+
+    torch.manual_seed(0)
+    model = LlamaForCausalLM(LlamaConfig(
+        vocab_size=len(vocab),
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=256
+    )).eval()
+    return model, tokenizer
+
+
+def test_cached_generation_matches_uncached():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    plain = LLMInference(model, tokenizer, "cpu", prefix_cache=False)
+    cached = LLMInference(model, tokenizer, "cpu", prefix_cache=PrefixKVCache(min_prefix_tokens=8))
+
+    system_prompt = " ".join(WORDS[:60])
+    for question in ["w100 w101 w102", "w150 w151", "w100 w101 w102"]:
+        prompt = f"{system_prompt} {question}"
+        assert cached.generate(prompt, max_length=80) == plain.generate(prompt, max_length=80)
+
+    stats = cached.prefix_cache.stats()
+    assert stats["misses"] == 1 and stats["hits"] == 2
+    # Only the first prompt pays for the shared prefix
+    assert stats["reused_tokens"] > stats["computed_tokens"]
+
+
+def test_lru_eviction_respects_entry_limit():
+    cache = PrefixKVCache(max_entries=2, min_prefix_tokens=1)
+    layer = [(torch.zeros(1, 1, 4, 2), torch.zeros(1, 1, 4, 2))]
+    for start in range(3):
+        cache.store(torch.arange(start * 10, start * 10 + 4).numpy(), layer, legacy=True)
+
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 1
+    assert cache.lookup(torch.arange(0, 4).numpy()) == (0, None)
+    reused, entry = cache.lookup(torch.tensor([20, 21, 22, 99]).numpy())
+    assert reused == 3 and entry is not None
@@ -0,0 +1,79 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.embeddings.backends import LocalVectorBackend
+from llm_engine.embeddings.pinecone_client import PineconeEmbeddingManager
+from llm_engine.embeddings.projection import (
+    MatryoshkaTruncation,
+    PCAProjection,
+    load_projection,
+    recall_report,
+)
+
+
+def _low_rank_corpus(n=300, dim=48, rank=6, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=(n, rank)) @ rng.normal(size=(rank, dim))).astype(np.float32)
+
+
+def test_pca_round_trip(tmp_path):
+    corpus = _low_rank_corpus()
+    projection = PCAProjection.fit(corpus, output_dim=8, model_name='test-model')
+
+    projected = projection.transform(corpus)
+    assert projected.shape == (300, 8)
+    np.testing.assert_allclose(np.linalg.norm(projected, axis=1), 1.0, rtol=1e-5)
+    # Already-projected vectors pass through only when flagged
+    assert projection.transform(projected, projected=True) is projected
+    with pytest.raises(ValueError):
+        projection.transform(projected)
+
+    path = str(tmp_path / 'projection.npz')
+    projection.save(path)
+    reloaded = load_projection(path)
+    assert isinstance(reloaded, PCAProjection)
+    assert reloaded.model_name == 'test-model'
+    np.testing.assert_allclose(reloaded.transform(corpus), projected, atol=1e-5)
+
+
+def test_recall_report_keeps_recall_when_rank_fits():
+    corpus = _low_rank_corpus()
+    rows = recall_report(corpus, dims=(8, 16), k=5)
+
+    assert [row['dim'] for row in rows] == [8, 16]
+    assert all(row['recall@5'] > 0.95 for row in rows)
+    assert rows[0]['memory_ratio'] == 8 / 48
+
+    # k is clamped to the corpus size
+    assert recall_report(corpus[:6], dims=(6,), k=10)[0]['recall@5'] > 0.95
+
+
+def test_manager_projects_at_ingest_and_query():
+    corpus = _low_rank_corpus(n=20)
+    projection = MatryoshkaTruncation(48, 12)
+    manager = PineconeEmbeddingManager(backend=LocalVectorBackend(), projection=projection)
+
+    manager.upsert_embeddings(
+        texts=[''] * 20,
+        embeddings=corpus,
+        ids=[str(i) for i in range(20)],
+        namespace='ns'
+    )
+
+    assert manager.index.dimension == 12
+    assert manager.query(corpus[7], k=1, namespace='ns')['matches'][0]['id'] == '7'
+
+
+def test_same_dimension_projection_still_applies():
+    corpus = _low_rank_corpus(n=50, dim=8)
+    projection = PCAProjection.fit(corpus, output_dim=8)
+
+    transformed = projection.transform(corpus)
+    np.testing.assert_allclose(np.linalg.norm(transformed, axis=1), 1.0, rtol=1e-5)
+    np.testing.assert_allclose(transformed, corpus @ projection.components.T / np.linalg.norm(corpus, axis=1, keepdims=True), atol=1e-5)
@@ -0,0 +1,102 @@
+import os
+import sys
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.engine import LLMEngine
+from llm_engine.models.inference import LLMInference
+from llm_engine.utils.response_cache import ResponseCache, context_fingerprints
+from llm_engine.tests.test_prefix_cache import WORDS, _tiny_model_and_tokenizer
+
+
+def test_lru_disk_tier_and_invalidation(tmp_path):
+    path = str(tmp_path / 'responses.sqlite')
+    cache = ResponseCache(max_entries=2, disk_path=path)
+    context = [{'_id': 'doc1', 'text': 'alpha'}]
+    keys = [ResponseCache.make_key('m', f'prompt {i}', {'max_length': 10}, context_fingerprints(context)) for i in range(3)]
+
+    for i, key in enumerate(keys):
+        cache.put(key, f'answer {i}', context_fingerprints(context))
+    assert cache.stats()['memory_entries'] == 2
+    # The evicted entry is still served from disk, also by a new process
+    assert ResponseCache(disk_path=path).get(keys[0]) == 'answer 0'
+    assert cache.get(keys[0]) == 'answer 0' and cache.stats()['disk_hits'] == 1
+
+    # Edited text changes the key; invalidation drops both tiers
+    edited = context_fingerprints([{'_id': 'doc1', 'text': 'beta'}])
+    assert ResponseCache.make_key('m', 'prompt 0', {'max_length': 10}, edited) != keys[0]
+    assert cache.invalidate_documents(['doc1']) >= 3
+    assert all(cache.get(key) is None for key in keys)
+
+
+def test_engine_serves_repeated_greedy_queries_from_cache():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    engine = LLMEngine(model, tokenizer, embedding_model=None, device="cpu", response_cache=ResponseCache())
+    engine.inference.scheduler = None
+
+    calls = []
+    generate = engine.inference.generate
+    engine.inference.generate = lambda *args, **kwargs: calls.append(args) or generate(*args, **kwargs)
+
+    query = " ".join(WORDS[:8])
+    first = engine.process_query(query, max_length=20)
+    second = engine.process_query(query, max_length=20)
+    assert second["response"] == first["response"]
+    assert second["metadata"]["cached"] and not first["metadata"]["cached"]
+    assert len(calls) == 1
+
+    # Sampling runs are never cached
+    model.generation_config.do_sample = True
+    engine.process_query(query, max_length=20)
+    engine.process_query(query, max_length=20)
+    assert len(calls) == 3
+
+
+def test_document_writes_through_the_engine_invalidate_cached_responses():
+    class Retriever:
+        def __init__(self):
+            self.documents = {}
+
+        def retrieve(self, query, k):
+            return list(self.documents.values())[:k]
+
+        def add_documents(self, documents):
+            self.documents.update((document["_id"], dict(document)) for document in documents)
+
+        def delete_documents(self, document_ids):
+            for doc_id in document_ids:
+                self.documents.pop(doc_id, None)
+
+    model, tokenizer = _tiny_model_and_tokenizer()
+    cache = ResponseCache()
+    engine = LLMEngine(model, tokenizer, embedding_model=None, device="cpu", retriever=Retriever(), response_cache=cache)
+    engine.inference.scheduler = None
+    query = " ".join(WORDS[:4])
+
+    engine.add_documents([{"_id": "d1", "text": " ".join(WORDS[10:20])}, {"_id": "d2", "text": " ".join(WORDS[20:30])}])
+    engine.process_query(query, max_length=60, temperature=0)
+    assert engine.process_query(query, max_length=60, temperature=0)["metadata"]["cached"]
+
+    engine.add_documents([{"_id": "d1", "text": " ".join(WORDS[30:40])}])
+    assert cache.stats()["invalidated"] == 1 and cache.stats()["memory_entries"] == 0
+
+    engine.process_query(query, max_length=60, temperature=0)
+    engine.delete_documents(["d2"])
+    assert cache.stats()["invalidated"] == 2 and cache.stats()["memory_entries"] == 0
+
+
+def test_model_id_changes_when_weights_are_replaced(tmp_path):
+    import time
+    from transformers import AutoModelForCausalLM
+
+    model, tokenizer = _tiny_model_and_tokenizer()
+    model.save_pretrained(str(tmp_path))
+    first = LLMInference(AutoModelForCausalLM.from_pretrained(str(tmp_path)), tokenizer, "cpu").model_id
+
+    time.sleep(0.01)
+    model.save_pretrained(str(tmp_path))
+    second = LLMInference(AutoModelForCausalLM.from_pretrained(str(tmp_path)), tokenizer, "cpu").model_id
+
+    assert first.split(":")[0] == second.split(":")[0] == str(tmp_path)
+    assert first != second
@@ -0,0 +1,112 @@
+import os
+import sys
+
+import pytest
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.models.inference import LLMInference
+from llm_engine.models.scheduler import ContinuousBatchingScheduler, SchedulerBusyError
+from llm_engine.tests.test_prefix_cache import WORDS, _tiny_model_and_tokenizer
+
+
+def test_batched_greedy_matches_sequential_generation():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    inference = LLMInference(model, tokenizer, "cpu", prefix_cache=False, scheduler=False)
+    # Prompts of different lengths join and leave the batch at different steps
+    prompts = [" ".join(WORDS[i:i + 4 + 3 * i]) for i in range(8)]
+    limits = [6 + i for i in range(8)]
+
+    expected = [
+        inference.generate(prompt, max_length=len(tokenizer(prompt)["input_ids"]) + limit)
+        for prompt, limit in zip(prompts, limits)
+    ]
+
+    scheduler = ContinuousBatchingScheduler(model, tokenizer, "cpu", max_batch_size=3)
+    try:
+        futures = [
+            scheduler.submit(prompt, max_new_tokens=limit, temperature=0)
+            for prompt, limit in zip(prompts, limits)
+        ]
+        results = [future.result(timeout=60) for future in futures]
+    finally:
+        scheduler.close()
+
+    assert [result["text"] for result in results] == expected
+    # Sequences stop at their own limit (or earlier at EOS)
+    assert all(result["generated_tokens"] <= limit for result, limit in zip(results, limits))
+    assert results[0]["generated_tokens"] == limits[0]
+    assert scheduler.stats()["mean_batch_size"] > 1
+
+
+def test_full_queue_applies_backpressure():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    scheduler = ContinuousBatchingScheduler(model, tokenizer, "cpu", max_queue_size=1)
+    # Keep the loop stopped so nothing drains the queue
+    scheduler.start = lambda: None
+
+    scheduler.submit("w1 w2", timeout=0)
+    with pytest.raises(SchedulerBusyError):
+        scheduler.submit("w3 w4", timeout=0.05)
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_failed_prefill_fails_only_its_own_request():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    forward = model.forward
+
+    def failing_forward(*args, input_ids=None, **kwargs):
+        # Long prompts blow up during prefill, like an out-of-memory error would
+        if input_ids is not None and input_ids.shape[-1] > 30:
+            raise RuntimeError("prefill boom")
+        return forward(*args, input_ids=input_ids, **kwargs)
+
+    model.forward = failing_forward
+    scheduler = ContinuousBatchingScheduler(model, tokenizer, "cpu", max_batch_size=4)
+    try:
+        running = scheduler.submit(" ".join(WORDS[:5]), max_new_tokens=30, temperature=0)
+        failing = scheduler.submit(" ".join(WORDS[:40]), max_new_tokens=5, temperature=0)
+        with pytest.raises(RuntimeError, match="prefill boom"):
+            failing.result(timeout=60)
+        # The request already decoding keeps going
+        assert running.result(timeout=60)["generated_tokens"] > 0
+    finally:
+        scheduler.close()
+
+
+def test_prompts_are_bounded_and_concurrent_submits_start_one_loop():
+    import threading
+
+    model, tokenizer = _tiny_model_and_tokenizer()
+    scheduler = ContinuousBatchingScheduler(model, tokenizer, "cpu", max_prompt_tokens=8)
+    started = []
+    run = scheduler._run
+    scheduler._run = lambda: started.append(1) or run()
+    try:
+        futures = []
+        threads = [
+            threading.Thread(target=lambda: futures.append(scheduler.submit(" ".join(WORDS[:20]), max_new_tokens=2)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results = [future.result(timeout=60) for future in futures]
+    finally:
+        scheduler.close()
+
+    assert len(started) == 1
+    assert all(result["prompt_tokens"] == 8 for result in results)
+
+
+def test_inference_rejects_max_length_without_room_to_generate():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    scheduler = ContinuousBatchingScheduler(model, tokenizer, "cpu")
+    inference = LLMInference(model, tokenizer, "cpu", prefix_cache=False, scheduler=scheduler, speculative=False)
+    try:
+        with pytest.raises(ValueError):
+            inference.generate(" ".join(WORDS[:10]), max_length=10)
+    finally:
+        scheduler.close()
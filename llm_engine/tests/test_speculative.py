@@ -0,0 +1,46 @@
+import os
+import sys
+
+import torch
+from transformers import LlamaConfig, LlamaForCausalLM
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.models.inference import LLMInference
+from llm_engine.models.kv_cache import PrefixKVCache
+from llm_engine.models.speculative import SpeculativeDecoder
+from llm_engine.tests.test_prefix_cache import WORDS, _tiny_model_and_tokenizer
+
+
+def _draft_model(vocab_size):
+    torch.manual_seed(1)
+    return LlamaForCausalLM(LlamaConfig(
+        vocab_size=vocab_size,
+        hidden_size=16,
+        intermediate_size=32,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        num_key_value_heads=1,
+        max_position_embeddings=256
+    )).eval()
+
+
+def test_speculative_output_matches_greedy_generation():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    plain = LLMInference(model, tokenizer, "cpu", prefix_cache=False, speculative=False)
+    prompts = [" ".join(WORDS[i:i + 12]) for i in range(0, 60, 20)]
+    expected = [plain.generate(prompt, max_length=40) for prompt in prompts]
+
+    # A draft identical to the main model is always right; an unrelated one rarely is
+    for draft, cache in ((model, None), (_draft_model(len(tokenizer)), PrefixKVCache(min_prefix_tokens=4))):
+        decoder = SpeculativeDecoder(model, draft, num_draft_tokens=3)
+        inference = LLMInference(model, tokenizer, "cpu", prefix_cache=cache or False, speculative=decoder)
+
+        assert [inference.generate(prompt, max_length=40) for prompt in prompts] == expected
+        assert inference.speculative is decoder
+        stats = decoder.stats()
+        assert stats["proposed_tokens"] > 0
+        if draft is model:
+            assert stats["acceptance_rate"] == 1.0
+            assert stats["tokens_per_main_pass"] > 3
@@ -0,0 +1,139 @@
+import os
+import sys
+
+import numpy as np
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.embeddings.retriever import RAGRetriever
+from llm_engine.embeddings.stored_embeddings import (
+    load_embedding_matrix,
+    pack_embedding,
+    unpack_embedding,
+)
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = {doc['_id']: doc for doc in documents}
+        self.writes = 0
+
+    def find(self, query, projection=None):
+        return [dict(doc) for doc in self.documents.values() if doc['user_id'] == query['user_id']]
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            self.documents[operation._filter['_id']].update(operation._doc['$set'])
+            self.writes += 1
+
+
+class FakeModel:
+    def __init__(self):
+        self.encoded = 0
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return np.stack([np.full(8, len(text) + 1, dtype=np.float32) for text in texts])
+
+
+class FakePinecone:
+    model_name = 'sentence-transformers/test-model'
+    projection = None
+
+    def upsert_embeddings(self, **kwargs):
+        self.upserted = kwargs
+
+
+def test_pack_round_trip_is_little_endian_binary():
+    vector = np.linspace(-1, 1, 16, dtype=np.float32)
+
+    packed = pack_embedding(vector, 'test-model', dtype='float16', text='hello')
+    assert isinstance(packed['data'], bytes) and len(packed['data']) == 32
+    assert packed['data'] == vector.astype('<f2').tobytes()
+    np.testing.assert_allclose(unpack_embedding(packed), vector, atol=1e-3)
+
+
+def test_load_matrix_skips_stale_vectors():
+    documents = [
+        {'text': 'a', 'embedding': pack_embedding(np.ones(4), 'v1', text='a')},
+        {'text': 'b', 'embedding': pack_embedding(np.ones(4), 'v0', text='b')},
+        {'text': 'changed', 'embedding': pack_embedding(np.ones(4), 'v1', text='c')},
+        {'text': 'd'},
+        {'text': 'e', 'embedding': pack_embedding(np.full(4, 2.0), 'v1', dtype='float16', text='e')}
+    ]
+
+    matrix, missing = load_embedding_matrix(documents, 'v1')
+    assert missing == [1, 2, 3]
+    np.testing.assert_array_equal(matrix[[0, 4]], [[1] * 4, [2] * 4])
+
+
+def test_sync_reuses_stored_embeddings_and_rebuilds_index():
+    collection = FakeCollection([
+        {'_id': str(i), 'user_id': 'u1', 'text': 'x' * i} for i in range(1, 6)
+    ])
+    model = FakeModel()
+    retriever = RAGRetriever(
+        mongodb_client={'user_documents': {'documents': collection}},
+        pinecone_client=FakePinecone(),
+        embedding_model=model
+    )
+
+    retriever.sync_user_documents('u1')
+    assert model.encoded == 5 and collection.writes == 5
+    assert collection.documents['1']['embedding']['model'] == 'test-model'
+
+    # A second sync loads every vector from Mongo; an edited document is re-encoded
+    collection.documents['3']['text'] = 'edited'
+    retriever.sync_user_documents('u1')
+    assert model.encoded == 6 and collection.writes == 6
+
+    # Deleting rebuilds FAISS from the stored vectors
+    store = retriever.user_vector_stores['u1']
+    store.delete_document(store.document_ids[0])
+    assert store.index.ntotal == store.get_document_count() == 4
+
+
+def test_vector_store_deletes_documents_added_without_stored_embeddings():
+    from llm_engine.embeddings.vector_store import VectorStore
+
+    store = VectorStore(dimension=4, metric='cosine')
+    vectors = np.eye(4, dtype=np.float32)[:3] + 0.1
+    documents = [{'text': str(i), 'embedding': pack_embedding(vectors[i], 'v1')} for i in range(3)]
+    store.add_documents(documents, vectors)
+    store.add_documents([{'text': '3'}], np.array([[0.1, 0.1, 0.1, 1.0]], dtype=np.float32))
+
+    store.delete_document(store.document_ids[1])
+    assert store.index.ntotal == store.get_document_count() == 3
+
+    results = store.search(np.array([0.0, 0.0, 0.0, 1.0], dtype=np.float32), k=10)
+    assert results[0]['text'] == '3'
+    assert sorted(result['text'] for result in results) == ['0', '2', '3']
+    assert all('embedding' not in result for result in results)
+    # Stored documents don't keep a second copy of their vector
+    assert all('embedding' not in document for document in store.documents)
+    assert 'embedding' in documents[0]
+
+
+def test_dimension_change_encodes_each_document_once():
+    collection = FakeCollection(
+        [{'_id': str(i), 'user_id': 'u1', 'text': 'x' * i,
+          'embedding': pack_embedding(np.ones(4), 'test-model', text='x' * i)} for i in range(1, 4)]
+        + [{'_id': str(i), 'user_id': 'u1', 'text': 'x' * i} for i in range(4, 6)]
+    )
+    model = FakeModel()
+    retriever = RAGRetriever(
+        mongodb_client={'user_documents': {'documents': collection}},
+        pinecone_client=FakePinecone(),
+        embedding_model=model
+    )
+
+    retriever.sync_user_documents('u1')
+    assert model.encoded == 5 and collection.writes == 5
+    np.testing.assert_array_equal(
+        retriever.pinecone_client.upserted['embeddings'],
+        [np.full(8, i + 1, dtype=np.float32) for i in range(1, 6)]
+    )
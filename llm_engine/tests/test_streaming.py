@@ -0,0 +1,81 @@
+import os
+import sys
+
+import pytest
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.engine import LLMEngine
+from llm_engine.models.inference import LLMInference
+from llm_engine.tests.test_prefix_cache import WORDS, _tiny_model_and_tokenizer
+
+
+def test_stream_matches_generate_and_reports_timings():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    inference = LLMInference(model, tokenizer, "cpu", prefix_cache=False)
+    prompt = " ".join(WORDS[:20])
+
+    stats = {}
+    deltas = list(inference.generate_stream(prompt, max_length=40, stats=stats))
+
+    assert len(deltas) > 1
+    assert "".join(deltas).strip() == inference.generate(prompt, max_length=40)
+    assert stats["prompt_tokens"] == 20 and stats["generated_tokens"] == 20
+    assert stats["ttft_ms"] > 0 and stats["tokens_per_second"] > 0
+
+
+def test_closing_stream_stops_generation():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    inference = LLMInference(model, tokenizer, "cpu", prefix_cache=False)
+
+    stats = {}
+    stream = inference.generate_stream(" ".join(WORDS[:10]), max_length=200, stats=stats)
+    next(stream)
+    stream.close()
+
+    assert stats["generated_tokens"] < 190
+
+
+def test_engine_streams_through_process_query():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    engine = LLMEngine(model, tokenizer, embedding_model=None, device="cpu")
+
+    result = engine.process_query(" ".join(WORDS[:10]), max_length=30, stream=True)
+    text = "".join(result["response"])
+
+    assert text
+    assert result["metadata"]["tokens_used"] == 20
+    assert result["metadata"]["context_used"] is False
+
+
+def test_stream_decodes_a_bounded_window_per_token():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    inference = LLMInference(model, tokenizer, "cpu", prefix_cache=False)
+    prompt = " ".join(WORDS[:10])
+    expected = inference.generate(prompt, max_length=200)
+
+    decoded_lengths = []
+    decode = tokenizer.decode
+
+    def counting_decode(ids, **kwargs):
+        decoded_lengths.append(len(ids))
+        return decode(ids, **kwargs)
+
+    tokenizer.decode = counting_decode
+    try:
+        text = "".join(inference.generate_stream(prompt, max_length=200))
+    finally:
+        tokenizer.decode = decode
+
+    assert text.strip() == expected
+    # Re-decoding the whole answer per token would reach 190 ids
+    assert max(decoded_lengths) <= 4
+
+
+def test_engine_without_retriever_rejects_documents():
+    model, tokenizer = _tiny_model_and_tokenizer()
+    engine = LLMEngine(model, tokenizer, embedding_model=None, device="cpu")
+
+    with pytest.raises(RuntimeError, match="no retriever"):
+        engine.add_documents([{"text": "w1 w2"}])
@@ -0,0 +1,99 @@
+import os
+import sys
+import random
+import itertools
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.models.tokenizer import TokenizerUtils
+from llm_engine.utils.llm_utils import LLMUtils
+from llm_engine.utils.text_chunker import TextChunker
+from llm_engine.tests.test_prefix_cache import WORDS, _tiny_model_and_tokenizer
+
+
+def _document(paragraphs=6, sentences=5):
+    return "\n\n".join(
+        " ".join(" ".join(WORDS[(p * 7 + s * 3) % 150:(p * 7 + s * 3) % 150 + 6]) + " ." for s in range(sentences))
+        for p in range(paragraphs)
+    )
+
+
+def _random_text(rng, words, max_word=None):
+    separators = [" ", " ", " ", "  ", "\n", "\n\n", "\t"]
+    marks = ["", "", "", ".", "!", "?!", ",", ".)"]
+    parts = [rng.choice(["", " ", "\n "])]
+    for _ in range(rng.randrange(0, 60)):
+        word = rng.choice(words)
+        if max_word is None and rng.random() < 0.05:
+            word = word * rng.randrange(2, 12)  # occasionally longer than a chunk
+        parts.append(word + rng.choice(marks) + rng.choice(separators))
+    return "".join(parts)
+
+
+def _check_chunk_properties(text, chunks, chunk_size, words_fit, size_of):
+    starts = [chunk['start'] for chunk in chunks]
+    assert all(a < b for a, b in zip(starts, starts[1:])), starts
+
+    covered = set()
+    for chunk in chunks:
+        assert chunk['text'] and chunk['text'] == text[chunk['start']:chunk['end']] == chunk['text'].strip()
+        assert size_of(chunk) <= chunk_size
+        if words_fit:
+            assert chunk['start'] == 0 or text[chunk['start'] - 1].isspace(), (text, chunk)
+        covered.update(range(chunk['start'], chunk['end']))
+    assert all(i in covered for i, char in enumerate(text) if not char.isspace())
+
+
+def test_character_chunks_hold_their_invariants_on_random_text():
+    rng = random.Random(0)
+    words = ["a", "bb", "ccc", "?", "!!", "dd.ee", "(f)", "gggg"]
+    for trial in range(400):
+        chunk_size, overlap = rng.randrange(1, 40), rng.randrange(0, 30)
+        text = _random_text(rng, words, max_word=None if trial % 2 else 4)
+        chunks = list(TextChunker(chunk_size, overlap).chunks(text))
+        # Words of up to 6 characters (with marks) always fit past the half-chunk floor
+        words_fit = trial % 2 == 0 and chunk_size >= 16
+        _check_chunk_properties(text, chunks, chunk_size, words_fit, lambda chunk: len(chunk['text']))
+
+    assert [(c['start'], c['text']) for c in TextChunker(2, 10).chunks(' ?!')] == [(1, '?'), (2, '!')]
+    assert [c['text'] for c in TextChunker(6, 3).chunks('aaa. bbb. ccc.')] == ['aaa.', 'bbb.', 'ccc.']
+
+    # Adversarial input for the old rfind loop: no spaces, and overlap larger than the chunk
+    assert len(LLMUtils.chunk_text("x" * 1000, 100, overlap=500)) > 1
+    assert LLMUtils.chunk_text("short text", 100) == ["short text"]
+
+
+def test_token_chunks_hold_their_invariants_on_random_text():
+    _, tokenizer = _tiny_model_and_tokenizer()
+    utils = TokenizerUtils(tokenizer)
+    rng = random.Random(1)
+    for _ in range(60):
+        chunk_size, overlap = rng.randrange(4, 40), rng.randrange(0, 20)
+        chunker = TextChunker(chunk_size, overlap, unit='tokens', tokenizer_utils=utils)
+        text = _random_text(rng, WORDS[:50], max_word=4)
+        chunks = list(chunker.chunks(text))
+        _check_chunk_properties(text, chunks, chunk_size, False, lambda chunk: chunk['tokens'])
+        assert all(len(tokenizer.encode(chunk['text'], add_special_tokens=False)) <= chunk_size for chunk in chunks)
+
+
+def test_chunks_prefer_sentence_and_paragraph_boundaries():
+    text = _document()
+    for chunk in TextChunker(200, 0).chunks(text):
+        assert chunk['text'].endswith(".")
+
+
+def test_token_chunks_stream_from_pieces():
+    _, tokenizer = _tiny_model_and_tokenizer()
+    chunker = TextChunker(40, overlap=8, unit='tokens', tokenizer_utils=TokenizerUtils(tokenizer))
+    text = _document(paragraphs=20)
+
+    whole = list(chunker.chunks(text))
+    pieces = list(chunker.chunks(text[i:i + 37] for i in range(0, len(text), 37)))
+    assert [(c['start'], c['end']) for c in pieces] == [(c['start'], c['end']) for c in whole]
+    assert all(0 < chunk['tokens'] <= 40 for chunk in whole)
+    assert all(len(tokenizer.encode(chunk['text'])) <= 40 for chunk in whole)
+
+    # Chunks are produced lazily, so an endless source still yields
+    endless = itertools.cycle([" ".join(WORDS[:50]) + " .\n\n"])
+    assert len(list(itertools.islice(chunker.chunks(endless), 3))) == 3
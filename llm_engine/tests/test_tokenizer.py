@@ -0,0 +1,82 @@
+import os
+import sys
+
+# Add the repository root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from llm_engine.models.tokenizer import TokenizerUtils
+from llm_engine.tests.test_prefix_cache import WORDS, _tiny_model_and_tokenizer
+
+
+class _CountingTokenizer:
+    """Wraps a tokenizer and counts the texts it encodes."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.encoded = 0
+
+    def __call__(self, text, **kwargs):
+        self.encoded += len(text) if isinstance(text, list) else 1
+        return self.tokenizer(text, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.tokenizer, name)
+
+
+def test_counts_are_cached_and_batched():
+    _, tokenizer = _tiny_model_and_tokenizer()
+    counting = _CountingTokenizer(tokenizer)
+    utils = TokenizerUtils(counting)
+    texts = [" ".join(WORDS[:n]) for n in (3, 10, 3, 25)]
+
+    assert utils.count_tokens_many(texts) == [len(tokenizer.encode(text)) for text in texts]
+    assert counting.encoded == 3  # the repeated text is tokenized once
+    assert utils.count_tokens(texts[1]) == 10 and utils.count_text_tokens(texts[3]) == 25
+    assert counting.encoded == 3
+
+
+def test_truncate_text_cuts_at_token_offsets():
+    _, tokenizer = _tiny_model_and_tokenizer()
+    utils = TokenizerUtils(tokenizer)
+    text = " ".join(WORDS[:50])
+
+    truncated = utils.truncate_text(text, 12)
+    assert truncated == " ".join(WORDS[:12]) and text.startswith(truncated)
+    assert utils.count_tokens(truncated) == 12
+    assert utils.truncate_text(text, 100) == text
+
+
+class _MergeShiftTokenizer:
+    """One token per character, plus one when a text ends in 'x': prefixes re-tokenize differently."""
+
+    def __init__(self, is_fast):
+        self.is_fast = is_fast
+
+    def num_special_tokens_to_add(self):
+        return 0
+
+    def _ids(self, text):
+        return list(range(len(text) + text.endswith("x")))
+
+    def __call__(self, text, return_offsets_mapping=False, **kwargs):
+        if isinstance(text, list):
+            return {"input_ids": [self._ids(t) for t in text]}
+        encoding = {"input_ids": self._ids(text)}
+        if return_offsets_mapping:
+            encoding["offset_mapping"] = [(i, i + 1) for i in range(len(text))]
+        return encoding
+
+    def decode(self, *args, **kwargs):
+        raise AssertionError("truncation must not decode")
+
+
+def test_truncated_prefix_is_measured_not_assumed():
+    for is_fast in (True, False):
+        utils = TokenizerUtils(_MergeShiftTokenizer(is_fast))
+        text = "abxcdefghij"
+
+        truncated = utils.truncate_text(text, 3)
+        assert text.startswith(truncated) and truncated
+        # "abx" is 4 tokens on its own, although it is the first 3 tokens of text
+        assert utils.count_tokens(truncated) <= 3
+        assert utils.truncate_text(text, 20) == text
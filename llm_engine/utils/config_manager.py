@@ -119,6 +119,17 @@ class ConfigManager:
         
         return embedding_models.get('alternatives', [])[0] if embedding_models.get('alternatives') else ''
 
+    def get_embedding_backend_config(self) -> Dict[str, Any]:
+        """
+        Retrieve the embedding backend configuration
+        
+        Returns:
+            Dict[str, Any]: Backend settings ('type' is 'torch' or 'onnx')
+        """
+        backend_config = dict(self.model_config.get('embedding_backend', {}))
+        backend_config.setdefault('type', 'torch')
+        return backend_config
+
     def get_all_configs(self) -> Dict[str, Any]:
         """
         Retrieve all configurations
@@ -0,0 +1,126 @@
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from .text_chunker import SENTENCE_END
+
+
+class ContextPacker:
+    def __init__(
+        self,
+        tokenizer_utils,
+        separator: str = "\n\n",
+        min_document_tokens: int = 32,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Pack retrieved documents into a token budget
+
+        Documents are taken in rank order until the next one no longer fits.
+        That document is trimmed at the last sentence boundary inside the
+        remaining budget, and packing stops. Document token counts come from
+        the TokenizerUtils cache, so repeated context is not re-tokenized.
+
+        Args:
+            tokenizer_utils (TokenizerUtils): Token counting for the generation model
+            separator (str): Text placed between documents
+            min_document_tokens (int): Smallest remaining budget worth filling with a trimmed document
+            logger (logging.Logger, optional): Logger for tracking operations
+        """
+        self.tokenizer_utils = tokenizer_utils
+        self.separator = separator
+        self.min_document_tokens = min_document_tokens
+        self.logger = logger or logging.getLogger(__name__)
+        self._separator_tokens = tokenizer_utils.count_text_tokens(separator)
+
+    @classmethod
+    def from_config(cls, tokenizer_utils, context_config: Optional[Dict[str, Any]]) -> 'ContextPacker':
+        """
+        Build a packer from the models.local.context settings
+
+        Args:
+            tokenizer_utils (TokenizerUtils): Token counting for the generation model
+            context_config (dict, optional): Settings dictionary
+
+        Returns:
+            ContextPacker
+        """
+        context_config = context_config or {}
+        return cls(tokenizer_utils, min_document_tokens=context_config.get('min_document_tokens', 32))
+
+    def pack(self, documents: Optional[List[Dict[str, Any]]], max_tokens: int) -> Dict[str, Any]:
+        """
+        Fill max_tokens with documents in rank order
+
+        Args:
+            documents (list, optional): Ranked documents with a 'text' field
+            max_tokens (int): Token budget for the context text, separators included
+
+        Returns:
+            dict: 'text' (joined context), 'documents' (included documents, the
+            last one possibly a trimmed copy), 'tokens' (tokens used),
+            'truncated' (whether a document was trimmed) and 'dropped'
+            (documents left out)
+        """
+        documents = documents or []
+        packed: List[Dict[str, Any]] = []
+        used = 0
+        truncated = False
+
+        # One batched tokenizer call for the documents not yet in the count cache
+        counts = self.tokenizer_utils.count_tokens_many(
+            [document["text"] for document in documents], add_special_tokens=False
+        )
+
+        for document, tokens in zip(documents, counts):
+            separator = self._separator_tokens if packed else 0
+            remaining = max_tokens - used - separator
+
+            if tokens <= remaining:
+                packed.append(document)
+                used += separator + tokens
+                continue
+
+            if remaining >= self.min_document_tokens:
+                text, tokens = self._trim(document["text"], remaining)
+                if text:
+                    packed.append({**document, "text": text})
+                    used += separator + tokens
+                    truncated = True
+            break
+
+        dropped = len(documents) - len(packed)
+        if dropped:
+            self.logger.debug(f"Packed {len(packed)} of {len(documents)} documents into {used}/{max_tokens} tokens")
+
+        return {
+            "text": self.separator.join(document["text"] for document in packed),
+            "documents": packed,
+            "tokens": used,
+            "truncated": truncated,
+            "dropped": dropped
+        }
+
+    def _trim(self, text: str, max_tokens: int) -> Tuple[str, int]:
+        """
+        Longest run of whole sentences of text within max_tokens
+
+        Returns an empty string when even the first sentence does not fit.
+        """
+        offsets = self.tokenizer_utils.token_end_offsets(text)
+        if offsets is None:
+            # Slow tokenizers have no offsets: decode the truncated tokens instead
+            prefix = self.tokenizer_utils.truncate_text(text, max_tokens)
+            limit = len(prefix)
+        else:
+            limit = offsets[max_tokens - 1] if max_tokens <= len(offsets) else len(text)
+
+        boundary = 0
+        for match in SENTENCE_END.finditer(text):
+            if match.end() > limit:
+                break
+            boundary = match.end()
+
+        trimmed = text[:boundary].rstrip()
+        if not trimmed:
+            return "", 0
+        # Counted like any other document so packing the result again is a no-op
+        return trimmed, self.tokenizer_utils.count_text_tokens(trimmed)
@@ -5,25 +5,15 @@ import numpy as np
 class LLMUtils:
     @staticmethod
     def chunk_text(text: str, chunk_size: int, overlap: int = 100) -> List[str]:
-        """Split text into overlapping chunks."""
-        if len(text) <= chunk_size:
-            return [text]
-        
-        chunks = []
-        start = 0
-        while start < len(text):
-            end = start + chunk_size
-            
-            # Adjust chunk end to not split words
-            if end < len(text):
-                end = text.rfind(' ', start, end)
-                if end == -1:
-                    end = start + chunk_size
-            
-            chunks.append(text[start:end])
-            start = end - overlap
-            
-        return chunks
+        """
+        Split text into overlapping chunks of at most chunk_size characters.
+
+        Chunks end at paragraph, sentence or word boundaries where possible.
+        For token-sized chunks, offsets, or streaming large inputs, use
+        TextChunker directly.
+        """
+        from .text_chunker import TextChunker
+        return [chunk["text"] for chunk in TextChunker(chunk_size, overlap).chunks(text)]
 
     @staticmethod
     def combine_embeddings(embeddings: List[torch.Tensor], 
@@ -45,8 +35,19 @@ class LLMUtils:
 
     @staticmethod
     def format_context(documents: List[Dict[str, Any]], 
-                      max_length: int = 2000) -> str:
-        """Format retrieved documents into context string."""
+                      max_length: int = 2000,
+                      tokenizer_utils: Optional[Any] = None) -> str:
+        """
+        Format retrieved documents into context string.
+
+        With tokenizer_utils, max_length is a token budget filled by
+        ContextPacker (documents trimmed at sentence boundaries); otherwise it
+        is a character budget.
+        """
+        if tokenizer_utils is not None:
+            from .context_packer import ContextPacker
+            return ContextPacker(tokenizer_utils).pack(documents, max_length)["text"]
+
         context = []
         current_length = 0
         
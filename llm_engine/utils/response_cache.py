@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+
+def context_fingerprints(context: Optional[List[Dict[str, Any]]]) -> List[str]:
+    """
+    Stable identifiers of retrieved context documents
+
+    Each entry combines the document ID with a hash of its text, so an edited
+    document never matches a response generated from its old version.
+
+    Args:
+        context (list, optional): Retrieved documents with 'text' and '_id' or 'id'
+
+    Returns:
+        list: 'id:texthash' strings in context order
+    """
+    fingerprints = []
+    for document in context or []:
+        doc_id = document.get('_id', document.get('id', ''))
+        text_hash = hashlib.sha1(document.get('text', '').encode('utf-8')).hexdigest()[:12]
+        fingerprints.append(f"{doc_id}:{text_hash}")
+    return fingerprints
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        disk_path: Optional[str] = None,
+        max_disk_entries: int = 100000,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Cache of deterministic generations with an in-memory LRU and optional SQLite tier
+
+        Keys cover the model, the full prompt, sampling parameters and the
+        retrieved context, so only identical requests share a response.
+        Entries remember which documents their context came from and are
+        dropped when those documents change.
+
+        Args:
+            max_entries (int): Responses kept in memory
+            disk_path (str, optional): SQLite file for the persistent tier
+            max_disk_entries (int): Responses kept on disk (least recently used are trimmed)
+            logger (logging.Logger, optional): Logger for tracking operations
+        """
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._documents: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._invalidated = 0
+
+        self.disk_path = os.path.expanduser(disk_path) if disk_path else None
+        if self.disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.disk_path)), exist_ok=True)
+            with self._connect() as connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, response TEXT NOT NULL, documents TEXT NOT NULL, accessed REAL NOT NULL)"
+                )
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS response_documents (doc_id TEXT NOT NULL, key TEXT NOT NULL)"
+                )
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS response_documents_doc ON response_documents (doc_id)"
+                )
+
+    @classmethod
+    def from_config(cls, cache_config: Optional[Dict[str, Any]]) -> Optional['ResponseCache']:
+        """
+        Build a cache from the models.local.response_cache settings
+
+        Args:
+            cache_config (dict, optional): Settings (None or enabled: false disables caching)
+
+        Returns:
+            ResponseCache or None
+        """
+        if not cache_config or not cache_config.get('enabled', True):
+            return None
+        return cls(
+            max_entries=cache_config.get('max_entries', 1024),
+            disk_path=cache_config.get('disk_path'),
+            max_disk_entries=cache_config.get('max_disk_entries', 100000)
+        )
+
+    @contextmanager
+    def _connect(self):
+        """SQLite connection that commits on success and is always closed."""
+        connection = sqlite3.connect(self.disk_path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def make_key(
+        model_id: str,
+        prompt: str,
+        params: Dict[str, Any],
+        context_ids: Optional[List[str]] = None
+    ) -> str:
+        """
+        Cache key for one generation request
+
+        Args:
+            model_id (str): Identifier of the model and its precision
+            prompt (str): Full prompt text
+            params (dict): Sampling and length parameters
+            context_ids (list, optional): Context fingerprints (see context_fingerprints)
+
+        Returns:
+            str: Hex digest
+        """
+        payload = json.dumps(
+            {
+                'model': model_id,
+                'prompt_sha256': hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+                'params': params,
+                'context': context_ids or []
+            },
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _document_ids(context_ids: Optional[List[str]]) -> List[str]:
+        return sorted({context_id.rsplit(':', 1)[0] for context_id in context_ids or []})
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a response, promoting disk hits into memory
+
+        Args:
+            key (str): Key from make_key
+
+        Returns:
+            str or None: Cached response
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                return entry['response']
+
+        if self.disk_path:
+            with self._connect() as connection:
+                row = connection.execute(
+                    "SELECT response, documents FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            if row is not None:
+                self._remember(key, row[0], json.loads(row[1]))
+                with self._lock:
+                    self._disk_hits += 1
+                return row[0]
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def put(self, key: str, response: str, context_ids: Optional[List[str]] = None):
+        """
+        Store a response
+
+        Args:
+            key (str): Key from make_key
+            response (str): Generated text
+            context_ids (list, optional): Context fingerprints used for invalidation
+        """
+        documents = self._document_ids(context_ids)
+        self._remember(key, response, documents)
+
+        if self.disk_path:
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, documents, accessed) VALUES (?, ?, ?, ?)",
+                    (key, response, json.dumps(documents), time.time())
+                )
+                connection.execute("DELETE FROM response_documents WHERE key = ?", (key,))
+                connection.executemany(
+                    "INSERT INTO response_documents (doc_id, key) VALUES (?, ?)",
+                    [(doc_id, key) for doc_id in documents]
+                )
+                self._trim_disk(connection)
+
+    def _remember(self, key: str, response: str, documents: List[str]):
+        with self._lock:
+            self._memory[key] = {'response': response, 'documents': documents}
+            self._memory.move_to_end(key)
+            for doc_id in documents:
+                self._documents.setdefault(doc_id, set()).add(key)
+
+            while len(self._memory) > self.max_entries:
+                evicted_key, evicted = self._memory.popitem(last=False)
+                self._forget_documents(evicted_key, evicted['documents'])
+
+    def _forget_documents(self, key: str, documents: List[str]):
+        for doc_id in documents:
+            keys = self._documents.get(doc_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._documents[doc_id]
+
+    def _trim_disk(self, connection: sqlite3.Connection):
+        count = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count <= self.max_disk_entries:
+            return
+        connection.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+            (count - self.max_disk_entries,)
+        )
+        connection.execute("DELETE FROM response_documents WHERE key NOT IN (SELECT key FROM responses)")
+
+    def invalidate_documents(self, document_ids: Iterable[Any]) -> int:
+        """
+        Drop every response whose context included one of the documents
+
+        Args:
+            document_ids (iterable): IDs of changed or deleted documents
+
+        Returns:
+            int: Number of memory and disk entries removed
+        """
+        document_ids = [str(doc_id) for doc_id in document_ids]
+        removed = 0
+
+        with self._lock:
+            keys = set()
+            for doc_id in document_ids:
+                keys |= self._documents.get(doc_id, set())
+            for key in keys:
+                entry = self._memory.pop(key, None)
+                if entry is not None:
+                    self._forget_documents(key, entry['documents'])
+                    removed += 1
+
+        if self.disk_path and document_ids:
+            placeholders = ','.join('?' * len(document_ids))
+            with self._connect() as connection:
+                removed += connection.execute(
+                    f"DELETE FROM responses WHERE key IN "
+                    f"(SELECT key FROM response_documents WHERE doc_id IN ({placeholders}))",
+                    document_ids
+                ).rowcount
+                connection.execute("DELETE FROM response_documents WHERE key NOT IN (SELECT key FROM responses)")
+
+        with self._lock:
+            self._invalidated += removed
+        if removed:
+            self.logger.info(f"Invalidated {removed} cached responses for {len(document_ids)} documents")
+        return removed
+
+    def clear(self):
+        """Drop every cached response from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            self._documents.clear()
+        if self.disk_path:
+            with self._connect() as connection:
+                connection.execute("DELETE FROM responses")
+                connection.execute("DELETE FROM response_documents")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit rates and sizes of both tiers
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            stats = {
+                'memory_entries': len(self._memory),
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits + self._disk_hits) / lookups if lookups else 0.0,
+                'invalidated': self._invalidated
+            }
+        if self.disk_path:
+            with self._connect() as connection:
+                stats['disk_entries'] = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return stats
@@ -0,0 +1,214 @@
+import re
+import logging
+from typing import Dict, Any, Iterable, Iterator, Optional, Union
+
+# End of a sentence: terminal punctuation, optional closing quotes/brackets, then whitespace or end of text
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s|$)')
+PARAGRAPH_BREAK = re.compile(r'\n[ \t]*\n\s*')
+WHITESPACE = re.compile(r'\s+')
+
+
+class TextChunker:
+    def __init__(
+        self,
+        chunk_size: int = 512,
+        overlap: int = 64,
+        unit: str = 'chars',
+        tokenizer_utils: Optional[Any] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        """
+        Streaming splitter producing overlapping chunks with source offsets
+
+        Text is read incrementally, so memory stays proportional to the chunk
+        size however long the source is. Each chunk ends at the last paragraph
+        break inside the size limit, else the last sentence end, else the last
+        whitespace; a boundary is only used past half the limit, so chunks
+        never shrink to fragments. The next chunk starts roughly `overlap`
+        units before the previous end, at a word start unless a single word
+        spans the whole overlap, and always strictly after the previous
+        chunk's start. The tokens-per-character estimate that sizes tokenizer
+        windows lives in each chunks() call, so one chunker can be shared
+        across threads.
+
+        Args:
+            chunk_size (int): Largest chunk, in characters or tokens
+            overlap (int): Units shared by consecutive chunks (capped at half of chunk_size)
+            unit (str): 'chars' or 'tokens'
+            tokenizer_utils (TokenizerUtils, optional): Tokenizer used when unit is 'tokens'
+            logger (logging.Logger, optional): Logger for tracking operations
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        if unit not in ('chars', 'tokens'):
+            raise ValueError(f"Unsupported chunk unit: {unit} (expected 'chars' or 'tokens')")
+        if unit == 'tokens' and tokenizer_utils is None:
+            raise ValueError("Token chunking requires tokenizer_utils")
+
+        self.chunk_size = chunk_size
+        self.overlap = max(0, min(overlap, chunk_size // 2))
+        self.unit = unit
+        self.tokenizer_utils = tokenizer_utils
+        self.logger = logger or logging.getLogger(__name__)
+
+    def chunks(self, source: Union[str, Iterable[str]]) -> Iterator[Dict[str, Any]]:
+        """
+        Split text into chunks
+
+        Args:
+            source (str or iterable): Text, or pieces of one text (pages, lines, a text file)
+
+        Yields:
+            dict: 'index', 'text' (whitespace-trimmed), 'start' and 'end'
+            (character offsets of the text in the concatenated source) and, for
+            token chunking, 'tokens'
+        """
+        pieces = iter([source] if isinstance(source, str) else source)
+        buffer = ""
+        buffer_offset = 0  # source offset of buffer[0]
+        position = 0  # start of the next chunk within buffer
+        exhausted = False
+        index = 0
+        # Running estimate used to size the text window handed to the tokenizer
+        chars_per_token = 4.0
+
+        while True:
+            # Keep enough unread text for one chunk, compacting the consumed prefix away
+            needed = self._window_chars(chars_per_token)
+            while not exhausted and len(buffer) - position < needed:
+                piece = next(pieces, None)
+                if piece is None:
+                    exhausted = True
+                    break
+                buffer_offset += position
+                buffer = buffer[position:] + piece
+                position = 0
+
+            remaining = len(buffer) - position
+            if remaining == 0:
+                return
+
+            limit, offsets, chars_per_token = self._limit(buffer, position, remaining, exhausted, chars_per_token)
+            if limit is None:
+                # The window held too few tokens: widen it, reading more text if needed
+                chars_per_token *= 2
+                continue
+
+            last = exhausted and limit >= remaining
+            end = remaining if last else self._boundary(buffer, position, limit)
+
+            chunk = self._emit(buffer, position, end, buffer_offset, index, offsets)
+            if last:
+                if chunk is not None:
+                    yield chunk
+                return
+            if chunk is None:
+                # Only whitespace: nothing to overlap with
+                position += end
+                continue
+
+            yield chunk
+            index += 1
+            position = self._next_start(buffer, position, chunk['start'] - buffer_offset, end, offsets)
+
+    def _window_chars(self, chars_per_token: float) -> int:
+        if self.unit == 'chars':
+            return self.chunk_size + 1
+        return int(self.chunk_size * chars_per_token * 1.25) + 16
+
+    def _limit(self, buffer: str, position: int, remaining: int, exhausted: bool, chars_per_token: float):
+        """
+        Characters of buffer[position:] the next chunk may span, with token end offsets
+
+        Returns (limit, offsets, updated chars-per-token estimate); limit is
+        None when the tokenized window is too short to decide and more text is
+        available.
+        """
+        if self.unit == 'chars':
+            return min(self.chunk_size, remaining), None, chars_per_token
+
+        window = min(remaining, self._window_chars(chars_per_token))
+        offsets = self.tokenizer_utils.token_end_offsets(buffer[position:position + window])
+        if offsets is None:
+            # Slow tokenizers have no offsets: measure with a truncated prefix instead
+            prefix = self.tokenizer_utils.truncate_text(buffer[position:position + window], self.chunk_size)
+            if len(prefix) >= window and window < remaining:
+                return None, None, chars_per_token
+            return len(prefix), None, chars_per_token
+
+        if offsets and offsets[-1]:
+            chars_per_token = max(1.0, 0.8 * chars_per_token + 0.2 * offsets[-1] / len(offsets))
+        if len(offsets) > self.chunk_size:
+            return offsets[self.chunk_size - 1], offsets, chars_per_token
+        if window < remaining or not exhausted:
+            return None, None, chars_per_token
+        return remaining, offsets, chars_per_token
+
+    @staticmethod
+    def _boundary(buffer: str, position: int, limit: int) -> int:
+        """Best break point in (limit / 2, limit] of buffer[position:]."""
+        window = buffer[position:position + limit]
+        floor = limit // 2
+
+        # The character just past the limit decides whether the limit itself ends a word
+        following = buffer[position + limit:position + limit + 1]
+        ends_word = following == "" or following.isspace()
+        for pattern in (PARAGRAPH_BREAK, SENTENCE_END):
+            best = None
+            for match in pattern.finditer(window):
+                end = match.end() if pattern is SENTENCE_END else match.start()
+                if end > floor and (end < limit or ends_word):
+                    best = end
+            if best is not None:
+                return best
+
+        if ends_word:
+            return limit
+        spaces = [match.start() for match in WHITESPACE.finditer(window) if match.start() > floor]
+        return spaces[-1] if spaces else limit
+
+    def _next_start(self, buffer: str, position: int, start: int, end: int, offsets) -> int:
+        """
+        Buffer index where the chunk after buffer[start:position + end] begins
+
+        The candidate lies `overlap` units before the end, but strictly after
+        the emitted (whitespace-trimmed) start. It then moves forward to the
+        next word start, or to the chunk end when one word covers the overlap.
+        """
+        end += position
+        if self.overlap == 0:
+            candidate = end
+        elif offsets is not None:
+            inside = [offset for offset in offsets if position + offset <= end]
+            candidate = position + (inside[-self.overlap - 1] if len(inside) > self.overlap else 0)
+        else:
+            candidate = end - self.overlap
+        candidate = min(max(candidate, start + 1), end)
+
+        if not buffer[candidate - 1].isspace():
+            match = WHITESPACE.search(buffer, candidate, end)
+            candidate = match.end() if match is not None else end
+        while candidate < len(buffer) and buffer[candidate].isspace():
+            candidate += 1
+        return candidate
+
+    def _emit(self, buffer: str, position: int, end: int, buffer_offset: int, index: int, offsets):
+        raw = buffer[position:position + end]
+        text = raw.strip()
+        if not text:
+            return None
+
+        start = position + len(raw) - len(raw.lstrip())
+        chunk = {
+            'index': index,
+            'text': text,
+            'start': buffer_offset + start,
+            'end': buffer_offset + start + len(text)
+        }
+        if self.unit == 'tokens':
+            if offsets is None:
+                chunk['tokens'] = self.tokenizer_utils.count_text_tokens(text)
+            else:
+                first, last = start - position, start - position + len(text)
+                chunk['tokens'] = sum(1 for offset in offsets if first < offset <= last)
+        return chunk
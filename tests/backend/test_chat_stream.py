@@ -0,0 +1,59 @@
+import pytest
+from flask import Flask
+from backend.api.chat import chat_bp
+from llm_engine.models.lora import AdapterRegistry
+
+
+class FakeInference:
+    def __init__(self, adapters):
+        self.adapters = adapters
+
+
+class FakeEngine:
+    def __init__(self, adapters=None):
+        self.inference = FakeInference(adapters)
+        self.calls = []
+
+    def process_query(self, query, **kwargs):
+        self.calls.append(kwargs)
+        return {'response': iter(['hi']), 'metadata': {}}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    (tmp_path / 'alice').mkdir()
+    (tmp_path / 'alice' / 'adapter.safetensors').write_bytes(b'')
+    return FakeEngine(AdapterRegistry(str(tmp_path)))
+
+
+@pytest.fixture
+def client(engine):
+    app = Flask(__name__)
+    app.config['LLM_ENGINE'] = engine
+    app.register_blueprint(chat_bp, url_prefix='/api')
+    return app.test_client()
+
+
+def test_bad_adapters_are_rejected_before_streaming(client, engine):
+    assert client.post('/api/chat/stream', json={'query': 'hi', 'adapter': 5}).status_code == 400
+    assert client.post('/api/chat/stream', json={'query': 'hi', 'adapter': '../x'}).status_code == 400
+    assert client.post('/api/chat/stream', json={'query': 'hi', 'adapter': 'bob'}).status_code == 404
+    assert engine.calls == []
+
+    response = client.post('/api/chat/stream', json={'query': 'hi', 'adapter': 'alice'})
+    assert response.status_code == 200
+    assert engine.calls[0]['adapter'] == 'alice'
+
+
+def test_adapter_without_registry_is_rejected():
+    app = Flask(__name__)
+    app.config['LLM_ENGINE'] = FakeEngine()
+    app.register_blueprint(chat_bp, url_prefix='/api')
+    response = app.test_client().post('/api/chat/stream', json={'query': 'hi', 'adapter': 'alice'})
+    assert response.status_code == 400
+
+
+def test_bad_numbers_are_rejected(client):
+    assert client.post('/api/chat/stream', json={'query': 'hi', 'max_length': 'lots'}).status_code == 400
+    assert client.post('/api/chat/stream', json={'query': 'hi', 'temperature': [1]}).status_code == 400
+    assert client.post('/api/chat/stream', json={'query': 'hi', 'max_length': 0}).status_code == 400